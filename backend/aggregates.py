@@ -0,0 +1,157 @@
+"""
+Maintenance of the ``user_spend_aggregates`` table.
+
+Every inserted transaction is folded into its (user, type code, category
+code, month) bucket as part of the same database transaction, so readers
+never have to rescan the raw ``transactions`` table. ORM inserts are picked
+up by a flush hook; bulk Core inserts call ``apply_transactions`` directly.
+``rebuild`` recomputes every month that still has raw rows, across all
+monthly partitions; the buckets double as the rollups that outlive retention.
+"""
+import argparse
+import datetime
+from collections import defaultdict
+
+from sqlalchemy import delete, event, func, insert, select, union_all
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from database import engine
+from lookups import UNKNOWN, code_of, encoder
+import models
+import partitions
+
+_table = models.UserSpendAggregate.__table__
+_KEY_COLUMNS = ["user_id", "transaction_type_id", "category_id", "period"]
+
+
+def period_of(timestamp):
+    return (timestamp or datetime.datetime.utcnow()).strftime("%Y-%m")
+
+
+def period_expr(dialect_name, column):
+    """SQL expression that buckets a timestamp column into YYYY-MM."""
+    if dialect_name == "postgresql":
+        return func.to_char(column, "YYYY-MM")
+    return func.strftime("%Y-%m", column)
+
+
+def _value(tx, key):
+    return tx[key] if isinstance(tx, dict) else getattr(tx, key)
+
+
+def _upsert(conn, rows):
+    if conn.dialect.name == "postgresql":
+        stmt = postgresql.insert(_table)
+    else:
+        stmt = sqlite.insert(_table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=_KEY_COLUMNS,
+        set_={
+            "total_amount": _table.c.total_amount + stmt.excluded.total_amount,
+            "tx_count": _table.c.tx_count + stmt.excluded.tx_count,
+        },
+    )
+    conn.execute(stmt, rows)
+
+
+def apply_transactions(conn, transactions):
+    """Fold new encoded transactions (ORM objects or dicts) into the aggregates.
+
+    Rows are pre-summed per bucket so each bucket costs one upsert no matter
+    how many transactions land in it.
+    """
+    unknown = None
+    buckets = defaultdict(lambda: [0.0, 0])
+    for tx in transactions:
+        type_code, category_code = _value(tx, "transaction_type_id"), _value(tx, "category_id")
+        if type_code is None or category_code is None:
+            unknown = unknown or (encoder.encode(conn, "transaction_type", [UNKNOWN])[0],
+                                  encoder.encode(conn, "category", [UNKNOWN])[0])
+        key = (
+            _value(tx, "user_id"),
+            unknown[0] if type_code is None else type_code,
+            unknown[1] if category_code is None else category_code,
+            period_of(_value(tx, "timestamp")),
+        )
+        bucket = buckets[key]
+        bucket[0] += _value(tx, "amount") or 0.0
+        bucket[1] += 1
+
+    rows = [
+        dict(zip(_KEY_COLUMNS, key), total_amount=total, tx_count=count)
+        for key, (total, count) in buckets.items()
+        if key[0] is not None
+    ]
+    if rows:
+        _upsert(conn, rows)
+    return len(rows)
+
+
+@event.listens_for(Session, "after_flush")
+def _aggregate_new_transactions(session, flush_context):
+    # session.new still holds the pre-flush state here
+    new_txs = [obj for obj in session.new if isinstance(obj, models.Transaction)]
+    if new_txs:
+        apply_transactions(session.connection(), new_txs)
+
+
+def refresh(conn):
+    """Recompute buckets from the raw transactions within ``conn``'s transaction.
+
+    Only months that still have raw rows are replaced; the rollups of months
+    retired by ``partitions.apply_retention`` are kept as they are.
+    """
+    raw = union_all(*[
+        select(t.c.user_id, t.c.transaction_type_id, t.c.category_id, t.c.timestamp, t.c.amount)
+        for t in partitions.sources(conn)
+    ]).subquery()
+    period = period_expr(conn.dialect.name, raw.c.timestamp)
+    source = (
+        select(
+            raw.c.user_id,
+            raw.c.transaction_type_id,
+            raw.c.category_id,
+            period,
+            func.sum(raw.c.amount),
+            func.count(),
+        )
+        .where(raw.c.user_id.is_not(None))
+        .group_by(raw.c.user_id, raw.c.transaction_type_id, raw.c.category_id, period)
+    )
+    conn.execute(delete(_table).where(_table.c.period.in_(select(period).distinct())))
+    conn.execute(
+        insert(_table).from_select(_KEY_COLUMNS + ["total_amount", "tx_count"], source)
+    )
+    return conn.execute(select(func.count()).select_from(_table)).scalar()
+
+
+def rebuild(bind=None):
+    """Recompute every bucket from the raw transactions table."""
+    with (bind or engine).begin() as conn:
+        return refresh(conn)
+
+
+def category_totals_query(user_id, transaction_type="Debit"):
+    """All-time (category code, total) rows for one user, read from the aggregates.
+
+    Decode the codes with ``lookups.encoder.name("category", code)``.
+    """
+    agg = models.UserSpendAggregate
+    return (
+        select(agg.category_id, func.sum(agg.total_amount))
+        .where(agg.user_id == user_id, agg.transaction_type_id == code_of("transaction_type", transaction_type))
+        .group_by(agg.category_id)
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain user_spend_aggregates")
+    parser.add_argument("--rebuild", action="store_true", help="recompute from all transactions")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        buckets = rebuild()
+        print(f"✅ Rebuilt user_spend_aggregates: {buckets} buckets")
+    else:
+        parser.print_help()
@@ -0,0 +1,255 @@
+"""
+Vectorised loan amortization and cash-flow projection.
+
+Loans are handled as columnar arrays (outstanding, annual rate, EMI,
+remaining months) and projected month by month with the closed-form annuity
+balance, broadcast over an (n_loans, horizon) grid. Each chunk of loans is
+projected and reduced before the next is loaded, so memory stays at
+``chunk_size * horizon`` cells however large the book is.
+
+The per-user schedules feed ``months_to_shortfall``: starting from the
+user's account balances, add each month's income less average spend and the
+projected instalments, and report the first month the running cash goes
+negative.
+"""
+import argparse
+import datetime
+import time
+
+import numpy as np
+from sqlalchemy import bindparam, delete, func, insert, select
+
+from cache import profile_cache
+from database import engine, init_db
+from lookups import code_of
+import models
+
+Loan = models.Loan
+User = models.User
+
+HORIZON_MONTHS = 360
+
+
+def emi(principal, annual_rate, months):
+    """Closed-form annuity instalment; works on scalars and arrays alike."""
+    principal = np.asarray(principal, dtype=np.float64)
+    months = np.asarray(months, dtype=np.float64)
+    r = np.asarray(annual_rate, dtype=np.float64) / 1200
+    growth = (1 + r) ** months
+    with np.errstate(divide="ignore", invalid="ignore"):
+        annuity = principal * r * growth / (growth - 1)
+    return np.where(r > 0, annuity, principal / np.maximum(months, 1))
+
+
+def project(outstanding, annual_rate, remaining_months, payment=None, horizon=HORIZON_MONTHS):
+    """Month-by-month schedule for a batch of loans.
+
+    Returns ``balance``, ``interest``, ``principal`` and ``payment`` arrays of
+    shape (n_loans, horizon); column k is month k + 1. ``payment`` defaults to
+    the annuity that clears ``outstanding`` by maturity. With a recorded EMI
+    that does not, whatever is left is settled as a balloon in the final month.
+    """
+    B = np.asarray(outstanding, dtype=np.float64)[:, None]
+    r = np.asarray(annual_rate, dtype=np.float64)[:, None] / 1200
+    n = np.asarray(remaining_months, dtype=np.int64)[:, None]
+    P = emi(B, r * 1200, n) if payment is None else np.asarray(payment, dtype=np.float64)[:, None]
+
+    k = np.arange(1, horizon + 1)
+    growth = (1 + r) ** k
+    with np.errstate(divide="ignore", invalid="ignore"):
+        balance = np.where(r > 0, B * growth - P * (growth - 1) / r, B - P * k)
+    # Paid off (or matured) loans stay at zero
+    np.clip(balance, 0.0, None, out=balance)
+    balance[k >= n] = 0.0
+
+    opening = np.empty_like(balance)
+    opening[:, 0] = B[:, 0]
+    opening[:, 1:] = balance[:, :-1]
+    interest = opening * r
+    paid = np.minimum(P, opening + interest)
+    # Final instalment clears the residual balance
+    maturity = k == n
+    paid[maturity] = (opening + interest)[maturity]
+    interest[k > n] = 0.0
+    paid[k > n] = 0.0
+    return {"balance": balance, "interest": interest, "principal": paid - interest, "payment": paid}
+
+
+def loan_arrays(rows):
+    """(user_id, outstanding, rate, emi, remaining) rows -> columnar arrays."""
+    return {
+        "user_id": np.array([r[0] for r in rows], dtype=object),
+        "outstanding": np.array([r[1] or 0.0 for r in rows], dtype=np.float64),
+        "rate": np.array([r[2] or 0.0 for r in rows], dtype=np.float64),
+        "emi": np.array([r[3] or 0.0 for r in rows], dtype=np.float64),
+        "remaining": np.array([r[4] or 0 for r in rows], dtype=np.int64),
+    }
+
+
+def _loan_columns():
+    return (Loan.user_id, Loan.outstanding_amount, Loan.interest_rate, Loan.monthly_emi, Loan.remaining_months)
+
+
+def _project_loans(loans, horizon):
+    # Recorded EMI where there is one, annuity on the outstanding otherwise
+    payment = np.where(loans["emi"] > 0, loans["emi"], emi(loans["outstanding"], loans["rate"], loans["remaining"]))
+    return project(loans["outstanding"], loans["rate"], loans["remaining"], payment, horizon)
+
+
+def portfolio_cashflow(bind=None, horizon=HORIZON_MONTHS, chunk_size=10_000):
+    """Book-wide monthly totals of balance, interest and principal.
+
+    Loans are streamed in primary-key order ``chunk_size`` at a time, so at
+    most one (chunk_size, horizon) schedule is resident at once.
+    """
+    bind = bind or engine
+    totals = {name: np.zeros(horizon) for name in ("balance", "interest", "principal")}
+    last_id = None
+    while True:
+        stmt = select(Loan.id, *_loan_columns()).order_by(Loan.id).limit(chunk_size)
+        if last_id is not None:
+            stmt = stmt.where(Loan.id > last_id)
+        with bind.connect() as conn:
+            rows = conn.execute(stmt).all()
+        if not rows:
+            break
+        schedule = _project_loans(loan_arrays([r[1:] for r in rows]), horizon)
+        for name, total in totals.items():
+            total += schedule[name].sum(axis=0)
+        last_id = rows[-1][0]
+        if len(rows) < chunk_size:
+            break
+    return totals
+
+
+def shortfall_months(cash, net_income, payments):
+    """First 1-based month where ``cash`` plus cumulative net flow goes negative.
+
+    ``net_income`` is per user (income less spend), ``payments`` is the
+    (n_users, horizon) instalment schedule. Users who never go negative get -1.
+    """
+    running = cash[:, None] + np.cumsum(net_income[:, None] - payments, axis=1)
+    negative = running < 0
+    return np.where(negative.any(axis=1), negative.argmax(axis=1) + 1, -1)
+
+
+def _user_inputs(conn, user_filter):
+    """Income, account balances and average monthly spend for a set of users."""
+    users = conn.execute(select(User.id, User.monthly_income).where(user_filter).order_by(User.id)).all()
+    balances = dict(conn.execute(
+        select(models.Account.user_id, func.sum(models.Account.balance))
+        .join(User, User.id == models.Account.user_id)
+        .where(user_filter)
+        .group_by(models.Account.user_id)
+    ).all())
+    agg = models.UserSpendAggregate
+    spend = {
+        uid: total / max(periods, 1)
+        for uid, total, periods in conn.execute(
+            select(agg.user_id, func.sum(agg.total_amount), func.count(agg.period.distinct()))
+            .join(User, User.id == agg.user_id)
+            .where(user_filter, agg.transaction_type_id == code_of("transaction_type", "Debit"))
+            .group_by(agg.user_id)
+        ).all()
+    }
+    ids = np.array([u[0] for u in users], dtype=object)
+    cash = np.array([balances.get(u[0]) or 0.0 for u in users], dtype=np.float64)
+    net = np.array([(u[1] or 0.0) - spend.get(u[0], 0.0) for u in users], dtype=np.float64)
+    return ids, cash, net
+
+
+def shortfall_users(conn, user_filter, horizon=HORIZON_MONTHS):
+    """Compute months_to_shortfall for the users matching ``user_filter``, without storing it.
+
+    Returns (ids, months) with -1 meaning no shortfall within the horizon.
+    """
+    ids, cash, net = _user_inputs(conn, user_filter)
+    if len(ids) == 0:
+        return ids, np.empty(0, dtype=np.int64)
+    loans = loan_arrays(conn.execute(
+        select(*_loan_columns()).join(User, User.id == Loan.user_id).where(user_filter).order_by(Loan.user_id)
+    ).all())
+
+    # Sum each user's loan schedules: loans arrive grouped by user, so one
+    # reduceat over the run starts gives the per-user instalments
+    payments = np.zeros((len(ids), horizon))
+    if len(loans["user_id"]):
+        schedule = _project_loans(loans, horizon)["payment"]
+        owner = loans["user_id"]
+        starts = np.flatnonzero(np.r_[True, owner[1:] != owner[:-1]])
+        position = {uid: i for i, uid in enumerate(ids.tolist())}
+        rows = [position[uid] for uid in owner[starts].tolist()]
+        payments[rows] = np.add.reduceat(schedule, starts, axis=0)
+    return ids, shortfall_months(cash, net, payments)
+
+
+def project_users(conn, user_filter, horizon=HORIZON_MONTHS):
+    """Compute and store months_to_shortfall for the users matching ``user_filter``."""
+    ids, months = shortfall_users(conn, user_filter, horizon)
+    if len(ids):
+        write_projections(conn, ids, months, horizon)
+    return ids, months
+
+
+def write_projections(conn, ids, months, horizon):
+    table = models.CashflowProjection.__table__
+    conn.execute(delete(table).where(table.c.user_id == bindparam("b_id")), [{"b_id": uid} for uid in ids])
+    now = datetime.datetime.utcnow()
+    conn.execute(insert(table), [
+        {"user_id": uid, "months_to_shortfall": m if m > 0 else None, "horizon_months": horizon, "projected_at": now}
+        for uid, m in zip(ids.tolist(), months.tolist())
+    ])
+
+
+def project_user(conn, user_id, horizon=HORIZON_MONTHS):
+    """On-demand projection for one user, computed in memory; returns months_to_shortfall or None.
+
+    Nothing is stored: ``project_portfolio`` owns the persisted projections.
+    """
+    ids, months = shortfall_users(conn, User.id == user_id, horizon)
+    if len(ids) == 0 or months[0] < 0:
+        return None
+    return int(months[0])
+
+
+def project_portfolio(bind=None, horizon=HORIZON_MONTHS, chunk_users=5_000):
+    """Refresh the shortfall signal for every user, in keyset chunks of users."""
+    bind = bind or engine
+    projected = 0
+    last_id = None
+    while True:
+        bounds = select(User.id).order_by(User.id).limit(chunk_users)
+        if last_id is not None:
+            bounds = bounds.where(User.id > last_id)
+        with bind.begin() as conn:
+            chunk = conn.execute(bounds).scalars().all()
+            if not chunk:
+                break
+            user_filter = User.id.between(chunk[0], chunk[-1])
+            ids, _ = project_users(conn, user_filter, horizon)
+        profile_cache.invalidate_many(ids.tolist())
+        projected += len(ids)
+        last_id = chunk[-1]
+        if len(chunk) < chunk_users:
+            break
+    profile_cache.clear(broadcast=True)
+    return projected
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Project loan cash flows and the per-user shortfall signal")
+    parser.add_argument("--horizon", type=int, default=HORIZON_MONTHS)
+    parser.add_argument("--chunk-users", type=int, default=5_000)
+    parser.add_argument("--portfolio", action="store_true", help="print book-wide monthly totals instead")
+    args = parser.parse_args()
+    init_db()
+
+    start = time.perf_counter()
+    if args.portfolio:
+        totals = portfolio_cashflow(horizon=args.horizon)
+        for month in range(0, args.horizon, 12):
+            print(f"📅 Month {month + 1:>3}: outstanding ₹{totals['balance'][month]:,.0f}, "
+                  f"interest ₹{totals['interest'][month]:,.0f}, principal ₹{totals['principal'][month]:,.0f}")
+    else:
+        projected = project_portfolio(horizon=args.horizon, chunk_users=args.chunk_users)
+        print(f"✅ Projected cash flows for {projected} users in {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,257 @@
+"""
+Benchmark harness for the Risk Engine API hot paths.
+
+Seeds a throwaway database of configurable size with the synthetic
+generator, then drives read_users, read_user and update_distress in-process
+through FastAPI's TestClient and/or over a local uvicorn, and times the
+portfolio scoring pass. Reports p50/p95/p99 latency, throughput and peak RSS
+and saves JSON so runs can be compared across commits:
+
+    python benchmark.py --users 50000 --output bench_before.json
+    python benchmark.py --users 50000 --compare bench_before.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def percentiles(samples_ms, elapsed):
+    samples = np.asarray(samples_ms, dtype=np.float64)
+    return {
+        "requests": int(samples.size),
+        "p50_ms": round(float(np.percentile(samples, 50)), 3),
+        "p95_ms": round(float(np.percentile(samples, 95)), 3),
+        "p99_ms": round(float(np.percentile(samples, 99)), 3),
+        "mean_ms": round(float(samples.mean()), 3),
+        "throughput_rps": round(samples.size / elapsed, 1) if elapsed > 0 else None,
+    }
+
+
+def peak_rss_mb(pid=None):
+    if pid is None:
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_cases(user_ids, statuses, rng):
+    """Request generators per endpoint, each returning (method, path, params, json body)."""
+    def list_users():
+        params = {"limit": 100}
+        if rng.random() < 0.5:
+            params["status"] = rng.choice(statuses)
+        return "GET", "/api/users", params, None
+
+    def read_user():
+        return "GET", f"/api/users/{rng.choice(user_ids)}", None, None
+
+    def update_distress():
+        body = {"user_id": rng.choice(user_ids), "reason": rng.choice(["job", "salary", "other"])}
+        return "POST", "/api/discovery", None, body
+
+    return {"read_users": list_users, "read_user": read_user, "update_distress": update_distress}
+
+
+def run_case(send, make_request, n, concurrency):
+    def one(_):
+        method, path, params, body = make_request()
+        started = time.perf_counter()
+        response = send(method, path, params, body)
+        latency = (time.perf_counter() - started) * 1000
+        if response.status_code >= 400:
+            raise RuntimeError(f"{method} {path} -> {response.status_code}")
+        return latency
+
+    # Warm up caches and connection pools before measuring
+    for i in range(min(10, n)):
+        one(i)
+    started = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(concurrency) as pool:
+            samples = list(pool.map(one, range(n)))
+    else:
+        samples = [one(i) for i in range(n)]
+    return percentiles(samples, time.perf_counter() - started)
+
+
+def bench_inprocess(cases, n, concurrency):
+    from fastapi.testclient import TestClient
+    import main
+
+    client = TestClient(main.app)
+    send = lambda method, path, params, body: client.request(method, path, params=params, json=body)
+    results = []
+    for name, make_request in cases.items():
+        stats = run_case(send, make_request, n, concurrency)
+        results.append({"name": name, "transport": "testclient", **stats, "peak_rss_mb": peak_rss_mb()})
+        print_result(results[-1])
+    return results
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def bench_uvicorn(cases, n, concurrency):
+    import httpx
+
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=HERE, env=os.environ.copy(),
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        with httpx.Client(base_url=base_url, timeout=30) as client:
+            deadline = time.time() + 30
+            while True:
+                try:
+                    client.get("/docs")
+                    break
+                except httpx.TransportError:
+                    if time.time() > deadline or server.poll() is not None:
+                        raise RuntimeError("uvicorn did not start")
+                    time.sleep(0.2)
+
+            send = lambda method, path, params, body: client.request(method, path, params=params, json=body)
+            results = []
+            for name, make_request in cases.items():
+                stats = run_case(send, make_request, n, concurrency)
+                results.append({"name": name, "transport": "uvicorn", **stats, "peak_rss_mb": peak_rss_mb(server.pid)})
+                print_result(results[-1])
+            return results
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def bench_scoring(repeats):
+    import scoring
+
+    samples = []
+    users = 0
+    for _ in range(repeats):
+        started = time.perf_counter()
+        users = scoring.score_portfolio()
+        samples.append((time.perf_counter() - started) * 1000)
+    stats = percentiles(samples, sum(samples) / 1000)
+    stats["users_per_sec"] = round(users / (float(np.median(samples)) / 1000), 1)
+    result = {"name": "score_portfolio", "transport": "batch", **stats, "peak_rss_mb": peak_rss_mb()}
+    print_result(result)
+    return [result]
+
+
+def print_result(r):
+    print(f"   {r['name']:<18} {r['transport']:<10} p50={r['p50_ms']:>9.2f}ms  p95={r['p95_ms']:>9.2f}ms  "
+          f"p99={r['p99_ms']:>9.2f}ms  {r['throughput_rps'] or 0:>9.1f} req/s  rss={r['peak_rss_mb']}MB")
+
+
+def compare(current, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {(r["name"], r["transport"]): r for r in json.load(f)["results"]}
+    print(f"\n📈 Compared with {baseline_path} (p95, negative is faster):")
+    for r in current:
+        old = baseline.get((r["name"], r["transport"]))
+        if old and old["p95_ms"]:
+            delta = (r["p95_ms"] - old["p95_ms"]) / old["p95_ms"] * 100
+            print(f"   {r['name']:<18} {r['transport']:<10} {old['p95_ms']:>9.2f}ms -> {r['p95_ms']:>9.2f}ms  ({delta:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Risk Engine API hot paths")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--tx-per-user", type=int, default=60)
+    parser.add_argument("--requests", type=int, default=500, help="measured requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--transport", choices=["testclient", "uvicorn", "both"], default="both")
+    parser.add_argument("--scoring-repeats", type=int, default=3)
+    parser.add_argument("--db", help="SQLite file to benchmark against (default: fresh temp file)")
+    parser.add_argument("--reuse-db", action="store_true", help="skip seeding if --db already exists")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="previous results JSON to diff against")
+    args = parser.parse_args()
+
+    db_path = os.path.abspath(args.db or os.path.join(tempfile.mkdtemp(prefix="risk-bench-"), "bench.db"))
+    # Must be set before database.py is imported, here and in the uvicorn child
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    sys.path.insert(0, HERE)
+
+    import seed
+    from database import SessionLocal
+    import models
+
+    if not (args.reuse_db and os.path.exists(db_path)):
+        seed.seed_synthetic(args.users, args.tx_per_user, seed=args.seed)
+
+    db = SessionLocal()
+    user_ids = [uid for (uid,) in db.query(models.User.id)]
+    statuses = [s for (s,) in db.query(models.User.status).distinct()]
+    db.close()
+    rng = random.Random(args.seed)
+    cases = build_cases(user_ids, statuses, rng)
+
+    print(f"\n⏱️  Benchmarking against {db_path} ({len(user_ids):,} users)")
+    results = []
+    if args.transport in ("testclient", "both"):
+        results += bench_inprocess(cases, args.requests, args.concurrency)
+    if args.transport in ("uvicorn", "both"):
+        results += bench_uvicorn(cases, args.requests, args.concurrency)
+    if args.scoring_repeats:
+        results += bench_scoring(args.scoring_repeats)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "users": len(user_ids),
+            "tx_per_user": args.tx_per_user,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "database": db_path,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Saved results to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+Small in-process caches for API responses.
+
+Batch jobs usually run in other processes than the API. They announce their
+writes through a ``SharedEpoch`` row in the database, which each API process
+polls on cache reads, so a CLI run is visible within a few seconds rather
+than after the full TTL.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from database import engine
+import models
+
+MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe cache whose entries expire ``ttl`` seconds after being set."""
+
+    def __init__(self, ttl, maxsize=256):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return MISSING
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return MISSING
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            if key not in self._data and len(self._data) >= self.maxsize:
+                # Evict the entry closest to expiry
+                oldest = min(self._data, key=lambda k: self._data[k][0])
+                del self._data[oldest]
+            self._data[key] = (time.monotonic() + self.ttl, value)
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key)
+        if value is MISSING:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    async def get_or_compute_async(self, key, compute):
+        value = self.get(key)
+        if value is MISSING:
+            value = await compute()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key=MISSING):
+        with self._lock:
+            if key is MISSING:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+
+class LocalStore:
+    """In-process stand-in for a shared cache store (Redis, Memcached, ...).
+
+    A shared store only needs get/set/delete_many; values it holds must be
+    plain JSON-able data.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+        if entry is None or entry[0] <= time.time():
+            return None
+        return entry[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.time() + ttl, value)
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+
+class SharedEpoch:
+    """Invalidation counter in ``cache_epochs`` shared by every process.
+
+    ``bump`` after committing a batch of writes; ``moved`` reads the counter
+    at most every ``check_interval`` seconds and reports whether another
+    bump landed since the last check.
+    """
+
+    def __init__(self, name, check_interval=5.0, bind=None):
+        self.name = name
+        self.check_interval = check_interval
+        self.bind = bind
+        self._seen = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def read(self):
+        table = models.CacheEpoch.__table__
+        with (self.bind or engine).connect() as conn:
+            return conn.execute(select(table.c.epoch).where(table.c.name == self.name)).scalar() or 0
+
+    def bump(self):
+        table = models.CacheEpoch.__table__
+        with (self.bind or engine).begin() as conn:
+            insert = postgresql.insert if conn.dialect.name == "postgresql" else sqlite.insert
+            conn.execute(insert(table).values(name=self.name, epoch=0).on_conflict_do_nothing(index_elements=["name"]))
+            conn.execute(update(table).where(table.c.name == self.name).values(epoch=table.c.epoch + 1))
+
+    def moved(self):
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_check:
+                return False
+            self._next_check = now + self.check_interval
+        current = self.read()
+        with self._lock:
+            moved = self._seen is not None and current != self._seen
+            self._seen = current
+        return moved
+
+
+class ProfileCache:
+    """Bounded LRU + TTL cache of profile payloads keyed by user_id.
+
+    Lookups try the local LRU first, then the optional shared store. Writers
+    call ``invalidate``/``invalidate_many`` after they commit, and batch jobs
+    ``clear(broadcast=True)`` once they finish so the optional ``shared``
+    epoch flushes the API processes too. A fill that started before an
+    invalidation is discarded, so a slow read can never re-cache data that an
+    invalidation has already superseded.
+    """
+
+    def __init__(self, maxsize=10_000, ttl=300, store=None, prefix="profile:", shared=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.store = store
+        self.prefix = prefix
+        self.shared = shared
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._epoch = 0
+
+    def epoch(self):
+        """Token to pass to ``set`` so fills racing an invalidation are dropped."""
+        return self._epoch
+
+    def get(self, user_id):
+        if self.shared is not None and self.shared.moved():
+            self.clear()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(user_id)
+            if entry is not None:
+                if entry[0] > now:
+                    self._data.move_to_end(user_id)
+                    return entry[1]
+                del self._data[user_id]
+        if self.store is not None:
+            value = self.store.get(self.prefix + user_id)
+            if value is not None:
+                self._set_local(user_id, value)
+                return value
+        return MISSING
+
+    def set(self, user_id, value, epoch):
+        with self._lock:
+            if epoch != self._epoch:
+                return False
+        self._set_local(user_id, value)
+        if self.store is not None:
+            self.store.set(self.prefix + user_id, value, self.ttl)
+        return True
+
+    def _set_local(self, user_id, value):
+        with self._lock:
+            self._data[user_id] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(user_id)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, user_id):
+        self.invalidate_many([user_id])
+
+    def invalidate_many(self, user_ids):
+        user_ids = [uid for uid in user_ids if uid is not None]
+        if not user_ids:
+            return
+        with self._lock:
+            self._epoch += 1
+            for uid in user_ids:
+                self._data.pop(uid, None)
+        if self.store is not None:
+            self.store.delete_many([self.prefix + uid for uid in user_ids])
+
+    def clear(self, broadcast=False):
+        with self._lock:
+            self._epoch += 1
+            self._data.clear()
+        if broadcast and self.shared is not None:
+            self.shared.bump()
+
+
+def _profile_store():
+    # PROFILE_CACHE_STORE=local uses the in-process stand-in; a shared backend
+    # plugs in here
+    kind = os.getenv("PROFILE_CACHE_STORE", "none")
+    if kind == "local":
+        return LocalStore()
+    return None
+
+
+def _profile_epoch():
+    # PROFILE_CACHE_SYNC_INTERVAL=0 turns cross-process flushes off, leaving
+    # PROFILE_CACHE_TTL to bound how stale entries can get after a batch job
+    interval = float(os.getenv("PROFILE_CACHE_SYNC_INTERVAL", "5"))
+    return SharedEpoch("profile", interval) if interval > 0 else None
+
+
+profile_cache = ProfileCache(
+    maxsize=int(os.getenv("PROFILE_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("PROFILE_CACHE_TTL", "300")),
+    store=_profile_store(),
+    shared=_profile_epoch(),
+)
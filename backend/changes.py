@@ -0,0 +1,51 @@
+"""
+Change tracking for incremental rescoring.
+
+Anything that alters a user's scoring inputs appends to ``user_changes`` in
+the same transaction as the write: bulk ingestion and API handlers call
+``record_changes``, and ORM updates to the indicator columns on ``User`` are
+picked up by a flush hook. ``scoring.rescore_changed`` consumes the log.
+"""
+import datetime
+
+from sqlalchemy import event, insert, inspect, literal
+from sqlalchemy.orm import Session
+
+import models
+
+_table = models.UserChange.__table__
+
+# Every mapped column on User except identity / output fields counts as an input
+_NON_INPUTS = {"id", "name", "current_risk_score", "final_score", "status"}
+INPUT_COLUMNS = [c.key for c in models.User.__table__.columns if c.key not in _NON_INPUTS]
+
+
+def record_changes(conn, user_ids, source):
+    """Append one change row per distinct user id."""
+    now = datetime.datetime.utcnow()
+    rows = [{"user_id": uid, "source": source, "changed_at": now} for uid in sorted(set(user_ids)) if uid is not None]
+    if rows:
+        conn.execute(insert(_table), rows)
+    return len(rows)
+
+
+def record_cohort(conn, user_select, source):
+    """Set-based variant: log every user id returned by a SELECT of ids."""
+    now = datetime.datetime.utcnow()
+    stmt = insert(_table).from_select(
+        ["user_id", "source", "changed_at"],
+        user_select.add_columns(literal(source), literal(now)),
+    )
+    return conn.execute(stmt).rowcount
+
+
+@event.listens_for(Session, "after_flush")
+def _log_user_input_changes(session, flush_context):
+    changed = []
+    for obj in session.dirty:
+        if isinstance(obj, models.User):
+            state = inspect(obj)
+            if any(state.attrs[key].history.has_changes() for key in INPUT_COLUMNS):
+                changed.append(obj.id)
+    if changed:
+        record_changes(session.connection(), changed, "orm")
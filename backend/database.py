@@ -1,26 +1,167 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
+from starlette.concurrency import run_in_threadpool
 import os
 
-DATABASE_URL = "sqlite:///./tent.db"
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./tent.db")
 
-# Setting up SQLite reliably so the user can see DATA locally.
-# The Supabase connection is failing due to SSL/IP issues in this environment.
-try:
-    engine = create_engine(
-        DATABASE_URL, 
-        connect_args={"check_same_thread": False}
-    )
-except Exception:
-    engine = create_engine("sqlite:///:memory:")
+# DB_ASYNC=1 serves requests from an AsyncSession (aiosqlite / asyncpg), so
+# concurrency is bounded by the database rather than Starlette's threadpool.
+DB_ASYNC = os.getenv("DB_ASYNC", "0").lower() in ("1", "true", "yes")
+
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+def _env_int(name, default):
+    return int(os.getenv(name, default))
+
+def _env_bool(name, default):
+    return os.getenv(name, str(default)).lower() in ("1", "true", "yes")
+
+# Server databases (Postgres / Supabase). Behind a transaction pooler such as
+# Supabase's port-6543 URL, set DB_POOL=null and let the pooler do the pooling.
+POOL_SETTINGS = {
+    "pool": os.getenv("DB_POOL", "queue"),
+    "pool_size": _env_int("DB_POOL_SIZE", 10),
+    "max_overflow": _env_int("DB_MAX_OVERFLOW", 20),
+    "pool_timeout": _env_int("DB_POOL_TIMEOUT", 30),
+    "pool_recycle": _env_int("DB_POOL_RECYCLE", 1800),
+    "pool_pre_ping": _env_bool("DB_POOL_PRE_PING", True),
+}
+
+# SQLite: WAL lets dashboard reads run concurrently with a writer instead of
+# serializing on the rollback journal; NORMAL sync is durable in WAL mode.
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "mmap_size": _env_int("SQLITE_MMAP_SIZE", 256 * 1024 * 1024),
+    "cache_size": _env_int("SQLITE_CACHE_SIZE", -64000),  # negative = KiB
+    "busy_timeout": _env_int("SQLITE_BUSY_TIMEOUT_MS", 5000),
+    "foreign_keys": "ON",
+}
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+def engine_options(url):
+    url = make_url(url)
+    if url.get_backend_name() == "sqlite":
+        options = {}
+        if not url.drivername.endswith("aiosqlite"):
+            options["connect_args"] = {"check_same_thread": False}
+        return options
+    if POOL_SETTINGS["pool"] == "null":
+        return {"poolclass": NullPool, "pool_pre_ping": POOL_SETTINGS["pool_pre_ping"]}
+    return {k: v for k, v in POOL_SETTINGS.items() if k != "pool"}
+
+def configure_engine(engine):
+    # Pragmas go on the sync core of an AsyncEngine as well
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if sync_engine.dialect.name == "sqlite" and sync_engine.url.database not in (None, "", ":memory:"):
+        event.listen(sync_engine, "connect", _set_sqlite_pragmas)
+    return engine
+
+def create_db_engine(url=DATABASE_URL):
+    return configure_engine(create_engine(url, **engine_options(url)))
+
+def pool_stats(engine):
+    """Checkout / overflow counters for an engine's connection pool."""
+    pool = getattr(engine, "sync_engine", engine).pool
+    stats = {"pool": type(pool).__name__, "status": pool.status()}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        counter = getattr(pool, name, None)
+        if callable(counter):
+            stats[name] = counter()
+    return stats
+
+engine = create_db_engine()
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
+def async_url(url):
+    # Swap the sync driver for its asyncio counterpart, e.g. sqlite -> sqlite+aiosqlite
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
+
+# Batch scripts keep using the sync engine; only the API switches over
+async_engine = None
+AsyncSessionLocal = None
+if DB_ASYNC:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    _async_url = async_url(engine.url)
+    async_engine = configure_engine(create_async_engine(_async_url, **engine_options(_async_url)))
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+class ThreadedSession:
+    """Awaitable facade over a sync Session with the AsyncSession call surface.
+
+    Each call runs in Starlette's threadpool and results are buffered there,
+    so route code is identical in sync and async mode.
+    """
+
+    def __init__(self, session):
+        self.sync_session = session
+
+    def _run(self, fn, *args, **kwargs):
+        return run_in_threadpool(fn, *args, **kwargs)
+
+    async def execute(self, statement, *args, **kwargs):
+        return await self._run(lambda: self.sync_session.execute(statement, *args, **kwargs).freeze()())
+
+    async def scalar(self, statement, *args, **kwargs):
+        return await self._run(self.sync_session.scalar, statement, *args, **kwargs)
+
+    async def get(self, entity, ident, **kwargs):
+        return await self._run(self.sync_session.get, entity, ident, **kwargs)
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await self._run(fn, self.sync_session, *args, **kwargs)
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    async def flush(self):
+        await self._run(self.sync_session.flush)
+
+    async def commit(self):
+        await self._run(self.sync_session.commit)
+
+    async def rollback(self):
+        await self._run(self.sync_session.rollback)
+
+    async def close(self):
+        await self._run(self.sync_session.close)
+
+def init_db():
+    import lookups
+    import partitions
+
+    # Databases from before dictionary encoding are converted in place first;
+    # a fresh Postgres database gets the month-partitioned transactions parent
+    lookups.migrate(engine)
+    partitions.ensure(engine)
+    # create_all() skips tables that already exist, so indexes added to a
+    # model later never reach an existing database; create those explicitly.
+    Base.metadata.create_all(bind=engine)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+async def get_db():
+    if DB_ASYNC:
+        async with AsyncSessionLocal() as db:
+            yield db
+        return
+    # Match the async sessions: loaded rows stay usable after a commit
+    db = ThreadedSession(SessionLocal(expire_on_commit=False))
     try:
         yield db
     finally:
-        db.close()
+        await db.close()
@@ -0,0 +1,108 @@
+"""
+Push channel for user deltas.
+
+Writers publish small per-user deltas (``{"id": ..., "status": ...}``) after
+they commit; the SSE endpoint streams them to open dashboards so clients
+patch the rows they already hold instead of refetching the user list.
+
+Each subscriber gets its own bounded buffer keyed by user id, so repeated
+updates to a user coalesce into one delta and a slow client never blocks a
+publisher. A subscriber that falls more than ``max_pending`` users behind is
+told to resync (refetch once) rather than growing without limit.
+"""
+import asyncio
+import os
+import threading
+
+
+class Subscription:
+    def __init__(self, loop, max_pending):
+        self._loop = loop
+        self._max_pending = max_pending
+        self._pending = {}
+        self._resync = False
+        self._ready = asyncio.Event()
+
+    def offer(self, deltas):
+        # Runs on the subscriber's event loop
+        if not self._resync:
+            for delta in deltas:
+                merged = self._pending.setdefault(delta["id"], {})
+                merged.update(delta)
+            if len(self._pending) > self._max_pending:
+                self._pending.clear()
+                self._resync = True
+        self._ready.set()
+
+    async def next_batch(self, timeout=None, linger=0.0):
+        """Wait for pending deltas, then ``linger`` so a burst goes out together.
+
+        Returns ("users", [deltas]), ("resync", None), or None on timeout.
+        """
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if linger:
+            await asyncio.sleep(linger)
+        self._ready.clear()
+        if self._resync:
+            self._resync = False
+            self._pending = {}
+            return "resync", None
+        batch, self._pending = list(self._pending.values()), {}
+        return "users", batch
+
+
+class LocalBroker:
+    """In-process pub/sub; publish() is safe to call from any thread."""
+
+    def __init__(self, max_pending=1000):
+        self.max_pending = max_pending
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        subscription = Subscription(asyncio.get_running_loop(), self.max_pending)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, deltas):
+        deltas = list(deltas)
+        if not deltas:
+            return
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            try:
+                subscription._loop.call_soon_threadsafe(subscription.offer, deltas)
+            except RuntimeError:
+                # Loop already closed; the stream's cleanup will unsubscribe it
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {"broker": type(self).__name__, "subscribers": len(self._subscriptions)}
+
+
+def _broker():
+    # EVENTS_BROKER=local keeps pub/sub inside this process. A shared broker
+    # (Redis pub/sub, Postgres LISTEN/NOTIFY) plugs in here with the same
+    # subscribe / unsubscribe / publish surface; until then deltas published
+    # by CLI jobs in other processes do not reach the API's subscribers.
+    kind = os.getenv("EVENTS_BROKER", "local")
+    if kind == "local":
+        return LocalBroker(max_pending=int(os.getenv("EVENTS_MAX_PENDING", "1000")))
+    raise ValueError(f"unknown EVENTS_BROKER {kind!r}")
+
+
+broker = _broker()
+
+
+def publish(deltas):
+    broker.publish(deltas)
@@ -0,0 +1,185 @@
+"""
+Columnar exports for model training and offline analysis.
+
+``export_datasets`` streams ``users``, ``loans`` and monthly per-user
+transaction features out of the database into hive-partitioned Parquet (or
+Arrow IPC) datasets. It needs the optional ``pyarrow`` package.
+
+``write_snapshot`` dumps the scoring indicator matrix as plain ``.npy``
+files that ``scoring.load_snapshot`` opens memory-mapped, so reading millions
+of feature rows is a page-cache lookup instead of a table scan.
+"""
+import argparse
+import datetime
+import json
+import os
+import time
+
+import numpy as np
+from sqlalchemy import Boolean, DateTime, Float, Integer, String, case, func, select
+
+from database import engine, init_db
+from lookups import code_of
+import models
+import scoring
+
+User = models.User
+
+SNAPSHOT_FILES = ("ids.npy", "features.npy", "meta.json")
+
+FORMATS = {"parquet": "parquet", "arrow": "ipc"}
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.dataset
+    except ImportError as exc:
+        raise ImportError("Parquet/Arrow export needs pyarrow: pip install pyarrow") from exc
+    return pyarrow
+
+
+def transaction_features_query():
+    """Per user and month: debit/credit totals and counts from the spend aggregates."""
+    agg = models.UserSpendAggregate
+    debit = agg.transaction_type_id == code_of("transaction_type", "Debit")
+    credit = agg.transaction_type_id == code_of("transaction_type", "Credit")
+    return (
+        select(
+            agg.user_id,
+            agg.period,
+            func.sum(case((debit, agg.total_amount), else_=0.0)).label("debit_total"),
+            func.sum(case((debit, agg.tx_count), else_=0)).label("debit_count"),
+            func.sum(case((credit, agg.total_amount), else_=0.0)).label("credit_total"),
+            func.sum(case((credit, agg.tx_count), else_=0)).label("credit_count"),
+            func.count(case((debit, agg.category_id))).label("debit_categories"),
+        )
+        .group_by(agg.user_id, agg.period)
+        .order_by(agg.period, agg.user_id)
+    )
+
+
+# dataset name -> (SELECT, hive partition column)
+DATASETS = {
+    "users": (lambda: select(User.__table__), "status"),
+    "loans": (lambda: select(models.Loan.__table__), "loan_type"),
+    "transaction_features": (transaction_features_query, "period"),
+}
+
+
+def _arrow_type(pa, sql_type):
+    if isinstance(sql_type, Boolean):
+        return pa.bool_()
+    if isinstance(sql_type, Integer):
+        return pa.int64()
+    if isinstance(sql_type, Float):
+        return pa.float64()
+    if isinstance(sql_type, DateTime):
+        return pa.timestamp("us")
+    if isinstance(sql_type, String):
+        return pa.string()
+    return pa.float64()
+
+
+def _batches(pa, conn, stmt, schema, chunk_size):
+    # Server-side cursor: one chunk of rows in memory at a time
+    result = conn.execution_options(stream_results=True).execute(stmt)
+    for rows in result.partitions(chunk_size):
+        columns = list(zip(*rows))
+        yield pa.RecordBatch.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+            schema=schema,
+        )
+
+
+def export_dataset(name, out_dir, fmt="parquet", bind=None, chunk_size=100_000):
+    """Write one dataset to ``out_dir/name``, replacing partitions it rewrites."""
+    pa = _pyarrow()
+    import pyarrow.dataset as ds
+
+    build, partition = DATASETS[name]
+    stmt = build()
+    schema = pa.schema([(c.name, _arrow_type(pa, c.type)) for c in stmt.selected_columns])
+    bind = bind or engine
+    with bind.connect() as conn:
+        ds.write_dataset(
+            _batches(pa, conn, stmt, schema, chunk_size),
+            os.path.join(out_dir, name),
+            schema=schema,
+            format=FORMATS[fmt],
+            partitioning=[partition],
+            partitioning_flavor="hive",
+            existing_data_behavior="delete_matching",
+        )
+
+
+def export_datasets(out_dir, names=tuple(DATASETS), fmt="parquet", bind=None, chunk_size=100_000):
+    for name in names:
+        export_dataset(name, out_dir, fmt, bind, chunk_size)
+
+
+def write_snapshot(path, bind=None, chunk_size=50_000):
+    """Write the (n_users, n_features) indicator matrix as memory-mappable .npy files.
+
+    Rows are filled in keyset chunks inside one read transaction, so the
+    snapshot is consistent and memory stays at one chunk. Files are written
+    under temporary names and swapped in, ``meta.json`` last.
+    """
+    bind = bind or engine
+    os.makedirs(path, exist_ok=True)
+    tmp = {name: os.path.join(path, name + ".tmp") for name in SNAPSHOT_FILES}
+    with bind.connect() as conn, conn.begin():
+        n_users = conn.execute(select(func.count(User.id))).scalar()
+        width = conn.execute(select(func.max(func.length(User.id)))).scalar() or 1
+        ids = np.lib.format.open_memmap(tmp["ids.npy"], mode="w+", dtype=f"S{width}", shape=(n_users,))
+        X = np.lib.format.open_memmap(
+            tmp["features.npy"], mode="w+", dtype=np.float64, shape=(n_users, len(scoring.FEATURES))
+        )
+        filled = 0
+        last_id = None
+        while filled < n_users:
+            rows = conn.execute(scoring.indicator_query(last_id, chunk_size)).all()
+            if not rows:
+                break
+            chunk_ids, chunk_X = scoring.to_arrays(rows)
+            ids[filled:filled + len(rows)] = [uid.encode() for uid in chunk_ids]
+            X[filled:filled + len(rows)] = chunk_X
+            filled += len(rows)
+            last_id = chunk_ids[-1]
+    ids.flush()
+    X.flush()
+    del ids, X
+
+    meta = {
+        "rows": filled,
+        "features": scoring.FEATURES,
+        "created_at": datetime.datetime.utcnow().isoformat(),
+    }
+    with open(tmp["meta.json"], "w") as f:
+        json.dump(meta, f, indent=2)
+    for name in SNAPSHOT_FILES:
+        os.replace(tmp[name], os.path.join(path, name))
+    return filled
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export columnar datasets and the scoring feature snapshot")
+    parser.add_argument("--out", default="exports", help="output directory")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="parquet")
+    parser.add_argument("--datasets", nargs="+", choices=sorted(DATASETS), default=sorted(DATASETS))
+    parser.add_argument("--snapshot-only", action="store_true", help="skip the Parquet/Arrow datasets")
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    args = parser.parse_args()
+    init_db()
+
+    if not args.snapshot_only:
+        started = time.perf_counter()
+        try:
+            export_datasets(args.out, args.datasets, args.format, chunk_size=args.chunk_size)
+        except ImportError as exc:
+            raise SystemExit(f"❌ {exc} (or use --snapshot-only)")
+        print(f"✅ Exported {', '.join(args.datasets)} as {args.format} in {time.perf_counter() - started:.2f}s")
+
+    started = time.perf_counter()
+    rows = write_snapshot(os.path.join(args.out, "snapshot"), chunk_size=args.chunk_size)
+    print(f"✅ Wrote feature snapshot ({rows} users x {len(scoring.FEATURES)} features) in {time.perf_counter() - started:.2f}s")
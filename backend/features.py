@@ -0,0 +1,397 @@
+"""
+Streaming feature pipeline: derives transaction-based stress indicators.
+
+Transactions are streamed in bulk and folded into per-user state that costs
+O(1) memory per user regardless of history length:
+
+* rolling-window counters are exponentially decayed sums with a time
+  constant equal to the window (30 / 180 days), kept relative to a shared
+  reference time that is rebased as the stream advances, so a whole batch is
+  applied with one ``np.add.at`` per signal;
+* salary credits keep the last credit time, a running mean interval and the
+  latest delay, updated in a short loop (there is about one per user-month).
+
+State is checkpointed to an ``.npz`` file together with the highest
+transaction id consumed, so ``--incremental`` runs only read new rows. The
+derived indicators are written back to ``users`` in bulk and logged to the
+change log for ``scoring.rescore_changed``. The state also remembers the
+values last written, so an incremental run re-evaluates every user as of now
+and writes back those whose windows decayed as well as those with new rows.
+"""
+import argparse
+import datetime
+import os
+import time
+
+import numpy as np
+from sqlalchemy import and_, bindparam, func, or_, select, update
+
+from cache import profile_cache
+import changes
+from database import engine, init_db
+from lookups import encoder
+import models
+import partitions
+
+User = models.User
+
+STATE_PATH = os.getenv("FEATURE_STATE_PATH", "feature_state.npz")
+
+DISCRETIONARY = ("Entertainment", "Shopping", "Travel")
+
+# (signal, window days, weight) - weight is "count" or "amount"
+SIGNALS = [
+    ("micro_credit_30", 30, "count"),   # Loan-category debits
+    ("high_risk_30", 30, "count"),      # Gambling debits
+    ("cash_30", 30, "count"),           # Cash withdrawals
+    ("cash_180", 180, "count"),
+    ("discretionary_30", 30, "amount"),
+    ("discretionary_180", 180, "amount"),
+]
+SIGNAL_NAMES = [name for name, _, _ in SIGNALS]
+_TAU = np.array([window for _, window, _ in SIGNALS], dtype=np.float64)
+
+# Rebase the shared reference time once the stream is this far past it
+REBASE_AFTER_DAYS = 7.0
+
+SALARY_INTERVAL_DAYS = 30.0
+SALARY_SMOOTHING = 0.3
+
+# User columns written back, in the order of FeatureState.written
+INDICATOR_COLUMNS = [
+    "micro_credit_tx_count",
+    "high_risk_merchant_tx_count",
+    "atm_withdrawal_velocity",
+    "discretionary_spend_reduction",
+    "salary_credit_variance_days",
+]
+
+def _tx_columns(table):
+    c = table.c
+    return (c.id, c.user_id, c.timestamp, c.amount, c.category_id, c.payment_mode_id, c.transaction_type_id)
+
+
+def to_days(timestamps):
+    """datetimes -> float days since the epoch."""
+    return np.array(timestamps, dtype="datetime64[us]").astype(np.int64) / 86_400e6
+
+
+class FeatureState:
+    def __init__(self):
+        self.index = {}
+        self.ids = []
+        self.counters = np.zeros((0, len(SIGNALS)))
+        self.first_seen = np.zeros(0)
+        self.last_salary = np.zeros(0)
+        self.salary_interval = np.zeros(0)
+        self.salary_delay = np.zeros(0)
+        # Indicator values as last written to ``users``; NaN = never written
+        self.written = np.zeros((0, len(INDICATOR_COLUMNS)))
+        self.t_ref = None
+        self.last_tx_id = 0
+
+    # -- persistence -------------------------------------------------------
+
+    def save(self, path=STATE_PATH):
+        tmp = path + ".tmp.npz"
+        np.savez(
+            tmp,
+            ids=np.array(self.ids, dtype=str),
+            counters=self.counters,
+            first_seen=self.first_seen,
+            last_salary=self.last_salary,
+            salary_interval=self.salary_interval,
+            salary_delay=self.salary_delay,
+            written=self.written,
+            t_ref=np.float64(np.nan if self.t_ref is None else self.t_ref),
+            last_tx_id=np.int64(self.last_tx_id),
+            signals=np.array(SIGNAL_NAMES, dtype=str),
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path=STATE_PATH):
+        state = cls()
+        if not os.path.exists(path):
+            return state
+        with np.load(path) as data:
+            if data["signals"].tolist() != SIGNAL_NAMES:
+                raise ValueError(f"{path} was built for different signals; run a full backfill")
+            state.ids = data["ids"].tolist()
+            state.index = {uid: i for i, uid in enumerate(state.ids)}
+            state.counters = data["counters"]
+            state.first_seen = data["first_seen"]
+            state.last_salary = data["last_salary"]
+            state.salary_interval = data["salary_interval"]
+            state.salary_delay = data["salary_delay"]
+            # Checkpoints from before ``written`` existed rewrite everyone once
+            state.written = (
+                data["written"] if "written" in data.files
+                else np.full((len(state.ids), len(INDICATOR_COLUMNS)), np.nan)
+            )
+            t_ref = float(data["t_ref"])
+            state.t_ref = None if np.isnan(t_ref) else t_ref
+            state.last_tx_id = int(data["last_tx_id"])
+        return state
+
+    @classmethod
+    def merge(cls, states, last_tx_id):
+        """Combine states built over disjoint user sets (e.g. parallel shards)."""
+        merged = cls()
+        refs = [s.t_ref for s in states if s.t_ref is not None]
+        merged.t_ref = max(refs) if refs else None
+        for s in states:
+            if s.t_ref is not None and s.t_ref != merged.t_ref:
+                s.counters = s.counters * np.exp(-(merged.t_ref - s.t_ref) / _TAU)
+        merged.ids = [uid for s in states for uid in s.ids]
+        merged.index = {uid: i for i, uid in enumerate(merged.ids)}
+        merged.counters = np.vstack([merged.counters] + [s.counters for s in states])
+        merged.written = np.vstack([merged.written] + [s.written for s in states])
+        for name in ("first_seen", "last_salary", "salary_interval", "salary_delay"):
+            setattr(merged, name, np.concatenate([getattr(merged, name)] + [getattr(s, name) for s in states]))
+        merged.last_tx_id = last_tx_id
+        return merged
+
+    # -- stream processing -------------------------------------------------
+
+    def _user_indices(self, user_ids):
+        unique, inverse = np.unique(np.asarray(user_ids, dtype=object), return_inverse=True)
+        new = [uid for uid in unique.tolist() if uid not in self.index]
+        if new:
+            for uid in new:
+                self.index[uid] = len(self.ids)
+                self.ids.append(uid)
+            grow = len(new)
+            self.counters = np.vstack([self.counters, np.zeros((grow, len(SIGNALS)))])
+            self.first_seen = np.concatenate([self.first_seen, np.full(grow, np.nan)])
+            self.last_salary = np.concatenate([self.last_salary, np.full(grow, np.nan)])
+            self.salary_interval = np.concatenate([self.salary_interval, np.full(grow, SALARY_INTERVAL_DAYS)])
+            self.salary_delay = np.concatenate([self.salary_delay, np.zeros(grow)])
+            self.written = np.vstack([self.written, np.full((grow, len(INDICATOR_COLUMNS)), np.nan)])
+        lookup = np.array([self.index[uid] for uid in unique.tolist()], dtype=np.int64)
+        return lookup[inverse]
+
+    def _rebase(self, t):
+        if self.t_ref is None:
+            self.t_ref = t
+        elif t - self.t_ref > REBASE_AFTER_DAYS:
+            self.counters *= np.exp(-(t - self.t_ref) / _TAU)
+            self.t_ref = t
+
+    def apply(self, rows):
+        """Fold one batch of ``_tx_columns`` rows into the state; returns the state rows touched."""
+        if not rows:
+            return np.empty(0, dtype=np.int64)
+        tx_id, user_id, ts, amount, category, mode, tx_type = (np.array(col, dtype=object) for col in zip(*rows))
+        t = to_days(ts.tolist())
+        amount = amount.astype(np.float64)
+        # Masks compare lookup codes; a name never seen yet matches nothing
+        category, mode, tx_type = (col.astype(np.int64) for col in (category, mode, tx_type))
+        code = lambda field, name: encoder.code(field, name) or -1
+        idx = self._user_indices(user_id)
+        self._rebase(t.max())
+
+        # fmin skips the NaN of users seen for the first time
+        np.fmin.at(self.first_seen, idx, t)
+
+        debit = tx_type == code("transaction_type", "Debit")
+        masks = {
+            "micro_credit": debit & (category == code("category", "Loan")),
+            "high_risk": debit & (category == code("category", "Gambling")),
+            "cash": debit & (mode == code("payment_mode", "Cash")),
+            "discretionary": debit & np.isin(category, encoder.codes("category", DISCRETIONARY)),
+        }
+        for col, (name, window, weight) in enumerate(SIGNALS):
+            mask = masks[name.rsplit("_", 1)[0]]
+            if not mask.any():
+                continue
+            # Contribution relative to the reference time; late rows weigh less
+            w = np.exp((t[mask] - self.t_ref) / window)
+            if weight == "amount":
+                w *= amount[mask]
+            np.add.at(self.counters[:, col], idx[mask], w)
+
+        salary = (tx_type == code("transaction_type", "Credit")) & (category == code("category", "Salary"))
+        order = np.flatnonzero(salary)[np.argsort(t[salary], kind="stable")]
+        for i, when in zip(idx[order].tolist(), t[order].tolist()):
+            last = self.last_salary[i]
+            if not np.isnan(last) and when > last:
+                interval = when - last
+                self.salary_delay[i] = max(0.0, interval - self.salary_interval[i])
+                self.salary_interval[i] += SALARY_SMOOTHING * (interval - self.salary_interval[i])
+            if np.isnan(last) or when > last:
+                self.last_salary[i] = when
+
+        self.last_tx_id = max(self.last_tx_id, int(max(tx_id)))
+        return np.unique(idx)
+
+    # -- indicators --------------------------------------------------------
+
+    def _rates(self, as_of, users):
+        """Per-day rate of every signal, corrected for histories shorter than the window."""
+        decayed = self.counters[users] * np.exp(-(as_of - self.t_ref) / _TAU)
+        history = np.maximum(as_of - self.first_seen[users], 1.0)[:, None]
+        coverage = _TAU * (1 - np.exp(-history / _TAU))
+        return decayed / coverage
+
+    def indicators(self, as_of, users):
+        """Derived User columns for state rows ``users`` as of ``as_of`` (days)."""
+        rates = self._rates(as_of, users)
+        col = {name: i for i, name in enumerate(SIGNAL_NAMES)}
+        with np.errstate(divide="ignore", invalid="ignore"):
+            atm = np.where(rates[:, col["cash_180"]] > 0, rates[:, col["cash_30"]] / rates[:, col["cash_180"]], 1.0)
+            disc = np.where(
+                rates[:, col["discretionary_180"]] > 0,
+                1 - rates[:, col["discretionary_30"]] / rates[:, col["discretionary_180"]],
+                0.0,
+            )
+        overdue = np.nan_to_num(as_of - self.last_salary[users] - self.salary_interval[users], nan=0.0)
+        return {
+            # Decayed sum at time-constant W approximates the W-day count
+            "micro_credit_tx_count": np.rint(rates[:, col["micro_credit_30"]] * 30).astype(np.int64),
+            "high_risk_merchant_tx_count": np.rint(rates[:, col["high_risk_30"]] * 30).astype(np.int64),
+            "atm_withdrawal_velocity": np.round(atm, 2),
+            "discretionary_spend_reduction": np.round(np.clip(disc, 0.0, 1.0) * 100, 1),
+            "salary_credit_variance_days": np.rint(np.maximum(self.salary_delay[users], overdue)).astype(np.int64),
+        }
+
+
+    def stale(self, as_of):
+        """State rows whose indicators as of ``as_of`` differ from the values last written."""
+        values = self.indicators(as_of, np.arange(len(self.ids)))
+        current = np.column_stack([values[c] for c in INDICATOR_COLUMNS]).astype(np.float64)
+        return np.flatnonzero(~np.all(current == self.written, axis=1))
+
+
+def _stream_full(conn, chunk_size):
+    """All transactions in (timestamp, id) order, keyset-chunked, oldest partition first."""
+    for table in partitions.sources(conn):
+        c = table.c
+        last = None
+        while True:
+            stmt = select(*_tx_columns(table)).order_by(c.timestamp, c.id).limit(chunk_size)
+            if last is not None:
+                stmt = stmt.where(or_(
+                    c.timestamp > last[0],
+                    and_(c.timestamp == last[0], c.id > last[1]),
+                ))
+            rows = conn.execute(stmt).all()
+            if rows:
+                yield rows
+            if len(rows) < chunk_size:
+                break
+            last = (rows[-1].timestamp, rows[-1].id)
+
+
+def _stream_new(conn, after_id, chunk_size):
+    """Transactions with id > ``after_id``; arrival order, sorted by time per chunk."""
+    # Rows rolled into a month partition keep their ids, so every source is checked
+    for table in partitions.sources(conn):
+        c = table.c
+        last_id = after_id
+        while True:
+            stmt = select(*_tx_columns(table)).where(c.id > last_id).order_by(c.id).limit(chunk_size)
+            rows = conn.execute(stmt).all()
+            if rows:
+                yield sorted(rows, key=lambda r: (r.timestamp, r.id))
+            if len(rows) < chunk_size:
+                break
+            last_id = rows[-1].id
+
+
+def stream_users(conn, lo, hi, max_tx_id, chunk_size):
+    """Transactions of users in (lo, hi] up to ``max_tx_id``, in (user, time) order per partition.
+
+    Partitions are read oldest first, so each user's rows still arrive in time order.
+    """
+    for table in partitions.sources(conn):
+        c = table.c
+        last = None
+        while True:
+            stmt = (
+                select(*_tx_columns(table))
+                .where(c.id <= max_tx_id)
+                .order_by(c.user_id, c.timestamp, c.id)
+                .limit(chunk_size)
+            )
+            if lo is not None:
+                stmt = stmt.where(c.user_id > lo)
+            if hi is not None:
+                stmt = stmt.where(c.user_id <= hi)
+            if last is not None:
+                stmt = stmt.where(or_(
+                    c.user_id > last[0],
+                    and_(c.user_id == last[0], c.timestamp > last[1]),
+                    and_(c.user_id == last[0], c.timestamp == last[1], c.id > last[2]),
+                ))
+            rows = conn.execute(stmt).all()
+            if rows:
+                yield rows
+            if len(rows) < chunk_size:
+                break
+            last = (rows[-1].user_id, rows[-1].timestamp, rows[-1].id)
+
+
+def write_indicators(conn, state, users, as_of):
+    """Bulk UPDATE the derived columns for state rows ``users``; returns the ids written."""
+    values = state.indicators(as_of, users)
+    ids = [state.ids[i] for i in users.tolist()]
+    columns = INDICATOR_COLUMNS
+    state.written[users] = np.column_stack([values[c] for c in columns])
+    table = User.__table__
+    stmt = update(table).where(table.c.id == bindparam("b_id")).values(
+        {c: bindparam(f"b_{c}") for c in columns}
+    )
+    conn.execute(stmt, [
+        {"b_id": uid, **{f"b_{c}": v for c, v in zip(columns, row)}}
+        for uid, row in zip(ids, zip(*(values[c].tolist() for c in columns)))
+    ])
+    return ids
+
+
+def run(full=False, bind=None, chunk_size=100_000, write_chunk=10_000, path=STATE_PATH, as_of=None):
+    """Backfill (``full``) or incrementally update features; returns users written."""
+    bind = bind or engine
+    # Without a checkpoint there is nothing to increment from
+    full = full or not os.path.exists(path)
+    state = FeatureState() if full else FeatureState.load(path)
+    touched = set()
+    with bind.connect() as conn:
+        batches = _stream_full(conn, chunk_size) if full else _stream_new(conn, state.last_tx_id, chunk_size)
+        for rows in batches:
+            touched.update(state.apply(rows).tolist())
+
+    # Windows are evaluated as of now, so quiet users decay out of them: an
+    # incremental run also rewrites every user whose decayed value moved
+    as_of = to_days([as_of or datetime.datetime.utcnow()])[0]
+    if full:
+        users = np.arange(len(state.ids))
+    else:
+        users = np.union1d(np.array(sorted(touched), dtype=np.int64), state.stale(as_of))
+    written = 0
+    for lo in range(0, len(users), write_chunk):
+        with bind.begin() as conn:
+            ids = write_indicators(conn, state, users[lo:lo + write_chunk], as_of)
+            changes.record_changes(conn, ids, "features")
+        profile_cache.invalidate_many(ids)
+        written += len(ids)
+    # Checkpoint only after the write-back, so a crash replays rather than skips
+    state.save(path)
+    if written:
+        profile_cache.clear(broadcast=True)
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Derive transaction-based stress indicators")
+    parser.add_argument("--full", action="store_true", help="rebuild state from every transaction")
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    parser.add_argument("--state", default=STATE_PATH, help="checkpoint file")
+    args = parser.parse_args()
+    init_db()
+
+    full = args.full or not os.path.exists(args.state)
+    started = time.perf_counter()
+    written = run(full=full, chunk_size=args.chunk_size, path=args.state)
+    print(f"✅ Derived indicators for {written} users in {time.perf_counter() - started:.2f}s "
+          f"({'full backfill' if full else 'incremental'}); run scoring.py --incremental to rescore")
@@ -0,0 +1,147 @@
+"""
+Pincode-level geo risk.
+
+``pincode_index_query`` rolls users and their loan exposure up per pincode
+in one GROUP BY. ``flag_pincodes`` is the disaster-event path: it flips a geo
+flag for every user in the affected pincodes with a single set-based UPDATE,
+logs that cohort to the change log in the same transaction, and returns
+the flipped ids so ``apply_event`` rescores exactly those users with
+``scoring.score_users``. The change log is left to the batch job.
+"""
+import argparse
+
+from sqlalchemy import case, func, or_, select, update
+
+import changes
+from database import engine, init_db
+import models
+import scoring
+
+User = models.User
+Loan = models.Loan
+
+GEO_FLAGS = ("disaster_zone_flag", "infrastructure_failure_flag")
+
+# Dashboard bands, as in /api/analytics/risk
+
+
+def _loan_totals():
+    """Outstanding and EMI per user, pre-aggregated so the user join stays 1:1."""
+    return (
+        select(
+            Loan.user_id,
+            func.sum(Loan.outstanding_amount).label("outstanding"),
+            func.sum(Loan.monthly_emi).label("monthly_emi"),
+        )
+        .group_by(Loan.user_id)
+        .subquery()
+    )
+
+
+def pincode_index_query(pincodes=None):
+    """Users, exposure, score bands and geo flags per pincode."""
+    loans = _loan_totals()
+    score = User.current_risk_score
+    stmt = (
+        select(
+            User.pincode,
+            func.count(User.id).label("users"),
+            func.coalesce(func.sum(loans.c.outstanding), 0.0).label("exposure"),
+            func.coalesce(func.sum(loans.c.monthly_emi), 0.0).label("monthly_emi"),
+            func.avg(score).label("avg_score"),
+            func.avg(User.final_score).label("avg_final_score"),
+            func.sum(case((score >= scoring.CRITICAL_SCORE, 1), else_=0)).label("critical"),
+            func.sum(case((score >= scoring.CRITICAL_SCORE, 0), (score >= scoring.AT_RISK_SCORE, 1), else_=0)).label("at_risk"),
+            func.sum(case((score < scoring.AT_RISK_SCORE, 1), else_=0)).label("safe"),
+            func.sum(case((User.disaster_zone_flag.is_(True), 1), else_=0)).label("disaster_zone"),
+            func.sum(case((User.infrastructure_failure_flag.is_(True), 1), else_=0)).label("infrastructure_failure"),
+        )
+        .outerjoin(loans, loans.c.user_id == User.id)
+        .group_by(User.pincode)
+    )
+    if pincodes is not None:
+        stmt = stmt.where(User.pincode.in_(pincodes))
+    return stmt
+
+
+def index_row(row):
+    return {
+        "pincode": row.pincode,
+        "users": row.users,
+        "exposure": round(row.exposure, 2),
+        "monthly_emi": round(row.monthly_emi, 2),
+        "avg_score": round(row.avg_score, 1) if row.avg_score is not None else None,
+        "avg_final_score": round(row.avg_final_score, 1) if row.avg_final_score is not None else None,
+        "bands": {"critical": row.critical, "at_risk": row.at_risk, "safe": row.safe},
+        "flags": {"disaster_zone": row.disaster_zone, "infrastructure_failure": row.infrastructure_failure},
+    }
+
+
+def impacted_exposure(conn, pincodes):
+    """(users, outstanding, monthly EMI) across the given pincodes."""
+    loans = _loan_totals()
+    users, outstanding, emi = conn.execute(
+        select(
+            func.count(User.id),
+            func.coalesce(func.sum(loans.c.outstanding), 0.0),
+            func.coalesce(func.sum(loans.c.monthly_emi), 0.0),
+        )
+        .outerjoin(loans, loans.c.user_id == User.id)
+        .where(User.pincode.in_(pincodes))
+    ).one()
+    return users, outstanding, emi
+
+
+def flag_pincodes(conn, pincodes, flag="disaster_zone_flag", active=True):
+    """Set ``flag`` to ``active`` for every user in ``pincodes``; returns the changed ids.
+
+    Only users whose flag actually flips are updated and logged for rescoring.
+    """
+    if flag not in GEO_FLAGS:
+        raise ValueError(f"flag must be one of {GEO_FLAGS}")
+    column = getattr(User, flag)
+    needs_change = [User.pincode.in_(pincodes)]
+    if active:
+        needs_change.append(or_(column.is_(None), column.is_(False)))
+    else:
+        needs_change.append(column.is_(True))
+
+    # Log first: once the UPDATE lands the cohort no longer matches
+    changes.record_cohort(conn, select(User.id).where(*needs_change), "geo")
+    users = User.__table__
+    stmt = update(users).where(*needs_change).values({flag: active}).returning(users.c.id)
+    return conn.execute(stmt).scalars().all()
+
+
+def apply_event(pincodes, flag="disaster_zone_flag", active=True, rescore=True, bind=None):
+    """Flag the pincodes, rescore the affected cohort and report the exposure hit."""
+    bind = bind or engine
+    pincodes = sorted(set(pincodes))
+    with bind.begin() as conn:
+        flagged = flag_pincodes(conn, pincodes, flag, active)
+        users, outstanding, emi = impacted_exposure(conn, pincodes)
+    rescored = scoring.score_users(flagged, bind) if rescore and flagged else 0
+    return {
+        "pincodes": pincodes,
+        "flag": flag,
+        "active": active,
+        "users_in_zone": users,
+        "users_flagged": len(flagged),
+        "users_rescored": rescored,
+        "impacted_exposure": round(outstanding, 2),
+        "impacted_monthly_emi": round(emi, 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Flag (or clear) a geo event for a set of pincodes")
+    parser.add_argument("pincodes", nargs="+")
+    parser.add_argument("--flag", choices=GEO_FLAGS, default="disaster_zone_flag")
+    parser.add_argument("--clear", action="store_true", help="lift the flag instead of setting it")
+    parser.add_argument("--no-rescore", action="store_true")
+    args = parser.parse_args()
+    init_db()
+
+    result = apply_event(args.pincodes, args.flag, not args.clear, not args.no_rescore)
+    print(f"✅ {result['users_flagged']} of {result['users_in_zone']} users in {len(result['pincodes'])} pincodes updated, "
+          f"{result['users_rescored']} rescored; exposure ₹{result['impacted_exposure']:,.0f}")
@@ -0,0 +1,182 @@
+"""
+Streaming bulk ingestion of bank feeds.
+
+Reads transaction, loan, account or user records from CSV or JSONL, converts them
+to column types and inserts them in fixed-size chunks with Core
+``insert()`` executemany. Only one chunk is held in memory at a time. Each
+chunk commits together with its checkpoint row in ``ingest_checkpoints``, so
+an interrupted run can be restarted and resumes after the last committed
+chunk without duplicating rows.
+
+    python ingest.py transactions feed.csv --chunk-size 20000
+"""
+import argparse
+import csv
+import datetime
+import itertools
+import json
+import os
+import time
+
+from sqlalchemy import insert, select, update
+
+from database import engine, init_db
+import aggregates
+from cache import profile_cache
+import changes
+import lookups
+import models
+
+TABLES = {
+    "users": models.User.__table__,
+    "transactions": models.Transaction.__table__,
+    "loans": models.Loan.__table__,
+    "accounts": models.Account.__table__,
+}
+
+
+def _parse_datetime(value):
+    if isinstance(value, datetime.datetime):
+        return value
+    return datetime.datetime.fromisoformat(value)
+
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "yes", "y")
+
+
+def _converter(column):
+    python_type = column.type.python_type
+    if python_type is datetime.datetime:
+        return _parse_datetime
+    if python_type is bool:
+        return _parse_bool
+    return python_type
+
+
+_CONVERTERS = {
+    kind: {c.name: _converter(c) for c in table.columns}
+    for kind, table in TABLES.items()
+}
+# Feeds carry the dictionary-encoded columns as strings; insert_rows encodes them
+_CONVERTERS["transactions"].update({field: str for field in lookups.FIELDS})
+
+
+def read_records(path, fmt=None):
+    """Yield raw dict records from a CSV or JSONL file, one at a time."""
+    fmt = fmt or ("jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv")
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def convert(kind, record):
+    """Keep known columns and coerce them; blank values become NULL."""
+    converters = _CONVERTERS[kind]
+    row = {}
+    for key, value in record.items():
+        convert_value = converters.get(key)
+        if convert_value is None:
+            continue
+        row[key] = None if value is None or value == "" else convert_value(value)
+    return row
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def insert_rows(conn, kind, rows, maintain_aggregates=True):
+    """executemany INSERT of dict rows, keeping derived tables in step.
+
+    Transaction rows have their string fields swapped for lookup codes in place.
+
+    Bulk loaders that rebuild the aggregates afterwards can pass
+    ``maintain_aggregates=False`` to skip the per-chunk upserts.
+    """
+    if not rows:
+        return
+    table = TABLES[kind]
+    if kind == "transactions":
+        rows = lookups.encoder.encode_rows(conn, rows)
+    # executemany needs one parameter shape, so group rows by their key set
+    shapes = {}
+    for row in rows:
+        shapes.setdefault(tuple(sorted(row)), []).append(row)
+    for group in shapes.values():
+        conn.execute(insert(table), group)
+    if kind == "transactions" and maintain_aggregates:
+        aggregates.apply_transactions(conn, rows)
+
+
+def _rows_done(conn, source):
+    cp = models.IngestCheckpoint.__table__
+    done = conn.execute(select(cp.c.rows_done).where(cp.c.source == source)).scalar()
+    if done is None:
+        conn.execute(insert(cp).values(source=source, rows_done=0))
+        return 0
+    return done
+
+
+def _save_checkpoint(conn, source, kind, rows_done):
+    cp = models.IngestCheckpoint.__table__
+    conn.execute(
+        update(cp)
+        .where(cp.c.source == source)
+        .values(kind=kind, rows_done=rows_done, updated_at=datetime.datetime.utcnow())
+    )
+
+
+def ingest(kind, path, fmt=None, chunk_size=10_000, source=None, bind=None, progress=print):
+    """Stream ``path`` into ``kind``; returns (rows inserted this run, seconds)."""
+    bind = bind or engine
+    source = source or os.path.abspath(path)
+    with bind.begin() as conn:
+        rows_done = _rows_done(conn, source)
+    if rows_done:
+        progress(f"↪️  Resuming {source} after {rows_done:,} committed rows")
+
+    records = itertools.islice(read_records(path, fmt), rows_done, None)
+    started = time.perf_counter()
+    inserted = 0
+    for chunk in chunked(records, chunk_size):
+        rows = [convert(kind, r) for r in chunk]
+        user_ids = {r.get("id" if kind == "users" else "user_id") for r in rows}
+        with bind.begin() as conn:
+            insert_rows(conn, kind, rows)
+            changes.record_changes(conn, user_ids, "ingest")
+            rows_done += len(rows)
+            _save_checkpoint(conn, source, kind, rows_done)
+        # Only after commit, so no reader can re-cache the pre-chunk profile
+        profile_cache.invalidate_many(user_ids)
+        inserted += len(rows)
+        elapsed = time.perf_counter() - started
+        progress(f"   • {rows_done:,} rows committed ({inserted / max(elapsed, 1e-9):,.0f} rows/sec)")
+    if inserted:
+        profile_cache.clear(broadcast=True)
+    return inserted, time.perf_counter() - started
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream a bank feed into the database")
+    parser.add_argument("kind", choices=sorted(TABLES))
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="default: from file extension")
+    parser.add_argument("--chunk-size", type=int, default=10_000)
+    parser.add_argument("--source", help="checkpoint key (default: absolute path)")
+    args = parser.parse_args()
+
+    init_db()
+    count, elapsed = ingest(args.kind, args.path, args.format, args.chunk_size, args.source)
+    print(f"✅ Ingested {count:,} {args.kind} in {elapsed:.2f}s ({count / max(elapsed, 1e-9):,.0f} rows/sec)")
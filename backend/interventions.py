@@ -0,0 +1,209 @@
+"""
+Declarative intervention engine.
+
+Policies live in ``RULES``, a plain table of conditions and outcomes. A rule
+can match on the discovery ``reason``, the user's ``status``, a score band
+and indicator thresholds. The table is compiled once into a ``RuleBook``
+that indexes rules by reason. Evaluation is vectorised: for a batch of users
+the candidate rules for the reason are applied as NumPy masks in priority
+order, and each user takes the first rule that matches.
+"""
+import datetime
+import operator
+
+import numpy as np
+from sqlalchemy import bindparam, func, insert, select, update
+
+import models
+from scoring import AT_RISK_SCORE, CRITICAL_SCORE
+
+User = models.User
+
+# Score the bands are evaluated against
+SCORE_COLUMN = "current_risk_score"
+
+# Evaluated highest priority first. Omitted conditions match anything;
+# "when" maps an indicator column to (operator, threshold).
+RULES = [
+    {
+        "id": "job-loss", "priority": 100, "reason": "job",
+        "action": "Emergency Protocol", "type": "structural", "set_status": "Emergency",
+        "message": "Income verification requested. Late fees waived for 30 days.",
+    },
+    {
+        "id": "salary-delay", "priority": 90, "reason": "salary",
+        "action": "Grace Period", "type": "liquidity",
+        "message": "Payment date shifted by 7 days. No penalty.",
+    },
+    {
+        "id": "disaster-relief", "priority": 80, "when": {"disaster_zone_flag": ("==", True)},
+        "action": "Disaster Moratorium", "type": "geo",
+        "message": "EMI moratorium offered for 90 days due to regional disaster.",
+    },
+    {
+        "id": "critical-liquidity", "priority": 70, "status": ["Critical", "Emergency"],
+        "when": {"liquidity_coverage_ratio": ("<", 1.0)},
+        "action": "Restructure Offer", "type": "liquidity",
+        "message": "Tenure extension offered to lower the monthly EMI.",
+    },
+    {
+        "id": "critical-debt-spiral", "priority": 65, "status": ["Critical", "Emergency"],
+        "when": {"micro_credit_tx_count": (">=", 8)},
+        "action": "Debt Consolidation", "type": "debt",
+        "message": "Consolidation loan offered to retire high-cost micro-credit.",
+    },
+    {
+        "id": "critical-outreach", "priority": 50, "status": ["Critical", "Emergency"], "min_score": CRITICAL_SCORE,
+        "action": "Relationship Manager Call", "type": "outreach",
+        "message": "Relationship manager call scheduled within 48 hours.",
+    },
+    {
+        "id": "warning-nudge", "priority": 30, "status": ["Warning"], "min_score": AT_RISK_SCORE, "max_score": CRITICAL_SCORE - 1,
+        "action": "Financial Wellness Nudge", "type": "outreach",
+        "message": "Budgeting tips and auto-debit reminder sent.",
+    },
+    {
+        "id": "default-hold", "priority": 0,
+        "action": "Hold", "message": "Analyzing inputs...",
+    },
+]
+
+_OPERATORS = {
+    "<": operator.lt, "<=": operator.le, ">": operator.gt,
+    ">=": operator.ge, "==": operator.eq, "!=": operator.ne,
+}
+
+
+class CompiledRule:
+    def __init__(self, spec):
+        self.id = spec["id"]
+        self.priority = spec.get("priority", 0)
+        self.reason = spec.get("reason")
+        self.statuses = np.array(spec["status"], dtype=object) if spec.get("status") else None
+        self.min_score = spec.get("min_score")
+        self.max_score = spec.get("max_score")
+        self.predicates = [(column, _OPERATORS[op], value) for column, (op, value) in spec.get("when", {}).items()]
+        self.outcome = {"action": spec["action"], "message": spec["message"]}
+        if spec.get("type"):
+            self.outcome["type"] = spec["type"]
+        self.set_status = spec.get("set_status")
+
+    def mask(self, columns):
+        """Boolean mask of the users in ``columns`` this rule matches."""
+        n = len(columns["id"])
+        matched = np.ones(n, dtype=bool)
+        if self.statuses is not None:
+            matched &= np.isin(columns["status"], self.statuses)
+        score = columns[SCORE_COLUMN]
+        if self.min_score is not None:
+            matched &= score >= self.min_score
+        if self.max_score is not None:
+            matched &= score <= self.max_score
+        for column, op, value in self.predicates:
+            matched &= op(columns[column], value)
+        return matched
+
+
+class RuleBook:
+    """Rules compiled once and indexed by reason.
+
+    ``candidates(reason)`` is the priority-ordered union of the rules for that
+    reason and the reason-agnostic rules, memoised per reason.
+    """
+
+    def __init__(self, specs):
+        self.rules = sorted((CompiledRule(s) for s in specs), key=lambda r: -r.priority)
+        self.by_reason = {}
+        for rule in self.rules:
+            self.by_reason.setdefault(rule.reason, []).append(rule)
+        self._candidates = {}
+        # Columns any rule reads, loaded once per batch
+        self.columns = sorted(
+            {"status", SCORE_COLUMN} | {c for r in self.rules for c, _, _ in r.predicates}
+        )
+
+    def candidates(self, reason):
+        if reason not in self._candidates:
+            specific = self.by_reason.get(reason, []) if reason is not None else []
+            generic = self.by_reason.get(None, [])
+            self._candidates[reason] = sorted(specific + generic, key=lambda r: -r.priority)
+        return self._candidates[reason]
+
+    def evaluate(self, columns, reason=None):
+        """Index into ``candidates(reason)`` of the winning rule per user (-1 = none)."""
+        rules = self.candidates(reason)
+        choice = np.full(len(columns["id"]), -1, dtype=np.int64)
+        for i, rule in enumerate(rules):
+            open_rows = choice < 0
+            if not open_rows.any():
+                break
+            choice[open_rows & rule.mask(columns)] = i
+        return choice
+
+
+RULEBOOK = RuleBook(RULES)
+
+
+def load_columns(conn, user_select):
+    """Columnar arrays of the rule inputs for the users a SELECT of ids returns."""
+    ids = user_select.subquery()
+    cols = [getattr(User, name) for name in RULEBOOK.columns]
+    rows = conn.execute(select(User.id, *cols).join(ids, ids.c.id == User.id).order_by(User.id)).all()
+    columns = {"id": np.array([r[0] for r in rows], dtype=object)}
+    for i, name in enumerate(RULEBOOK.columns, start=1):
+        values = [r[i] for r in rows]
+        if name == "status":
+            columns[name] = np.array(values, dtype=object)
+        else:
+            # NULL indicators never satisfy a threshold
+            columns[name] = np.array([np.nan if v is None else float(v) for v in values], dtype=np.float64)
+    return columns
+
+
+def apply(conn, user_select, reason=None, dry_run=False):
+    """Evaluate the rule book for a cohort and persist the chosen actions.
+
+    Returns one ``{"user_id", "rule_id", "status", **outcome}`` dict per user.
+    """
+    columns = load_columns(conn, user_select)
+    rules = RULEBOOK.candidates(reason)
+    choice = RULEBOOK.evaluate(columns, reason)
+
+    now = datetime.datetime.utcnow()
+    results, log_rows, status_rows = [], [], []
+    for user_id, status, idx in zip(columns["id"].tolist(), columns["status"].tolist(), choice.tolist()):
+        if idx < 0:
+            continue
+        rule = rules[idx]
+        new_status = rule.set_status or status
+        results.append({"user_id": user_id, "rule_id": rule.id, "status": new_status, **rule.outcome})
+        log_rows.append({
+            "user_id": user_id, "rule_id": rule.id, "reason": reason,
+            "action": rule.outcome["action"], "message": rule.outcome["message"],
+            "type": rule.outcome.get("type"), "created_at": now,
+        })
+        if new_status != status:
+            status_rows.append({"b_id": user_id, "b_status": new_status})
+
+    if not dry_run:
+        if log_rows:
+            conn.execute(insert(models.Intervention.__table__), log_rows)
+        if status_rows:
+            users = User.__table__
+            conn.execute(
+                update(users).where(users.c.id == bindparam("b_id")).values(status=bindparam("b_status")),
+                status_rows,
+            )
+    return results
+
+
+def last_actions_query(user_ids):
+    """(user_id, action) of the most recent intervention for each user."""
+    iv = models.Intervention
+    latest = (
+        select(func.max(iv.id).label("id"))
+        .where(iv.user_id.in_(user_ids))
+        .group_by(iv.user_id)
+        .subquery()
+    )
+    return select(iv.user_id, iv.action).join(latest, latest.c.id == iv.id)
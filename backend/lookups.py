@@ -0,0 +1,226 @@
+"""
+Dictionary encoding of the repetitive transaction string columns.
+
+``category``, ``merchant_name``, ``payment_mode``, ``transaction_type`` and
+``currency`` are stored on ``transactions`` as small integer codes into
+append-only lookup tables. ``encoder`` keeps both directions in memory; since
+a code never changes meaning once assigned, cached entries never go stale and
+only a miss touches the database.
+
+Codes assigned inside a caller's transaction are cached only once that
+transaction commits, so a rolled-back chunk cannot leave phantom codes behind.
+
+``migrate`` converts a database created with the old string columns; it runs
+from ``init_db`` and can be invoked directly:
+
+    python lookups.py --migrate
+"""
+import argparse
+import threading
+import time
+
+from sqlalchemy import MetaData, Table, event, func, inspect, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Engine
+
+from database import Base, engine
+import models
+
+UNKNOWN = "Unknown"
+
+# string field -> (code column on transactions, lookup model, value for missing input)
+FIELDS = {
+    "category": ("category_id", models.TxCategory, UNKNOWN),
+    "merchant_name": ("merchant_id", models.Merchant, UNKNOWN),
+    "payment_mode": ("payment_mode_id", models.PaymentMode, UNKNOWN),
+    "transaction_type": ("transaction_type_id", models.TransactionType, UNKNOWN),
+    "currency": ("currency_id", models.Currency, "INR"),
+}
+
+_PENDING = "lookups_pending"
+
+
+def code_of(field, name):
+    """Scalar subquery for the code of ``name``, for filters built without a connection."""
+    lookup = FIELDS[field][1]
+    return select(lookup.id).where(lookup.name == name).scalar_subquery()
+
+
+class Encoder:
+    def __init__(self):
+        self._codes = {field: {} for field in FIELDS}
+        self._names = {field: {} for field in FIELDS}
+        self._lock = threading.Lock()
+
+    def _remember(self, field, pairs):
+        with self._lock:
+            codes, names = self._codes[field], self._names[field]
+            for name, code in pairs:
+                codes[name] = code
+                names[code] = name
+
+    def load(self, bind=None):
+        """Read every lookup table into the cache (committed rows only)."""
+        with (bind or engine).connect() as conn:
+            for field, (_, lookup, _) in FIELDS.items():
+                self._remember(field, conn.execute(select(lookup.name, lookup.id)).all())
+
+    def clear(self):
+        with self._lock:
+            for field in FIELDS:
+                self._codes[field].clear()
+                self._names[field].clear()
+
+    # -- writes ------------------------------------------------------------
+
+    def encode(self, conn, field, values):
+        """Codes for ``values`` (None -> the field's default), adding unseen names via ``conn``."""
+        default = FIELDS[field][2]
+        values = [default if v is None or v == "" else v for v in values]
+        known = self._codes[field]
+        pending = conn.info.setdefault(_PENDING, {}).setdefault(field, {})
+        missing = {v for v in values if v not in known and v not in pending}
+        if missing:
+            pending.update(self._fetch_or_insert(conn, field, missing))
+        return [known.get(v) or pending[v] for v in values]
+
+    def _fetch_or_insert(self, conn, field, names):
+        lookup = FIELDS[field][1].__table__
+        insert = postgresql.insert if conn.dialect.name == "postgresql" else sqlite.insert
+        # Concurrent writers may race on a new name; the unique index keeps one
+        conn.execute(
+            insert(lookup).on_conflict_do_nothing(index_elements=["name"]),
+            [{"name": name} for name in sorted(names)],
+        )
+        return dict(conn.execute(select(lookup.c.name, lookup.c.id).where(lookup.c.name.in_(names))).all())
+
+    def encode_rows(self, conn, rows):
+        """Replace string fields in transaction dict rows with their code columns.
+
+        Rows that already carry a code column keep it; a field absent from
+        every row is filled with its default so the NOT NULL codes hold.
+        """
+        if not rows:
+            return rows
+        for field, (code_column, _, _) in FIELDS.items():
+            if all(code_column in row for row in rows):
+                continue
+            codes = self.encode(conn, field, [row.get(field) for row in rows])
+            for row, code in zip(rows, codes):
+                row.pop(field, None)
+                row.setdefault(code_column, code)
+        return rows
+
+    # -- reads -------------------------------------------------------------
+
+    def code(self, field, name, bind=None):
+        """Code of ``name``, or None if it has never been seen."""
+        code = self._codes[field].get(name)
+        if code is None:
+            self.load(bind)
+            code = self._codes[field].get(name)
+        return code
+
+    def codes(self, field, names, bind=None):
+        return [c for c in (self.code(field, name, bind) for name in names) if c is not None]
+
+    def name(self, field, code, bind=None):
+        if code is None:
+            return None
+        name = self._names[field].get(code)
+        if name is None:
+            self.load(bind)
+            name = self._names[field].get(code, UNKNOWN)
+        return name
+
+
+encoder = Encoder()
+
+
+@event.listens_for(Engine, "commit")
+def _publish_pending(conn):
+    for field, pairs in (conn.info.pop(_PENDING, None) or {}).items():
+        encoder._remember(field, pairs.items())
+
+
+@event.listens_for(Engine, "rollback")
+def _drop_pending(conn):
+    conn.info.pop(_PENDING, None)
+
+
+# --- Migration from string columns ---
+
+_LEGACY = "transactions_legacy"
+
+
+def needs_migration(bind=None):
+    inspector = inspect(bind or engine)
+    if not inspector.has_table("transactions"):
+        return False
+    return "category" in {c["name"] for c in inspector.get_columns("transactions")}
+
+
+def migrate(bind=None, progress=print):
+    """Convert a string-column ``transactions`` table to dictionary codes.
+
+    The old table is renamed, the new one created, rows copied across with
+    one INSERT ... SELECT joining each lookup table, and the spend aggregates
+    rebuilt on codes. Returns the number of rows converted (0 if already done).
+    """
+    import aggregates
+
+    bind = bind or engine
+    if not needs_migration(bind):
+        return 0
+    started = time.perf_counter()
+    progress("🔁 Dictionary-encoding transaction string columns...")
+    tx = models.Transaction.__table__
+    with bind.begin() as conn:
+        # Index names are schema-wide on SQLite, so the old ones must go first
+        for index in inspect(conn).get_indexes("transactions"):
+            conn.execute(text(f'DROP INDEX "{index["name"]}"'))
+        conn.execute(text(f"ALTER TABLE transactions RENAME TO {_LEGACY}"))
+        models.UserSpendAggregate.__table__.drop(conn, checkfirst=True)
+        Base.metadata.create_all(conn)
+        legacy = Table(_LEGACY, MetaData(), autoload_with=conn)
+
+        source = select(legacy.c.id, legacy.c.user_id, legacy.c.account_id, legacy.c.amount, legacy.c.timestamp)
+        for field, (code_column, lookup, default) in FIELDS.items():
+            value = func.coalesce(legacy.c[field], default)
+            conn.execute(lookup.__table__.insert().from_select(
+                ["name"], select(value).distinct().where(value.not_in(select(lookup.name))),
+            ))
+            codes = lookup.__table__.alias(code_column)
+            source = source.add_columns(codes.c.id).join(codes, codes.c.name == value)
+        conn.execute(tx.insert().from_select(
+            ["id", "user_id", "account_id", "amount", "timestamp"] + [c for c, _, _ in FIELDS.values()],
+            source,
+        ))
+        rows = conn.execute(select(func.count()).select_from(tx)).scalar()
+        legacy.drop(conn)
+        if conn.dialect.name == "postgresql":
+            # Ids were copied explicitly; move the new serial past them
+            conn.execute(text(
+                "SELECT setval(pg_get_serial_sequence('transactions', 'id'), COALESCE(MAX(id), 1)) FROM transactions"
+            ))
+        aggregates.refresh(conn)
+
+    if bind.dialect.name == "sqlite":
+        # Reclaim the pages the string columns occupied
+        with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("VACUUM"))
+    encoder.clear()
+    progress(f"✅ Encoded {rows:,} transactions in {time.perf_counter() - started:.1f}s")
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dictionary-encoded transaction columns")
+    parser.add_argument("--migrate", action="store_true", help="convert string columns to lookup codes")
+    args = parser.parse_args()
+
+    if args.migrate:
+        if not migrate():
+            print("✅ Already encoded, nothing to migrate")
+    else:
+        parser.print_help()
@@ -1,16 +1,48 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, case, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
 from typing import List, Optional
 
-from database import get_db, engine, Base
+import base64
+import datetime
+import json
+import os
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the stdlib encoder
+    orjson = None
+
+from database import get_db, engine, async_engine, Base, init_db, pool_stats
 import models
+import aggregates
+import amortization
+import changes
+import events
+import geo
+import interventions
+import lookups
+import metrics
+import scoring
+from cache import MISSING, TTLCache, profile_cache
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when it is installed."""
+
+    def render(self, content):
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
 
-# Create tables (if running for the first time without seed)
-models.Base.metadata.create_all(bind=engine)
+# Create tables and indexes (if running for the first time without seed), then warm the lookup dictionary
+init_db()
+lookups.encoder.load()
 
-app = FastAPI(title="Risk Engine API")
+app = FastAPI(title="Risk Engine API", default_response_class=FastJSONResponse)
 
 # Enable CORS for frontend
 app.add_middleware(
@@ -19,63 +51,192 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Server-Timing"],
 )
+# Added last so it wraps CORS and times the whole request
+app.add_middleware(metrics.MetricsMiddleware)
+
+metrics.register_gauge("db_pool_checked_out", "Connections checked out of the sync pool",
+                       lambda: pool_stats(engine).get("checkedout", 0))
+metrics.register_gauge("events_subscribers", "Open dashboard event streams",
+                       lambda: events.broker.stats()["subscribers"])
 
 # Pydantic Schemas for Response
-class UserResponse(BaseModel):
-    id: str
-    name: str
-    occupation: str
-    monthly_income: float
-    epf_contribution: float
-    current_risk_score: int
-    status: str
-    volatility: str
-    
-    class Config:
-        from_attributes = True
+class UserListItem(BaseModel):
+    # Every field is optional on the wire: ?fields= returns only those asked for
+    id: Optional[str] = None
+    name: Optional[str] = None
+    occupation: Optional[str] = None
+    income: Optional[float] = None
+    epf_contribution: Optional[float] = None
+    history: Optional[List[float]] = None  # Per-bucket averages of the score
+    score: Optional[int] = None
+    status: Optional[str] = None
+    volatility: Optional[str] = None
+    last_action: Optional[str] = None
+    exposure: Optional[float] = None
 
 class DistressUpdate(BaseModel):
     user_id: str
     reason: str
 
-@app.get("/api/users")
-def read_users(db: Session = Depends(get_db)):
-    # Fetch all users from DB
-    users = db.query(models.User).all()
-    # Map to frontend expected format
-    return [
-        {
-            "id": u.id,
-            "name": u.name,
-            "occupation": u.occupation,
-            "income": u.monthly_income,
-            "epf_contribution": u.epf_contribution,
-            "history": [u.current_risk_score - 10, u.current_risk_score - 5, u.current_risk_score], 
-            "score": u.current_risk_score,
-            "status": u.status,
-            "volatility": u.distress_category or "Medium", # Mapped from new schema
-            "last_action": "Pending",
-            "exposure": u.monthly_income * 20 # Mock Loan Exposure
-        }
-        for u in users
-    ]
+# Mock loan exposure shown on the list views
+EXPOSURE_MULTIPLIER = 20
+
+# Sort keys for /api/users. Exposure is a fixed multiple of monthly_income,
+# so ordering by the indexed income column gives the same order.
+SORT_COLUMNS = {
+    "score": models.User.current_risk_score,
+    "exposure": models.User.monthly_income,
+}
+
+# /api/users fields: the columns each one reads and how it is rendered from a
+# row. "history" and "last_action" come from per-page lookups in ``extra``.
+LIST_FIELDS = {
+    "id": ((models.User.id,), lambda r, extra: r.id),
+    "name": ((models.User.name,), lambda r, extra: r.name),
+    "occupation": ((models.User.occupation,), lambda r, extra: r.occupation),
+    "income": ((models.User.monthly_income,), lambda r, extra: r.monthly_income),
+    "epf_contribution": ((models.User.epf_contribution,), lambda r, extra: r.epf_contribution),
+    "history": (
+        (models.User.current_risk_score,),
+        lambda r, extra: extra["history"].get(r.id) or current_point(r.current_risk_score),
+    ),
+    "score": ((models.User.current_risk_score,), lambda r, extra: r.current_risk_score),
+    "status": ((models.User.status,), lambda r, extra: r.status),
+    "volatility": ((models.User.distress_category,), lambda r, extra: r.distress_category or "Medium"), # Mapped from new schema
+    "last_action": ((), lambda r, extra: extra["last_actions"].get(r.id, "Pending")),
+    "exposure": ((models.User.monthly_income,), lambda r, extra: r.monthly_income * EXPOSURE_MULTIPLIER), # Mock Loan Exposure
+}
+
+def current_point(score):
+    # One-point history for users with no stored trajectory yet
+    return [float(score)] if score is not None else []
+
+def parse_fields(fields):
+    if not fields:
+        return list(LIST_FIELDS)
+    names = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in names if f not in LIST_FIELDS]
+    if unknown or not names:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields {unknown}; choose from {', '.join(LIST_FIELDS)}",
+        )
+    return list(dict.fromkeys(names))
+
+# Unscored users have a NULL sort key; they sort last in either direction.
+# Rows are ordered by (is null, coalesce(key, sentinel), id), and the cursor
+# carries the same triple so every row has a position
+NULL_SENTINEL = 0
+
+def sort_key(value):
+    return value is None, NULL_SENTINEL if value is None else value
+
+def encode_cursor(key, user_id):
+    raw = json.dumps([*sort_key(key), user_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def decode_cursor(cursor):
+    try:
+        is_null, key, user_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return bool(is_null), key, user_id
+
+@app.get("/api/users", responses={200: {"model": List[UserListItem]}})
+async def read_users(
+    status: Optional[str] = None,
+    min_score: Optional[int] = None,
+    max_score: Optional[int] = None,
+    distress_category: Optional[str] = None,
+    pincode: Optional[str] = None,
+    sort: str = Query("score", pattern="^(score|exposure)$"),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated subset of fields, e.g. id,score,status"),
+    db: AsyncSession = Depends(get_db),
+):
+    names = parse_fields(fields)
+    sort_col = SORT_COLUMNS[sort]
+
+    # Select only the columns the requested fields read, plus the cursor key
+    columns = {models.User.id.key: models.User.id, sort_col.key: sort_col}
+    for name in names:
+        columns.update((c.key, c) for c in LIST_FIELDS[name][0])
+    query = select(*columns.values())
+
+    # Server-side filters
+    if status:
+        query = query.where(models.User.status == status)
+    if min_score is not None:
+        query = query.where(models.User.current_risk_score >= min_score)
+    if max_score is not None:
+        query = query.where(models.User.current_risk_score <= max_score)
+    if distress_category:
+        query = query.where(models.User.distress_category == distress_category)
+    if pincode:
+        query = query.where(models.User.pincode == pincode)
+
+    # Keyset cursor: resume strictly after the last (is null, key, id)
+    # returned. The order is read as two ranges, keyed rows and then the NULL
+    # tail by id, so both stay on the (sort key, id) indexes
+    last_null, key, last_id = decode_cursor(cursor) if cursor else (False, None, None)
+    desc = order == "desc"
+    id_order = models.User.id.desc() if desc else models.User.id.asc()
+    id_after = lambda: (models.User.id < last_id) if desc else (models.User.id > last_id)
+
+    # Fetch one extra row to know whether another page exists
+    rows = []
+    if not last_null:
+        keyed = query.where(sort_col.is_not(None))
+        if cursor:
+            key_after = (sort_col < key) if desc else (sort_col > key)
+            keyed = keyed.where(or_(key_after, and_(sort_col == key, id_after())))
+        keyed = keyed.order_by(sort_col.desc() if desc else sort_col.asc(), id_order)
+        rows = (await db.execute(keyed.limit(limit + 1))).all()
+    if len(rows) <= limit:
+        unkeyed = query.where(sort_col.is_(None))
+        if last_null:
+            unkeyed = unkeyed.where(id_after())
+        rows += (await db.execute(unkeyed.order_by(id_order).limit(limit + 1 - len(rows)))).all()
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        headers["X-Next-Cursor"] = encode_cursor(getattr(last, sort_col.key), last.id)
+
+    # Per-page lookups, only for the fields that need them
+    ids = [r.id for r in rows]
+    extra = {"history": {}, "last_actions": {}}
+    if "history" in names:
+        # Real score trajectories for the whole page in one query
+        extra["history"] = await load_history(db, ids, points=LIST_HISTORY_POINTS)
+    if "last_action" in names:
+        extra["last_actions"] = dict((await db.execute(interventions.last_actions_query(ids))).all())
+
+    # Plain dicts straight to the fast encoder, skipping jsonable_encoder
+    render = [(name, LIST_FIELDS[name][1]) for name in names]
+    content = [{name: fmt(r, extra) for name, fmt in render} for r in rows]
+    return FastJSONResponse(content, headers=headers)
 
 @app.get("/api/users/{user_id}")
-def read_user(user_id: str, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+async def read_user(user_id: str, db: AsyncSession = Depends(get_db)):
+    cached = profile_cache.get(user_id)
+    if cached is not MISSING:
+        return cached
+    epoch = profile_cache.epoch()
+
+    user = await db.get(models.User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
         
-    # Aggregate Expenditure by Category
-    expenditure = {}
-    total_spend = 0
-    for tx in user.transactions:
-        if tx.transaction_type == "Debit": # Only count debits as expenditure
-             if tx.category not in expenditure:
-                 expenditure[tx.category] = 0
-             expenditure[tx.category] += tx.amount
-             total_spend += tx.amount
+    # Expenditure by Category, read from the materialized spend aggregates;
+    # grouped on category codes and named from the in-process dictionary
+    totals = (await db.execute(aggregates.category_totals_query(user_id, "Debit"))).all()
+    expenditure = {lookups.encoder.name("category", code): total for code, total in totals}
+    total_spend = sum(expenditure.values())
     
     # Format for chart (Top 5 categories + Others)
     sorted_exp = sorted(expenditure.items(), key=lambda x: x[1], reverse=True)
@@ -85,26 +246,61 @@ def read_user(user_id: str, db: Session = Depends(get_db)):
         others_val = sum(v for k, v in sorted_exp[5:])
         chart_data.append({"name": "Others", "value": round(others_val, 2)})
 
-    # Aggregate Loans
-    total_emi = 0
-    loan_details = []
-    for loan in user.loans:
-        total_emi += loan.monthly_emi
-        loan_details.append({
+    # Aggregate Loans (plain column rows, no ORM objects)
+    loan_rows = (await db.execute(
+        select(
+            models.Loan.loan_type,
+            models.Loan.principal_amount,
+            models.Loan.outstanding_amount,
+            models.Loan.monthly_emi,
+            models.Loan.interest_rate,
+            models.Loan.remaining_months,
+        )
+        .where(models.Loan.user_id == user_id)
+    )).all()
+    total_emi = sum(loan.monthly_emi for loan in loan_rows)
+    loan_details = [
+        {
             "type": loan.loan_type,
             "principal": round(loan.principal_amount, 2),
             "outstanding": round(loan.outstanding_amount, 2),
             "emi": round(loan.monthly_emi, 2),
             "interest_rate": loan.interest_rate,
             "remaining_months": loan.remaining_months
-        })
+        }
+        for loan in loan_rows
+    ]
     
+    # Score attributions are precomputed in batch; users the engine has never
+    # seen are scored and explained in memory and left for the scoring jobs
+    # to persist. Their stored score predates the engine, so the response
+    # shows the one the impacts add up to.
+    risk_score = user.current_risk_score
+    attributions = (await db.execute(attribution_query(user_id))).all()
+    if not attributions and user.final_score is None:
+        risk_score, attributions = await db.run_sync(
+            lambda session: scoring.explain_user(session.connection(), user_id, MAX_REASONS)
+        )
+
+    history = await load_history(db, [user_id], points=PROFILE_HISTORY_POINTS)
+    last_action = (await db.execute(interventions.last_actions_query([user_id]))).first()
+
+    # Forward-looking cash runway from the amortization projection; users the
+    # batch has not projected yet get one computed in memory, not stored
+    projection = await db.get(models.CashflowProjection, user_id)
+    if projection is None:
+        months_to_shortfall = await db.run_sync(
+            lambda session: amortization.project_user(session.connection(), user_id)
+        )
+    else:
+        months_to_shortfall = projection.months_to_shortfall
+
     # Calculate repayment capacity
     disposable_income = user.monthly_income - total_spend - total_emi
     can_repay = disposable_income >= 0
 
     # Construct response
-    return {
+    profile = {
         "id": user.id,
         "name": user.name,
         "occupation": user.occupation,
@@ -112,69 +308,417 @@ def read_user(user_id: str, db: Session = Depends(get_db)):
         "epf_contribution": user.epf_contribution,
         "investment_liquidity": user.liquidity_coverage_ratio * user.monthly_income, 
         "total_liability": user.monthly_income * 0.4, # Mock
-        "risk_score": user.current_risk_score,
-        "history": [user.current_risk_score - 5, user.current_risk_score - 2, user.current_risk_score],
+        "risk_score": risk_score,
+        "history": history.get(user_id) or current_point(risk_score),
         "distress_reason": user.distress_category,
         "status": user.status,
         "volatility": user.distress_category or "Medium",
-        "last_action": "Discovery Sent",
-        "shap_values": generate_mock_shap(user),
+        "last_action": last_action.action if last_action else "Discovery Sent",
+        "shap_values": explain_score(user, attributions),
         "expenditure_breakdown": chart_data,
         "total_spend": round(total_spend, 2),
         "loans": loan_details,
         "total_emi": round(total_emi, 2),
         "disposable_income": round(disposable_income, 2),
-        "can_repay": can_repay
+        "can_repay": can_repay,
+        "months_to_shortfall": months_to_shortfall,
+    }
+    profile_cache.set(user_id, profile, epoch)
+    return profile
+
+# --- Portfolio Analytics ---
+
+# Short-lived cache so many open tabs share one aggregate query per window
+analytics_cache = TTLCache(ttl=float(os.getenv("ANALYTICS_CACHE_TTL", "30")))
+
+@app.get("/api/analytics/exposure")
+async def analytics_exposure(db: AsyncSession = Depends(get_db)):
+    return await analytics_cache.get_or_compute_async("exposure", lambda: compute_exposure(db))
+
+@app.get("/api/analytics/risk")
+async def analytics_risk(db: AsyncSession = Depends(get_db)):
+    return await analytics_cache.get_or_compute_async("risk", lambda: compute_risk(db))
+
+@app.get("/api/analytics/trends")
+async def analytics_trends(db: AsyncSession = Depends(get_db)):
+    return await analytics_cache.get_or_compute_async("trends", lambda: compute_trends(db))
+
+@app.get("/api/analytics/cashflow")
+async def analytics_cashflow(horizon: int = Query(60, ge=1, le=amortization.HORIZON_MONTHS)):
+    # Streams the whole loan book through the sync engine; keep it off the loop
+    return await analytics_cache.get_or_compute_async(
+        f"cashflow:{horizon}", lambda: run_in_threadpool(compute_cashflow, horizon)
+    )
+
+def compute_cashflow(horizon):
+    totals = amortization.portfolio_cashflow(horizon=horizon)
+    return [
+        {
+            "month": month + 1,
+            "outstanding": round(float(totals["balance"][month]), 2),
+            "interest": round(float(totals["interest"][month]), 2),
+            "principal": round(float(totals["principal"][month]), 2),
+        }
+        for month in range(horizon)
+    ]
+
+async def compute_exposure(db):
+    # One GROUP BY over loans x user status; the totals are rolled up from it
+    rows = (await db.execute(
+        select(
+            models.Loan.loan_type,
+            models.User.status,
+            func.count(models.Loan.id),
+            func.sum(models.Loan.outstanding_amount),
+            func.sum(models.Loan.monthly_emi),
+        )
+        .join(models.User, models.User.id == models.Loan.user_id)
+        .group_by(models.Loan.loan_type, models.User.status)
+    )).all()
+    breakdown = [
+        {
+            "loan_type": loan_type,
+            "status": status,
+            "loans": count,
+            "outstanding": round(outstanding or 0, 2),
+            "monthly_emi": round(emi or 0, 2),
+        }
+        for loan_type, status, count, outstanding, emi in rows
+    ]
+    return {
+        "total_exposure": round(sum(r["outstanding"] for r in breakdown), 2),
+        "total_loans": sum(r["loans"] for r in breakdown),
+        "by_loan_type": rollup(breakdown, "loan_type", ["outstanding", "loans", "monthly_emi"]),
+        "by_status": rollup(breakdown, "status", ["outstanding", "loans", "monthly_emi"]),
+        "breakdown": breakdown,
     }
 
+async def compute_risk(db):
+    # Ten-point score buckets (100 folds into 90-99) and the risk bands from
+    # scoring.py, per status and distress category in one GROUP BY
+    score = models.User.current_risk_score
+    bucket = case((score >= 100, 9), else_=score / 10)
+    band = scoring.band(score)
+    rows = (await db.execute(
+        select(bucket, band, models.User.status, models.User.distress_category, func.count(models.User.id))
+        .where(score.is_not(None))
+        .group_by(bucket, band, models.User.status, models.User.distress_category)
+    )).all()
+    histogram = {b: 0 for b in range(10)}
+    bands = {"critical": 0, "at_risk": 0, "safe": 0}
+    by_status = {}
+    status_counts = {}
+    by_distress = {}
+    for b, band_name, status, category, count in rows:
+        b = max(int(b), 0)
+        histogram[b] += count
+        bands[band_name] += count
+        per_status = by_status.setdefault(status, {i: 0 for i in range(10)})
+        per_status[b] += count
+        status_counts[status] = status_counts.get(status, 0) + count
+        per_category = by_distress.setdefault(category or "Unknown", {"critical": 0, "at_risk": 0, "safe": 0})
+        per_category[band_name] += count
+
+    def as_list(counts):
+        return [{"range": f"{b * 10}-{b * 10 + 9}", "count": counts[b]} for b in range(10)]
+
+    return {
+        "histogram": as_list(histogram),
+        "by_status": {status: as_list(counts) for status, counts in by_status.items()},
+        "bands": bands,
+        "thresholds": {"critical": scoring.CRITICAL_SCORE, "at_risk": scoring.AT_RISK_SCORE},
+        "status_counts": status_counts,
+        "bands_by_distress_category": by_distress,
+    }
+
+async def compute_trends(db):
+    # Counts per (distress_category, pincode) in one GROUP BY, rolled up both ways
+    rows = (await db.execute(
+        select(models.User.distress_category, models.User.pincode, func.count(models.User.id))
+        .group_by(models.User.distress_category, models.User.pincode)
+    )).all()
+    breakdown = [
+        {"distress_category": category, "pincode": pincode, "users": count}
+        for category, pincode, count in rows
+    ]
+    return {
+        "by_distress_category": rollup(breakdown, "distress_category", ["users"]),
+        "by_pincode": rollup(breakdown, "pincode", ["users"]),
+    }
+
+def rollup(rows, key, fields):
+    # Sum `fields` per distinct `key`, largest first by the first field
+    totals = {}
+    for row in rows:
+        entry = totals.setdefault(row[key], {key: row[key], **{f: 0 for f in fields}})
+        for f in fields:
+            entry[f] += row[f]
+    result = sorted(totals.values(), key=lambda r: r[fields[0]], reverse=True)
+    for entry in result:
+        for f in fields:
+            if isinstance(entry[f], float):
+                entry[f] = round(entry[f], 2)
+    return result
+
+# --- Score History ---
+
+LIST_HISTORY_POINTS = 6
+PROFILE_HISTORY_POINTS = 12
+MAX_HISTORY_USERS = 500
+
+def history_query(user_ids, points, since):
+    # NTILE splits each user's window into `points` equal buckets; averaging
+    # per bucket downsamples in SQL, and the (user_id, ts) index bounds the scan
+    h = models.RiskScoreHistory
+    bucketed = (
+        select(
+            h.user_id,
+            h.ts,
+            h.score,
+            func.ntile(points).over(partition_by=h.user_id, order_by=h.ts).label("bucket"),
+        )
+        .where(h.user_id.in_(user_ids), h.ts >= since)
+        .subquery()
+    )
+    return (
+        select(bucketed.c.user_id, func.max(bucketed.c.ts), func.avg(bucketed.c.score))
+        .group_by(bucketed.c.user_id, bucketed.c.bucket)
+        .order_by(bucketed.c.user_id, bucketed.c.bucket)
+    )
+
+async def load_series(db, user_ids, points, days):
+    since = datetime.datetime.utcnow() - datetime.timedelta(days=days)
+    series = {}
+    if user_ids:
+        for user_id, ts, score in (await db.execute(history_query(user_ids, points, since))).all():
+            series.setdefault(user_id, []).append({"ts": ts, "score": round(score, 1)})
+    return series
+
+async def load_history(db, user_ids, points, days=90):
+    # Bare score lists, the shape the list and profile sparklines expect
+    series = await load_series(db, user_ids, points, days)
+    return {uid: [p["score"] for p in pts] for uid, pts in series.items()}
+
+@app.get("/api/scores/history")
+async def score_history(
+    user_ids: str = Query(..., description="Comma-separated user ids"),
+    points: int = Query(30, ge=1, le=365),
+    days: int = Query(90, ge=1, le=3650),
+    db: AsyncSession = Depends(get_db),
+):
+    ids = [uid for uid in user_ids.split(",") if uid]
+    if len(ids) > MAX_HISTORY_USERS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_HISTORY_USERS} users per call")
+    return {"points": points, "days": days, "series": await load_series(db, ids, points, days)}
+
+@app.get("/api/users/{user_id}/history")
+async def user_score_history(
+    user_id: str,
+    points: int = Query(30, ge=1, le=365),
+    days: int = Query(90, ge=1, le=3650),
+    db: AsyncSession = Depends(get_db),
+):
+    series = await load_series(db, [user_id], points, days)
+    return series.get(user_id, [])
+
+# --- Geo Risk ---
+
+MAX_EVENT_PINCODES = 5_000
+
+class GeoEvent(BaseModel):
+    pincodes: List[str]
+    flag: str = "disaster_zone_flag"  # or infrastructure_failure_flag
+    active: bool = True  # false lifts the flag
+    rescore: bool = True
+
+async def pincode_index(db):
+    rows = (await db.execute(geo.pincode_index_query())).all()
+    return [geo.index_row(r) for r in rows]
+
+@app.get("/api/geo/pincodes")
+async def geo_pincodes(
+    sort: str = Query("exposure", pattern="^(exposure|users|critical|avg_score)$"),
+    limit: int = Query(100, ge=1, le=10_000),
+    db: AsyncSession = Depends(get_db),
+):
+    index = await analytics_cache.get_or_compute_async("geo", lambda: pincode_index(db))
+    key = (lambda r: r["bands"]["critical"]) if sort == "critical" else (lambda r: r[sort] or 0)
+    return sorted(index, key=key, reverse=True)[:limit]
+
+@app.get("/api/geo/pincodes/{pincode}")
+async def geo_pincode(pincode: str, db: AsyncSession = Depends(get_db)):
+    row = (await db.execute(geo.pincode_index_query([pincode]))).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Pincode not found")
+    return geo.index_row(row)
+
+@app.post("/api/geo/events")
+async def geo_event(event: GeoEvent):
+    if event.flag not in geo.GEO_FLAGS:
+        raise HTTPException(status_code=400, detail=f"flag must be one of {', '.join(geo.GEO_FLAGS)}")
+    if not 1 <= len(event.pincodes) <= MAX_EVENT_PINCODES:
+        raise HTTPException(status_code=400, detail=f"between 1 and {MAX_EVENT_PINCODES} pincodes per event")
+    # Set-based update plus cohort rescoring on the sync engine, off the event loop
+    result = await run_in_threadpool(geo.apply_event, event.pincodes, event.flag, event.active, event.rescore)
+    analytics_cache.invalidate()
+    return result
+
+# --- Scoring Jobs ---
+
+class RescoreRequest(BaseModel):
+    mode: str = "incremental"  # incremental, full
+
+@app.post("/api/scoring/rescore")
+async def rescore(request: RescoreRequest):
+    # Batch scoring uses the sync engine in bulk; keep it off the event loop
+    if request.mode == "full":
+        scored = await run_in_threadpool(scoring.score_portfolio)
+    elif request.mode == "incremental":
+        scored = await run_in_threadpool(scoring.rescore_changed)
+    else:
+        raise HTTPException(status_code=400, detail="mode must be 'incremental' or 'full'")
+    return {"mode": request.mode, "users_scored": scored}
+
+# --- Live Updates ---
+
+# Idle streams get a comment line this often so proxies keep them open
+EVENTS_KEEPALIVE = float(os.getenv("EVENTS_KEEPALIVE", "15"))
+# Deltas arriving within this window go out as one message
+EVENTS_FLUSH_INTERVAL = float(os.getenv("EVENTS_FLUSH_INTERVAL", "0.25"))
+
+@app.get("/api/events/users")
+async def user_events(request: Request):
+    """Server-sent stream of user deltas: "users" events carry a JSON list of
+    partial rows to merge by id; "resync" means refetch the list once."""
+    subscription = events.broker.subscribe()
+
+    async def stream():
+        try:
+            yield "retry: 5000\n\n"
+            while not await request.is_disconnected():
+                message = await subscription.next_batch(EVENTS_KEEPALIVE, EVENTS_FLUSH_INTERVAL)
+                if message is None:
+                    yield ": keepalive\n\n"
+                    continue
+                kind, payload = message
+                yield f"event: {kind}\ndata: {json.dumps(payload)}\n\n"
+        finally:
+            events.broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/api/system/events")
+async def event_stats():
+    return events.broker.stats()
+
+@app.get("/api/system/db-pool")
+async def db_pool_stats():
+    stats = {"sync": pool_stats(engine)}
+    if async_engine is not None:
+        stats["async"] = pool_stats(async_engine)
+    return stats
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.post("/api/discovery")
-def update_distress(data: DistressUpdate, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.id == data.user_id).first()
+async def update_distress(data: DistressUpdate, db: AsyncSession = Depends(get_db)):
+    user = await db.get(models.User, data.user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    # Return intervention strategy based on reason
-    intervention = {
-        "action": "Hold",
-        "message": "Analyzing inputs..."
+    # Pick, persist and apply the intervention for the reported reason. A
+    # distress report is also a scoring input: queue the user for rescoring
+    # and drop the cached profile.
+    def discover(session):
+        conn = session.connection()
+        chosen = interventions.apply(conn, select(models.User.id).where(models.User.id == user.id), data.reason)
+        changes.record_changes(conn, [user.id], "discovery")
+        return chosen[0]
+
+    chosen = await db.run_sync(discover)
+    await db.commit()
+    profile_cache.invalidate(user.id)
+    events.publish([{"id": user.id, "status": chosen["status"], "last_action": chosen["action"]}])
+    intervention = {k: chosen[k] for k in ("action", "message", "type") if k in chosen}
+    return {"user": {"id": user.id, "status": chosen["status"]}, "intervention": intervention}
+
+# --- Intervention Campaigns ---
+
+MAX_BATCH_USERS = 10_000
+
+class InterventionBatch(BaseModel):
+    user_ids: Optional[List[str]] = None
+    status: Optional[str] = None
+    reason: Optional[str] = None
+    after: Optional[str] = None  # page through a status cohort by user id
+    limit: int = 5_000
+    dry_run: bool = False
+
+@app.post("/api/interventions/batch")
+async def intervention_batch(batch: InterventionBatch, db: AsyncSession = Depends(get_db)):
+    if not 1 <= batch.limit <= MAX_BATCH_USERS:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_BATCH_USERS}")
+    if batch.user_ids is not None and len(batch.user_ids) > MAX_BATCH_USERS:
+        raise HTTPException(status_code=400, detail=f"at most {MAX_BATCH_USERS} user_ids per call")
+
+    cohort = select(models.User.id)
+    if batch.user_ids is not None:
+        cohort = cohort.where(models.User.id.in_(batch.user_ids))
+    else:
+        if batch.status:
+            cohort = cohort.where(models.User.status == batch.status)
+        if batch.after:
+            cohort = cohort.where(models.User.id > batch.after)
+        cohort = cohort.order_by(models.User.id).limit(batch.limit)
+
+    results = await db.run_sync(
+        lambda session: interventions.apply(session.connection(), cohort, batch.reason, batch.dry_run)
+    )
+    if not batch.dry_run:
+        await db.commit()
+        profile_cache.invalidate_many([r["user_id"] for r in results])
+        events.publish({"id": r["user_id"], "status": r["status"], "last_action": r["action"]} for r in results)
+
+    actions = {}
+    for r in results:
+        actions[r["action"]] = actions.get(r["action"], 0) + 1
+    return {
+        "evaluated": len(results),
+        "actions": actions,
+        "next_after": results[-1]["user_id"] if batch.user_ids is None and len(results) == batch.limit else None,
+        "results": results,
     }
-    
-    if data.reason == "job":
-         intervention = {
-            "action": "Emergency Protocol",
-            "message": "Income verification requested. Late fees waived for 30 days.",
-            "type": "structural"
-        }
-    elif data.reason == "salary":
-        intervention = {
-             "action": "Grace Period",
-             "message": "Payment date shifted by 7 days. No penalty.",
-             "type": "liquidity"
-        }
-        
-    return {"user": {"id": user.id, "status": user.status}, "intervention": intervention}
 
-# --- Internal Logic Mocking ---
+# --- Score Explanations ---
+
+# Number of attributed features shown on the profile
+MAX_REASONS = 5
 
-def generate_mock_shap(user):
-    # Returns explanation for the score based on real fields
+def attribution_query(user_id):
+    return (
+        select(models.RiskAttribution.feature, models.RiskAttribution.impact)
+        .where(models.RiskAttribution.user_id == user_id)
+        .order_by(models.RiskAttribution.impact.desc())
+        .limit(MAX_REASONS)
+    )
+
+def explain_score(user, attributions):
+    # Turns stored (feature, impact) rows into the profile's explanation list
     reasons = []
-    
-    if user.epf_contribution == 0:
-        reasons.append({"feature": "EPF Contribution", "impact": 15, "desc": "Lack of steady employment signal"})
-    
-    if user.distress_category and "Liquidity" in user.distress_category:
-        reasons.append({"feature": "Liquidity Crunch", "impact": 18, "desc": "Low coverage ratio detected"})
-        
-    if user.credit_card_utilization > 50:
-         reasons.append({"feature": "Credit Utilization", "impact": 12, "desc": f"Usage is {user.credit_card_utilization}% of limit"})
+    for feature, impact in attributions:
+        label, template = scoring.FEATURE_LABELS[feature]
+        value = getattr(user, feature, None) or 0
+        reasons.append({"feature": label, "impact": round(impact, 1), "desc": template.format(value=value)})
 
-    if getattr(user, 'disaster_zone_flag', False):
-         reasons.append({"feature": "Geo-Risk", "impact": 25, "desc": "Location in active disaster zone"})
-        
     if not reasons:
-         reasons.append({"feature": "General Risk", "impact": 5, "desc": "Standard usage patterns"})
-         
+        reasons.append({"feature": "General Risk", "impact": 0, "desc": "Standard usage patterns"})
+
     return reasons
 
 if __name__ == "__main__":
@@ -0,0 +1,255 @@
+"""
+Request and query instrumentation, exposed in Prometheus text format.
+
+``MetricsMiddleware`` times every HTTP request and its response size per
+route template. A SQLAlchemy cursor hook counts statements and DB time into
+a per-request context variable (threadpool calls inherit it), so each
+request also reports how many queries it issued; requests past
+``QUERY_WARN_THRESHOLD`` are logged as likely N+1 patterns. The same figures
+go out in a ``Server-Timing`` header for browser dev tools.
+
+With ``METRICS_PROFILING=1``, adding ``?profile=1`` (or ``X-Profile: 1``) to a
+request swaps its response for a sampled stack profile in collapsed-stack
+format, ready for flamegraph tooling.
+"""
+import bisect
+import collections
+import contextvars
+import logging
+import os
+import sys
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+QUERY_WARN_THRESHOLD = int(os.getenv("METRICS_QUERY_WARN", "25"))
+PROFILING_ENABLED = os.getenv("METRICS_PROFILING", "0").lower() in ("1", "true", "yes")
+PROFILE_INTERVAL = float(os.getenv("METRICS_PROFILE_INTERVAL_MS", "2")) / 1000
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    def __init__(self, name, help, buckets, labelnames):
+        self.name, self.help = name, help
+        self.buckets = tuple(buckets)
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        for labels, counts, total in sorted(items):
+            base = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.labelnames, labels))
+            sep = "," if base else ""
+            running = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                running += count
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="{bound}"}} {running}')
+            lines.append(f"{self.name}_sum{{{base}}} {total}")
+            lines.append(f"{self.name}_count{{{base}}} {running}")
+        return lines
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Request latency by route", LATENCY_BUCKETS, ("method", "route", "status")
+)
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes", "Response body size by route", SIZE_BUCKETS, ("method", "route")
+)
+REQUEST_QUERIES = Histogram(
+    "db_queries_per_request", "SQL statements issued per request", QUERY_BUCKETS, ("method", "route")
+)
+REQUEST_DB_TIME = Histogram(
+    "db_time_per_request_seconds", "Time spent in SQL per request", LATENCY_BUCKETS, ("method", "route")
+)
+QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds", "Latency of individual SQL statements", LATENCY_BUCKETS, ("statement",)
+)
+
+HISTOGRAMS = [REQUEST_LATENCY, RESPONSE_SIZE, REQUEST_QUERIES, REQUEST_DB_TIME, QUERY_LATENCY]
+
+# name -> (help, callable returning a number); sampled at scrape time
+_gauges = {}
+
+
+def register_gauge(name, help, fn):
+    _gauges[name] = (help, fn)
+
+
+def render():
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    for name, (help, fn) in sorted(_gauges.items()):
+        try:
+            value = fn()
+        except Exception:
+            continue
+        lines.extend([f"# HELP {name} {help}", f"# TYPE {name} gauge", f"{name} {value}"])
+    return "\n".join(lines) + "\n"
+
+
+# --- Per-request query accounting ---
+
+_request_db = contextvars.ContextVar("request_db", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    QUERY_LATENCY.observe(elapsed, statement.lstrip().split(None, 1)[0].upper() if statement else "")
+    stats = _request_db.get()
+    if stats is not None:
+        stats["queries"] += 1
+        stats["db_time"] += elapsed
+
+
+# --- Sampling profiler ---
+
+# Leaf frames of threads that are parked, not working
+_IDLE_FILES = ("threading.py", "selectors.py", "queue.py")
+
+
+class Sampler(threading.Thread):
+    """Samples every thread's stack into collapsed-stack counts until stopped."""
+
+    def __init__(self, interval=PROFILE_INTERVAL):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.samples += 1
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == self.ident or os.path.basename(frame.f_code.co_filename) in _IDLE_FILES:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def collapsed(self):
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+
+def _wants_profile(scope):
+    if not PROFILING_ENABLED:
+        return False
+    if b"profile=1" in scope.get("query_string", b"").split(b"&"):
+        return True
+    return any(k == b"x-profile" and v == b"1" for k, v in scope.get("headers", []))
+
+
+# --- Middleware ---
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, so streamed responses pass through untouched."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = {"queries": 0, "db_time": 0.0}
+        token = _request_db.set(stats)
+        response = {"status": 500, "size": 0}
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Server-Timing",
+                    f'db;dur={stats["db_time"] * 1000:.1f};desc="{stats["queries"]} queries", '
+                    f"app;dur={(time.perf_counter() - started) * 1000:.1f}",
+                )
+            elif message["type"] == "http.response.body":
+                response["size"] += len(message.get("body", b""))
+            await send(message)
+
+        profiling = _wants_profile(scope)
+        sampler = None
+        if profiling:
+            sampler = Sampler()
+            sampler.start()
+
+            async def send_discard(message):
+                if message["type"] == "http.response.start":
+                    response["status"] = message["status"]
+            downstream = send_discard
+        else:
+            downstream = send_with_timing
+
+        try:
+            await self.app(scope, receive, downstream)
+        finally:
+            # Stop the sampler thread even when the app raised
+            if sampler is not None:
+                sampler.stop()
+            _request_db.reset(token)
+            elapsed = time.perf_counter() - started
+            route = getattr(scope.get("route"), "path", "unmatched")
+            method = scope["method"]
+            REQUEST_LATENCY.observe(elapsed, method, route, str(response["status"]))
+            REQUEST_QUERIES.observe(stats["queries"], method, route)
+            REQUEST_DB_TIME.observe(stats["db_time"], method, route)
+            if not profiling:
+                RESPONSE_SIZE.observe(response["size"], method, route)
+            if stats["queries"] > QUERY_WARN_THRESHOLD:
+                logger.warning("%s %s issued %d queries (%.1f ms in SQL); possible N+1",
+                               method, route, stats["queries"], stats["db_time"] * 1000)
+
+        if sampler is not None:
+            body = (
+                f"# {method} {route} status={response['status']} wall={elapsed * 1000:.1f}ms "
+                f"samples={sampler.samples} queries={stats['queries']} db={stats['db_time'] * 1000:.1f}ms\n"
+                + sampler.collapsed()
+            ).encode()
+            await send({
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", b"text/plain; charset=utf-8"), (b"content-length", str(len(body)).encode())],
+            })
+            await send({"type": "http.response.body", "body": body})
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, SmallInteger, String, Float, DateTime, ForeignKey, Boolean, Index
 from sqlalchemy.orm import relationship
 from database import Base
 import datetime
@@ -57,6 +57,17 @@ class User(Base):
     transactions = relationship("Transaction", back_populates="owner")
     loans = relationship("Loan", back_populates="owner")
 
+    # Keyset pagination on /api/users: every filter + sort combination is
+    # served by an index ending in the (sort key, id) cursor columns.
+    __table_args__ = (
+        Index("ix_users_score_id", "current_risk_score", "id"),
+        Index("ix_users_income_id", "monthly_income", "id"),
+        Index("ix_users_status_score_id", "status", "current_risk_score", "id"),
+        Index("ix_users_status_income_id", "status", "monthly_income", "id"),
+        Index("ix_users_distress_score_id", "distress_category", "current_risk_score", "id"),
+        Index("ix_users_pincode_score_id", "pincode", "current_risk_score", "id"),
+    )
+
 class Account(Base):
     __tablename__ = "accounts"
     
@@ -72,25 +83,57 @@ class Transaction(Base):
     __tablename__ = "transactions"
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(String, ForeignKey("users.id"))
+    user_id = Column(String, ForeignKey("users.id"), nullable=False)
     account_id = Column(String, ForeignKey("accounts.id"))
     
     amount = Column(Float)
-    currency = Column(String, default="INR")
     timestamp = Column(DateTime, default=datetime.datetime.utcnow)
     
-    category = Column(String)
-    merchant_name = Column(String)
-    payment_mode = Column(String)
-    transaction_type = Column(String)
+    # Dictionary-encoded: codes into the lookup tables below, assigned and
+    # decoded by lookups.encoder. Writers pass plain strings to ingest.insert_rows.
+    currency_id = Column(SmallInteger, ForeignKey("currencies.id"), nullable=False)
+    category_id = Column(SmallInteger, ForeignKey("tx_categories.id"), nullable=False)
+    merchant_id = Column(Integer, ForeignKey("merchants.id"), nullable=False)
+    payment_mode_id = Column(SmallInteger, ForeignKey("payment_modes.id"), nullable=False)
+    transaction_type_id = Column(SmallInteger, ForeignKey("transaction_types.id"), nullable=False)
     
     owner = relationship("User", back_populates="transactions")
 
+    # Monthly partitions (native on Postgres, month tables on SQLite) are
+    # managed by partitions.py and carry the same indexes.
+    # Covers the per-user expenditure GROUP BY on the profile endpoint
+    __table_args__ = (
+        Index("ix_transactions_user_type_category", "user_id", "transaction_type_id", "category_id", "amount"),
+        # Time-ordered scans for the feature pipeline, whole book and per user shard
+        Index("ix_transactions_timestamp_id", "timestamp", "id"),
+        Index("ix_transactions_user_timestamp_id", "user_id", "timestamp", "id"),
+    )
+
+class _Lookup:
+    # Append-only string dictionary: a code never changes meaning once assigned
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False, unique=True)
+
+class Currency(_Lookup, Base):
+    __tablename__ = "currencies"
+
+class TxCategory(_Lookup, Base):
+    __tablename__ = "tx_categories"
+
+class Merchant(_Lookup, Base):
+    __tablename__ = "merchants"
+
+class PaymentMode(_Lookup, Base):
+    __tablename__ = "payment_modes"
+
+class TransactionType(_Lookup, Base):
+    __tablename__ = "transaction_types"  # Debit, Credit
+
 class Loan(Base):
     __tablename__ = "loans"
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(String, ForeignKey("users.id"))
+    user_id = Column(String, ForeignKey("users.id"), index=True)
     
     loan_type = Column(String)  # Personal, Home, Auto, Education, Credit Card
     principal_amount = Column(Float)  # Original loan amount
@@ -103,3 +146,111 @@ class Loan(Base):
     
     owner = relationship("User", back_populates="loans")
 
+
+class UserSpendAggregate(Base):
+    __tablename__ = "user_spend_aggregates"
+
+    # Materialized SUM/COUNT of transactions per user, type, category and
+    # calendar month; maintained by aggregates.py as transactions are inserted.
+    user_id = Column(String, ForeignKey("users.id"), primary_key=True)
+    transaction_type_id = Column(SmallInteger, ForeignKey("transaction_types.id"), primary_key=True)
+    category_id = Column(SmallInteger, ForeignKey("tx_categories.id"), primary_key=True)
+    period = Column(String, primary_key=True)  # YYYY-MM
+
+    total_amount = Column(Float, default=0.0)
+    tx_count = Column(Integer, default=0)
+
+class IngestCheckpoint(Base):
+    __tablename__ = "ingest_checkpoints"
+
+    # Progress of a streaming ingestion run, committed together with each
+    # chunk so a restarted run resumes exactly where the last commit ended.
+    source = Column(String, primary_key=True)
+    kind = Column(String)  # transactions, loans, accounts, users
+    rows_done = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+class RiskAttribution(Base):
+    __tablename__ = "risk_attributions"
+
+    # Additive share of final_score per indicator, written by the scoring
+    # engine; a user's impacts sum to their (unrounded) score.
+    user_id = Column(String, ForeignKey("users.id"), primary_key=True)
+    feature = Column(String, primary_key=True)
+    impact = Column(Float)
+
+class ScoringRun(Base):
+    __tablename__ = "scoring_runs"
+
+    id = Column(Integer, primary_key=True)
+    mode = Column(String)  # full, incremental, user, snapshot, cohort
+    started_at = Column(DateTime, default=datetime.datetime.utcnow)
+    finished_at = Column(DateTime)
+    users_scored = Column(Integer, default=0)
+
+class RiskScoreHistory(Base):
+    __tablename__ = "risk_score_history"
+
+    # Append-only: one compact row per user per scoring run
+    user_id = Column(String, ForeignKey("users.id"), primary_key=True)
+    run_id = Column(Integer, ForeignKey("scoring_runs.id"), primary_key=True)
+    ts = Column(DateTime, nullable=False)
+    score = Column(SmallInteger)
+
+    # Per-group stress, 0-100 (share of the group's weight in use)
+    group_a = Column(SmallInteger)
+    group_b = Column(SmallInteger)
+    group_c = Column(SmallInteger)
+    group_d = Column(SmallInteger)
+    group_e = Column(SmallInteger)
+    group_f = Column(SmallInteger)
+
+    __table_args__ = (
+        Index("ix_risk_score_history_user_ts", "user_id", "ts"),
+    )
+
+class UserChange(Base):
+    __tablename__ = "user_changes"
+
+    # Change log feeding incremental rescoring: a row means "this user's
+    # scoring inputs changed"; the rescoring job consumes rows up to a high
+    # water mark and deletes them.
+    id = Column(Integer, primary_key=True)
+    user_id = Column(String, index=True)
+    source = Column(String)  # ingest, discovery, orm, ...
+    changed_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+class Intervention(Base):
+    __tablename__ = "interventions"
+
+    # Every action chosen by the intervention engine, single or batch
+    id = Column(Integer, primary_key=True)
+    user_id = Column(String, ForeignKey("users.id"))
+    rule_id = Column(String)
+    reason = Column(String)
+    action = Column(String)
+    message = Column(String)
+    type = Column(String)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_interventions_user_id_id", "user_id", "id"),
+    )
+
+class CacheEpoch(Base):
+    __tablename__ = "cache_epochs"
+
+    # Cross-process invalidation counters (cache.SharedEpoch): batch jobs bump
+    # them, API processes poll them and drop their cached entries on a change
+    name = Column(String, primary_key=True)
+    epoch = Column(Integer, nullable=False, default=0)
+
+class CashflowProjection(Base):
+    __tablename__ = "cashflow_projections"
+
+    # Forward cash-flow signal from amortization.py: the first month in which
+    # account balances plus cumulative disposable income go negative
+    user_id = Column(String, ForeignKey("users.id"), primary_key=True)
+    months_to_shortfall = Column(Integer)  # NULL = no shortfall within horizon
+    horizon_months = Column(Integer)
+    projected_at = Column(DateTime, default=datetime.datetime.utcnow)
@@ -0,0 +1,241 @@
+"""
+Sharded portfolio jobs on a process pool.
+
+The ``users`` table is split into contiguous user_id ranges of roughly equal
+size and each range is handed to a ``ProcessPoolExecutor`` worker. Workers
+drop the connection pool inherited from the parent and open their own
+connections, read and write their shard in bulk, and report per-user results
+through ``multiprocessing.shared_memory`` arrays instead of pickling them
+back. Snapshot scoring reads the memory-mapped feature matrix, which every
+worker shares through the page cache.
+
+SQLite serialises writers, so the speed-up there is bounded by the write
+phase; on Postgres each worker writes independently.
+"""
+import argparse
+import datetime
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+from sqlalchemy import func, select
+
+from cache import profile_cache
+import changes
+import database
+import events
+import features
+import models
+import scoring
+
+User = models.User
+
+WORKERS = int(os.getenv("BATCH_WORKERS", os.cpu_count() or 1))
+
+
+class SharedArray:
+    """A NumPy array in a named shared-memory block."""
+
+    def __init__(self, shape, dtype, name=None):
+        self.shape, self.dtype = shape, np.dtype(dtype)
+        size = max(int(np.prod(shape)) * self.dtype.itemsize, 1)
+        self.shm = shared_memory.SharedMemory(name=name, create=name is None, size=size)
+        self.array = np.ndarray(shape, dtype=self.dtype, buffer=self.shm.buf)
+
+    def spec(self):
+        return self.shape, self.dtype.str, self.shm.name
+
+    @classmethod
+    def attach(cls, spec):
+        shape, dtype, name = spec
+        return cls(shape, dtype, name)
+
+    def close(self, unlink=False):
+        del self.array
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+# SQLite admits one writer at a time; shard writers queue for the lock
+WORKER_BUSY_TIMEOUT_MS = int(os.getenv("BATCH_BUSY_TIMEOUT_MS", "120000"))
+
+
+def _init_worker():
+    # Pooled connections must not cross a fork; this process opens its own
+    database.engine.dispose(close=False)
+    database.SQLITE_PRAGMAS["busy_timeout"] = max(database.SQLITE_PRAGMAS["busy_timeout"], WORKER_BUSY_TIMEOUT_MS)
+
+
+def shard_ranges(conn, n_shards):
+    """Split users into ``n_shards`` keyset ranges (lo, hi] with their row offsets."""
+    total = conn.execute(select(func.count(User.id))).scalar()
+    n_shards = max(1, min(n_shards, total))
+    offsets = [total * i // n_shards for i in range(n_shards + 1)]
+    bounds = [None]
+    for offset in offsets[1:-1]:
+        bounds.append(conn.execute(select(User.id).order_by(User.id).offset(offset - 1).limit(1)).scalar())
+    bounds.append(None)
+    return [
+        {"lo": bounds[i], "hi": bounds[i + 1], "offset": offsets[i], "size": offsets[i + 1] - offsets[i]}
+        for i in range(n_shards)
+    ], total
+
+
+def _in_shard(stmt, column, shard):
+    if shard["lo"] is not None:
+        stmt = stmt.where(column > shard["lo"])
+    if shard["hi"] is not None:
+        stmt = stmt.where(column <= shard["hi"])
+    return stmt
+
+
+# --- Scoring ---------------------------------------------------------------
+
+def _score_shard(shard, run_id, ts, outputs, chunk_size):
+    ids_out, scores_out, changed_out = (SharedArray.attach(spec) for spec in outputs)
+    written = 0
+    last_id = shard["lo"]
+    try:
+        while True:
+            stmt = _in_shard(scoring.indicator_query(last_id, chunk_size), User.id, {**shard, "lo": None})
+            # Read outside the write transaction: SQLite cannot upgrade a read
+            # snapshot to a write lock while another shard is writing
+            with database.engine.connect() as conn:
+                rows = conn.execute(stmt).all()
+            if not rows:
+                break
+            ids, X = scoring.to_arrays(rows)
+            with database.engine.begin() as conn:
+                scores = scoring.score_batch(conn, ids, X, run_id, ts)
+            # Users added since sharding may overflow the slot; they are scored but not reported
+            n = max(0, min(len(ids), shard["size"] - written))
+            at = shard["offset"] + written
+            ids_out.array[at:at + n] = [uid.encode() for uid in ids[:n].tolist()]
+            scores_out.array[at:at + n] = scores[:n]
+            changed_out.array[at:at + n] = (scores != scoring.previous_scores(rows))[:n]
+            written += len(ids)
+            last_id = ids[-1]
+            if len(rows) < chunk_size:
+                break
+    finally:
+        for out in (ids_out, scores_out, changed_out):
+            out.close()
+    return written
+
+
+def score_portfolio(workers=WORKERS, chunk_size=20_000):
+    """Parallel ``scoring.score_portfolio``: one run, every shard scored by its own process."""
+    with database.engine.begin() as conn:
+        run_id = scoring.start_run(conn, "full")
+        high_water = scoring._change_high_water(conn)
+        shards, total = shard_ranges(conn, workers)
+        width = conn.execute(select(func.max(func.length(User.id)))).scalar() or 1
+    ts = datetime.datetime.utcnow()
+
+    outputs = [SharedArray((total,), f"S{width}"), SharedArray((total,), np.int16), SharedArray((total,), np.bool_)]
+    try:
+        specs = [out.spec() for out in outputs]
+        with ProcessPoolExecutor(len(shards), initializer=_init_worker) as pool:
+            scored = sum(pool.map(_score_shard, shards, [run_id] * len(shards), [ts] * len(shards),
+                                  [specs] * len(shards), [chunk_size] * len(shards)))
+        ids, scores, changed = (out.array for out in outputs)
+        moved = np.flatnonzero(changed)
+        events.publish(
+            {"id": uid.decode(), "score": int(s)}
+            for uid, s in zip(ids[moved].tolist(), scores[moved].tolist())
+        )
+    finally:
+        for out in outputs:
+            out.close(unlink=True)
+
+    with database.engine.begin() as conn:
+        scoring.finish_run(conn, run_id, scored)
+        scoring._consume_changes(conn, high_water)
+    profile_cache.clear(broadcast=True)
+    return scored
+
+
+def _score_snapshot_rows(path, lo, hi, run_id, ts, chunk_size):
+    ids, X = scoring.load_snapshot(path)  # memory-mapped: pages are shared, not copied
+    for start in range(lo, hi, chunk_size):
+        stop = min(start + chunk_size, hi)
+        chunk_ids = np.array(np.char.decode(ids[start:stop]).tolist(), dtype=object)
+        with database.engine.begin() as conn:
+            scoring.score_batch(conn, chunk_ids, np.asarray(X[start:stop]), run_id, ts)
+    return hi - lo
+
+
+def score_snapshot(path, workers=WORKERS, chunk_size=20_000):
+    """Parallel ``scoring.score_snapshot`` over row ranges of the snapshot."""
+    ids, _ = scoring.load_snapshot(path)
+    total = len(ids)
+    with database.engine.begin() as conn:
+        run_id = scoring.start_run(conn, "snapshot")
+    ts = datetime.datetime.utcnow()
+    n = max(1, min(workers, total))
+    edges = [total * i // n for i in range(n + 1)]
+    with ProcessPoolExecutor(n, initializer=_init_worker) as pool:
+        scored = sum(pool.map(_score_snapshot_rows, [path] * n, edges[:-1], edges[1:],
+                              [run_id] * n, [ts] * n, [chunk_size] * n))
+    with database.engine.begin() as conn:
+        scoring.finish_run(conn, run_id, scored)
+    profile_cache.clear(broadcast=True)
+    return scored
+
+
+# --- Feature backfill --------------------------------------------------------
+
+def _features_shard(shard, max_tx_id, as_of, state_path, chunk_size, write_chunk):
+    state = features.FeatureState()
+    with database.engine.connect() as conn:
+        for rows in features.stream_users(conn, shard["lo"], shard["hi"], max_tx_id, chunk_size):
+            state.apply(rows)
+    users = np.arange(len(state.ids))
+    for lo in range(0, len(users), write_chunk):
+        with database.engine.begin() as conn:
+            ids = features.write_indicators(conn, state, users[lo:lo + write_chunk], as_of)
+            changes.record_changes(conn, ids, "features")
+    state.save(state_path)
+    return state_path
+
+
+def backfill_features(workers=WORKERS, chunk_size=100_000, write_chunk=10_000, path=features.STATE_PATH):
+    """Parallel ``features.run(full=True)``; shard states are merged into one checkpoint."""
+    with database.engine.connect() as conn:
+        max_tx_id = conn.execute(select(func.max(models.Transaction.id))).scalar() or 0
+        shards, _ = shard_ranges(conn, workers)
+    as_of = features.to_days([datetime.datetime.utcnow()])[0]
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = [os.path.join(tmp, f"shard_{i}.npz") for i in range(len(shards))]
+        n = len(shards)
+        with ProcessPoolExecutor(n, initializer=_init_worker) as pool:
+            list(pool.map(_features_shard, shards, [max_tx_id] * n, [as_of] * n, paths,
+                          [chunk_size] * n, [write_chunk] * n))
+        merged = features.FeatureState.merge([features.FeatureState.load(p) for p in paths], max_tx_id)
+    merged.save(path)
+    profile_cache.clear(broadcast=True)
+    return len(merged.ids)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run portfolio jobs sharded across processes")
+    parser.add_argument("job", choices=["score", "snapshot", "features"])
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--snapshot", default="exports/snapshot", help="snapshot directory for the snapshot job")
+    parser.add_argument("--state", default=features.STATE_PATH, help="feature checkpoint for the features job")
+    args = parser.parse_args()
+    database.init_db()
+
+    started = time.perf_counter()
+    if args.job == "score":
+        count = score_portfolio(args.workers)
+    elif args.job == "snapshot":
+        count = score_snapshot(args.snapshot, args.workers)
+    else:
+        count = backfill_features(args.workers, path=args.state)
+    elapsed = time.perf_counter() - started
+    print(f"✅ {args.job}: {count} users on {args.workers} workers in {elapsed:.2f}s ({count / max(elapsed, 1e-9):,.0f} users/sec)")
@@ -0,0 +1,341 @@
+"""
+Monthly partitioning of ``transactions`` with rollups and retention.
+
+On Postgres ``transactions`` is a native RANGE-partitioned table with one
+partition per calendar month (``transactions_YYYY_MM``) and a DEFAULT
+partition; ``maintain`` creates upcoming months ahead of time and moves any
+rows that landed in the default partition into their month.
+
+SQLite has no native partitioning, so ``transactions`` keeps the last
+``TX_HOT_MONTHS`` months and ``maintain`` moves older months into their own
+``transactions_YYYY_MM`` tables. Readers of full history go through
+``sources``.
+
+Monthly rollups are the ``user_spend_aggregates`` rows, maintained as
+transactions are inserted; ``aggregates.refresh`` leaves the months whose
+raw rows were retired untouched. With ``TX_RETENTION_MONTHS`` set, older raw
+partitions are dropped, or with ``TX_RETENTION_ACTION=archive`` detached
+(Postgres) or moved to ``TX_ARCHIVE_DIR/transactions_YYYY_MM.db`` (SQLite).
+
+    python partitions.py              # roll + retention, e.g. from a monthly cron
+    python partitions.py --status
+    python partitions.py --migrate    # Postgres: partition an existing table
+"""
+import argparse
+import datetime
+import os
+import re
+import time
+
+from sqlalchemy import Column, Index, MetaData, PrimaryKeyConstraint, Table, and_, delete, func, inspect, select, text
+
+from database import Base, engine, init_db
+import models
+
+HOT_MONTHS = max(int(os.getenv("TX_HOT_MONTHS", "3")), 1)
+RETENTION_MONTHS = int(os.getenv("TX_RETENTION_MONTHS", "0"))  # 0 keeps all raw history
+RETENTION_ACTION = os.getenv("TX_RETENTION_ACTION", "drop")  # drop, archive
+ARCHIVE_DIR = os.getenv("TX_ARCHIVE_DIR", "archive")
+
+# Postgres partitions created ahead of the current month
+PRECREATE_MONTHS = 2
+
+_tx = models.Transaction.__table__
+_PARTITION = re.compile(r"transactions_(\d{4})_(\d{2})")
+_meta = MetaData()
+
+
+def month_start(when):
+    return datetime.datetime(when.year, when.month, 1)
+
+
+def add_months(start, months):
+    years, month = divmod(start.month - 1 + months, 12)
+    return datetime.datetime(start.year + years, month + 1, 1)
+
+
+def partition_name(start):
+    return f"transactions_{start:%Y_%m}"
+
+
+def _partition_start(name):
+    match = _PARTITION.fullmatch(name)
+    return datetime.datetime(int(match[1]), int(match[2]), 1) if match else None
+
+
+def partition_table(name):
+    """SQLite month table with the columns and indexes of ``transactions``."""
+    if name in _meta.tables:
+        return _meta.tables[name]
+    table = Table(name, _meta, *[
+        Column(c.name, c.type, primary_key=c.primary_key, nullable=c.nullable) for c in _tx.columns
+    ])
+    for index in _tx.indexes:
+        # Index names are schema-wide, so each month gets its own
+        Index(index.name.replace("transactions", name, 1), *[table.c[c.name] for c in index.columns])
+    return table
+
+
+def partitions(conn):
+    """(name, month start) of the monthly partitions, oldest first."""
+    if conn.dialect.name == "postgresql":
+        names = conn.execute(text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = 'transactions'"
+        )).scalars().all()
+    else:
+        names = inspect(conn).get_table_names()
+    found = [(name, _partition_start(name)) for name in names]
+    return sorted((item for item in found if item[1] is not None), key=lambda item: item[1])
+
+
+def sources(conn):
+    """Tables holding raw transactions, oldest first.
+
+    On Postgres the parent table already spans every attached partition.
+    """
+    if conn.dialect.name == "postgresql":
+        return [_tx]
+    return [partition_table(name) for name, _ in partitions(conn)] + [_tx]
+
+
+# --- Postgres native partitioning ---
+
+def _is_partitioned(conn):
+    return conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table t JOIN pg_class c ON c.oid = t.partrelid "
+        "WHERE c.relname = 'transactions'"
+    )).first() is not None
+
+
+def _create_parent(conn):
+    # The partition key must be part of the primary key, so the parent is
+    # created from a copy of the model with PRIMARY KEY (id, timestamp)
+    Base.metadata.create_all(conn, tables=[t for t in Base.metadata.sorted_tables if t is not _tx])
+    meta = MetaData()
+    for table in Base.metadata.sorted_tables:
+        table.to_metadata(meta)
+    parent = meta.tables["transactions"]
+    parent.c.id.autoincrement = True
+    parent.c.timestamp.primary_key = True
+    parent.append_constraint(PrimaryKeyConstraint(parent.c.id, parent.c.timestamp))
+    parent.dialect_options["postgresql"]["partition_by"] = "RANGE (timestamp)"
+    parent.create(conn)
+    conn.execute(text("CREATE TABLE transactions_default PARTITION OF transactions DEFAULT"))
+
+
+def _create_partition(conn, start):
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {partition_name(start)} PARTITION OF transactions "
+        f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{add_months(start, 1):%Y-%m-%d}')"
+    ))
+
+
+def _precreate(conn, now):
+    start = month_start(now)
+    for offset in range(PRECREATE_MONTHS + 1):
+        _create_partition(conn, add_months(start, offset))
+
+
+def _drain_default(conn):
+    """Move rows parked in the default partition into their own month partitions."""
+    moved = {}
+    months = conn.execute(text(
+        "SELECT DISTINCT date_trunc('month', timestamp) FROM transactions_default WHERE timestamp IS NOT NULL"
+    )).scalars().all()
+    for start in sorted(months):
+        end, name = add_months(start, 1), partition_name(start)
+        # A partition can't be created over rows the default still holds, so
+        # build it detached, move the rows, then attach it
+        bounds = {"start": start, "end": end}
+        conn.execute(text(f"CREATE TABLE {name} (LIKE transactions INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+        moved[name] = conn.execute(text(
+            f"INSERT INTO {name} SELECT * FROM transactions_default WHERE timestamp >= :start AND timestamp < :end"
+        ), bounds).rowcount
+        conn.execute(text("DELETE FROM transactions_default WHERE timestamp >= :start AND timestamp < :end"), bounds)
+        conn.execute(text(
+            f"ALTER TABLE transactions ATTACH PARTITION {name} "
+            f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+        ))
+    return moved
+
+
+def ensure(bind=None, now=None):
+    """Create the partitioned parent on a fresh Postgres database (no-op elsewhere)."""
+    bind = bind or engine
+    if bind.dialect.name != "postgresql":
+        return
+    with bind.begin() as conn:
+        if not inspect(conn).has_table("transactions"):
+            _create_parent(conn)
+            _precreate(conn, now or datetime.datetime.utcnow())
+
+
+def migrate(bind=None, progress=print):
+    """Convert an unpartitioned Postgres ``transactions`` table in place."""
+    bind = bind or engine
+    if bind.dialect.name != "postgresql":
+        progress("ℹ️  SQLite partitions are plain month tables; run without --migrate")
+        return 0
+    with bind.begin() as conn:
+        if _is_partitioned(conn):
+            return 0
+        started = time.perf_counter()
+        progress("🔁 Partitioning transactions by month...")
+        for index in inspect(conn).get_indexes("transactions"):
+            conn.execute(text(f'DROP INDEX "{index["name"]}"'))
+        conn.execute(text("ALTER TABLE transactions RENAME TO transactions_unpartitioned"))
+        conn.execute(text("ALTER TABLE transactions_unpartitioned RENAME CONSTRAINT transactions_pkey TO transactions_unpartitioned_pkey"))
+        _create_parent(conn)
+        oldest, newest = conn.execute(text("SELECT min(timestamp), max(timestamp) FROM transactions_unpartitioned")).one()
+        start = month_start(oldest or datetime.datetime.utcnow())
+        while start <= (newest or start):
+            _create_partition(conn, start)
+            start = add_months(start, 1)
+        _precreate(conn, datetime.datetime.utcnow())
+        rows = conn.execute(text("INSERT INTO transactions SELECT * FROM transactions_unpartitioned")).rowcount
+        conn.execute(text(
+            "SELECT setval(pg_get_serial_sequence('transactions', 'id'), COALESCE(MAX(id), 1)) FROM transactions"
+        ))
+        conn.execute(text("DROP TABLE transactions_unpartitioned"))
+    init_db()  # recreate the indexes on the partitioned parent
+    progress(f"✅ Partitioned {rows:,} transactions in {time.perf_counter() - started:.1f}s")
+    return rows
+
+
+# --- SQLite month tables ---
+
+def _roll_sqlite(bind, now):
+    moved = {}
+    first_hot = add_months(month_start(now), -(HOT_MONTHS - 1))
+    with bind.connect() as conn:
+        oldest, max_id = conn.execute(select(func.min(_tx.c.timestamp), func.max(_tx.c.id))).one()
+    if oldest is None:
+        return moved
+    start = month_start(oldest)
+    while start < first_hot:
+        end, name = add_months(start, 1), partition_name(start)
+        # Keep the newest row in place so SQLite never hands its id out again
+        where = and_(_tx.c.timestamp >= start, _tx.c.timestamp < end, _tx.c.id < max_id)
+        with bind.begin() as conn:
+            if conn.execute(select(_tx.c.id).where(where).limit(1)).first() is not None:
+                table = partition_table(name)
+                table.create(conn, checkfirst=True)
+                moved[name] = conn.execute(
+                    table.insert().from_select([c.name for c in _tx.columns], select(_tx).where(where))
+                ).rowcount
+                conn.execute(delete(_tx).where(where))
+        start = end
+    return moved
+
+
+def _archive_sqlite(bind, name):
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    path = os.path.abspath(os.path.join(ARCHIVE_DIR, f"{name}.db"))
+    # ATTACH can't run inside a transaction; CREATE ... AS SELECT is atomic on
+    # its own, so a rerun after a crash finds the copy and only drops
+    with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("ATTACH DATABASE :path AS archive"), {"path": path})
+        try:
+            archived = inspect(conn).has_table(name, schema="archive")
+            if not archived:
+                conn.execute(text(f"CREATE TABLE archive.{name} AS SELECT * FROM main.{name}"))
+        finally:
+            conn.execute(text("DETACH DATABASE archive"))
+    return path
+
+
+# --- Maintenance ---
+
+def roll(bind=None, now=None):
+    """Move rows into their month partitions; returns {partition: rows moved}."""
+    bind = bind or engine
+    now = now or datetime.datetime.utcnow()
+    if bind.dialect.name == "postgresql":
+        with bind.begin() as conn:
+            moved = _drain_default(conn)
+            _precreate(conn, now)
+        return moved
+    return _roll_sqlite(bind, now)
+
+
+def apply_retention(bind=None, now=None, months=RETENTION_MONTHS, action=RETENTION_ACTION):
+    """Drop or archive partitions older than ``months``; returns {partition: action}."""
+    bind = bind or engine
+    if months <= 0:
+        return {}
+    if action not in ("drop", "archive"):
+        raise ValueError(f"TX_RETENTION_ACTION must be drop or archive, not {action!r}")
+    keep_from = add_months(month_start(now or datetime.datetime.utcnow()), -(months - 1))
+    with bind.connect() as conn:
+        expired = [name for name, start in partitions(conn) if start < keep_from]
+    retired = {}
+    for name in expired:
+        if bind.dialect.name == "postgresql":
+            with bind.begin() as conn:
+                conn.execute(text(f"ALTER TABLE transactions DETACH PARTITION {name}"))
+                if action == "drop":
+                    conn.execute(text(f"DROP TABLE {name}"))
+            retired[name] = "dropped" if action == "drop" else "detached"
+            continue
+        if action == "archive":
+            retired[name] = _archive_sqlite(bind, name)
+        else:
+            retired[name] = "dropped"
+        with bind.begin() as conn:
+            partition_table(name).drop(conn)
+    return retired
+
+
+def clear(conn):
+    """Remove every monthly partition's rows, e.g. before a reseed.
+
+    SQLite month tables are dropped; Postgres partitions stay attached and
+    are emptied, so the layout is kept for the next load.
+    """
+    for name, _ in partitions(conn):
+        if conn.dialect.name == "postgresql":
+            conn.execute(text(f"DELETE FROM {name}"))
+        else:
+            partition_table(name).drop(conn)
+
+
+def maintain(bind=None, now=None):
+    """Roll rows into month partitions, then apply retention."""
+    return {"rolled": roll(bind, now), "retired": apply_retention(bind, now)}
+
+
+def status(bind=None):
+    """Row count per raw source, oldest first."""
+    bind = bind or engine
+    with bind.connect() as conn:
+        names = [name for name, _ in partitions(conn)]
+        if bind.dialect.name != "postgresql":
+            names.append("transactions")
+        elif inspect(conn).has_table("transactions_default"):
+            names.append("transactions_default")
+        return [(name, conn.execute(text(f"SELECT count(*) FROM {name}")).scalar()) for name in names]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monthly transaction partitions and retention")
+    parser.add_argument("--status", action="store_true", help="row count per partition")
+    parser.add_argument("--migrate", action="store_true", help="Postgres: partition an existing table")
+    args = parser.parse_args()
+
+    init_db()
+    if args.status:
+        for name, rows in status():
+            print(f"   • {name}: {rows:,} rows")
+    elif args.migrate:
+        if not migrate():
+            print("✅ Nothing to migrate")
+    else:
+        started = time.perf_counter()
+        result = maintain()
+        for name, rows in result["rolled"].items():
+            print(f"   • {name}: {rows:,} rows rolled")
+        for name, outcome in result["retired"].items():
+            print(f"   • {name}: {outcome}")
+        print(f"✅ Partition maintenance done in {time.perf_counter() - started:.1f}s")
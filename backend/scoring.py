@@ -0,0 +1,479 @@
+"""
+Portfolio scoring engine.
+
+Loads the Group A-F stress indicators from ``models.User`` into columnar
+NumPy arrays and scores the whole book in vectorised passes, writing the
+calibrated score back to ``current_risk_score`` (the score every reader uses)
+and ``final_score`` with bulk UPDATEs. The raw score is linear in the
+per-feature stress and the calibration is a per-user scale factor, so the same
+pass also yields an exact additive attribution per indicator, stored in
+``risk_attributions`` for profile reads. Rows are
+processed in keyset-ordered chunks so memory stays bounded no matter how many
+borrowers there are.
+"""
+import argparse
+import datetime
+import json
+import os
+import time
+
+import numpy as np
+from sqlalchemy import bindparam, case, delete, func, insert, select, update
+
+from cache import profile_cache
+import events
+from database import engine, init_db
+import models
+
+User = models.User
+
+# Group weights as documented on models.User (they sum to 100)
+GROUP_WEIGHTS = {"A": 30, "B": 20, "C": 10, "D": 15, "E": 15, "F": 10}
+
+
+def _flag(condition):
+    return case((condition, 1.0), else_=0.0)
+
+
+# Each indicator: (feature, group, SQL expression, lo, hi).
+# The raw value is mapped linearly onto [0, 1] stress, where ``lo`` is no
+# stress and ``hi`` is full stress; lo > hi means "lower is worse".
+# NULLs fall back to the column defaults declared on the model.
+INDICATORS = [
+    # Group A: Liquidity
+    ("salary_credit_variance_days", "A", func.coalesce(User.salary_credit_variance_days, 0), 0.0, 15.0),
+    ("liquidity_coverage_ratio", "A", func.coalesce(User.liquidity_coverage_ratio, 2.0), 3.0, 0.0),
+    ("nach_failures_count", "A", func.coalesce(User.nach_failures_count, 0), 0.0, 3.0),
+    ("remittance_volatility_percent", "A", func.coalesce(User.remittance_volatility_percent, 0.0), 0.0, 60.0),
+    # Group B: Debt
+    ("micro_credit_tx_count", "B", func.coalesce(User.micro_credit_tx_count, 0), 0.0, 15.0),
+    ("credit_card_utilization", "B", func.coalesce(User.credit_card_utilization, 20.0), 30.0, 95.0),
+    ("atm_withdrawal_velocity", "B", func.coalesce(User.atm_withdrawal_velocity, 1.0), 1.0, 3.0),
+    ("inquiry_density_7_days", "B", func.coalesce(User.inquiry_density_7_days, 0), 0.0, 12.0),
+    # Group C: Operational
+    ("discretionary_spend_reduction", "C", func.coalesce(User.discretionary_spend_reduction, 0.0), 0.0, 50.0),
+    ("utility_payment_latency_days", "C", func.coalesce(User.utility_payment_latency_days, 0), 0.0, 60.0),
+    ("high_risk_merchant_tx_count", "C", func.coalesce(User.high_risk_merchant_tx_count, 0), 0.0, 20.0),
+    ("insurance_premium_status", "C", _flag(User.insurance_premium_status == "Lapsed"), 0.0, 1.0),
+    # Group D: Assets
+    ("sip_consistency_score", "D", func.coalesce(User.sip_consistency_score, 1.0), 1.0, 0.0),
+    ("asset_volatility_flag", "D", _flag(User.asset_volatility_flag.is_(True)), 0.0, 1.0),
+    ("portfolio_liquidation_flag", "D", _flag(User.portfolio_liquidation_flag.is_(True)), 0.0, 1.0),
+    ("pledge_activity_flag", "D", _flag(User.pledge_activity_flag.is_(True)), 0.0, 1.0),
+    # Group E: Employment
+    ("epf_contribution", "E", _flag(func.coalesce(User.epf_contribution, 0.0) <= 0), 0.0, 1.0),
+    ("epf_gap_detected", "E", _flag(User.epf_gap_detected.is_(True)), 0.0, 1.0),
+    ("tax_compliance_status", "E", _flag(func.coalesce(User.tax_compliance_status, "Compliant") != "Compliant"), 0.0, 1.0),
+    ("job_search_activity_index", "E", func.coalesce(User.job_search_activity_index, 0.0), 0.0, 1.0),
+    # Group F: Geo-Environmental
+    ("disaster_zone_flag", "F", _flag(User.disaster_zone_flag.is_(True)), 0.0, 1.0),
+    ("infrastructure_failure_flag", "F", _flag(User.infrastructure_failure_flag.is_(True)), 0.0, 1.0),
+]
+
+FEATURES = [name for name, *_ in INDICATORS]
+FEATURE_GROUPS = np.array([group for _, group, *_ in INDICATORS])
+_LO = np.array([lo for *_, lo, _ in INDICATORS], dtype=np.float64)
+_HI = np.array([hi for *_, hi in INDICATORS], dtype=np.float64)
+
+# A group's weight is split evenly across its indicators, so a user at full
+# stress on every indicator scores exactly 100.
+FEATURE_WEIGHTS = np.array(
+    [GROUP_WEIGHTS[g] / np.count_nonzero(FEATURE_GROUPS == g) for g in FEATURE_GROUPS],
+    dtype=np.float64,
+)
+
+GROUPS = sorted(GROUP_WEIGHTS)
+
+# Risk bands on the calibrated score, shared by analytics, geo and the
+# intervention rules: CRITICAL_SCORE and up is critical, AT_RISK_SCORE up to
+# CRITICAL_SCORE - 1 is at risk (warning), anything lower is safe
+CRITICAL_SCORE = 75
+AT_RISK_SCORE = 50
+
+
+def band(score):
+    """SQL CASE naming the risk band of a score column: critical, at_risk or safe."""
+    return case((score >= CRITICAL_SCORE, "critical"), (score >= AT_RISK_SCORE, "at_risk"), else_="safe")
+
+
+# Monotone (raw, calibrated) knots. Few users are stressed on more than a
+# handful of indicators, so raw weighted stress bunches below 25; the knots
+# spread it so status cohorts land in the bands above. Fitted on the medians
+# and quartiles of the seeded persona archetypes; raw 0 stays 0 so
+# attributions remain exact.
+CALIBRATION = [
+    (0.0, 0.0), (5.5, AT_RISK_SCORE - 1.0), (14.0, float(CRITICAL_SCORE)), (25.0, 95.0), (100.0, 100.0),
+]
+_CAL_RAW = np.array([raw for raw, _ in CALIBRATION])
+_CAL_SCORE = np.array([score for _, score in CALIBRATION])
+
+# (n_features, n_groups) matrix that averages stress within each group
+_GROUP_MEAN = np.array(
+    [[1.0 if FEATURE_GROUPS[i] == g else 0.0 for g in GROUPS] for i in range(len(INDICATORS))]
+)
+_GROUP_MEAN /= _GROUP_MEAN.sum(axis=0)
+
+_INDICATOR_COLUMNS = [expr.label(name) for name, _, expr, *_ in INDICATORS]
+
+# Display name and explanation for each attributed feature
+FEATURE_LABELS = {
+    "salary_credit_variance_days": ("Salary Delay", "Salary credited {value:.0f} days later than usual"),
+    "liquidity_coverage_ratio": ("Liquidity Crunch", "Savings cover {value:.1f}x of monthly obligations"),
+    "nach_failures_count": ("NACH Bounces", "{value:.0f} failed auto-debits"),
+    "remittance_volatility_percent": ("Income Volatility", "Inflows swing {value:.0f}% month to month"),
+    "micro_credit_tx_count": ("Micro-Credit Use", "{value:.0f} small-ticket credit transactions"),
+    "credit_card_utilization": ("Credit Utilization", "Usage is {value:.1f}% of limit"),
+    "atm_withdrawal_velocity": ("Cash Withdrawals", "ATM withdrawals at {value:.1f}x the 180-day average"),
+    "inquiry_density_7_days": ("Credit Inquiries", "{value:.0f} hard inquiries in 7 days"),
+    "discretionary_spend_reduction": ("Spending Cutback", "Discretionary spend down {value:.0f}%"),
+    "utility_payment_latency_days": ("Utility Payment Delay", "Utility bills paid {value:.0f} days late"),
+    "high_risk_merchant_tx_count": ("High-Risk Merchants", "{value:.0f} gambling/gaming transactions"),
+    "insurance_premium_status": ("Insurance Lapse", "Insurance premium has lapsed"),
+    "sip_consistency_score": ("SIP Stoppage", "SIP consistency at {value:.0%}"),
+    "asset_volatility_flag": ("Asset Volatility", "Holdings under unusual volatility"),
+    "portfolio_liquidation_flag": ("Portfolio Liquidation", "Investments being liquidated"),
+    "pledge_activity_flag": ("Asset Pledging", "Assets pledged against credit"),
+    "epf_contribution": ("EPF Contribution", "Lack of steady employment signal"),
+    "epf_gap_detected": ("EPF Gap", "Break in EPF contributions detected"),
+    "tax_compliance_status": ("Tax Compliance", "Tax filings not compliant"),
+    "job_search_activity_index": ("Job Search Activity", "Job search activity index at {value:.2f}"),
+    "disaster_zone_flag": ("Geo-Risk", "Location in active disaster zone"),
+    "infrastructure_failure_flag": ("Infrastructure Failure", "Local infrastructure outage reported"),
+}
+
+
+def indicator_query(after_id=None, limit=None):
+    """SELECT of (id, *indicators, previous score) in primary-key order, for keyset batching."""
+    stmt = select(User.id, *_INDICATOR_COLUMNS, User.final_score.label("previous_score")).order_by(User.id)
+    if after_id is not None:
+        stmt = stmt.where(User.id > after_id)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+
+def to_arrays(rows):
+    """Split fetched rows into an id array and an (n_users, n_features) float matrix."""
+    if not rows:
+        return np.empty(0, dtype=object), np.empty((0, len(INDICATORS)), dtype=np.float64)
+    ids = np.array([r[0] for r in rows], dtype=object)
+    X = np.array([r[1:len(INDICATORS) + 1] for r in rows], dtype=np.float64)
+    return ids, X
+
+
+def previous_scores(rows):
+    """final_score before this run from ``indicator_query`` rows; -1 where never scored."""
+    return np.array([-1 if r[-1] is None else r[-1] for r in rows], dtype=np.int64)
+
+
+def publish_changes(ids, scores, previous=None):
+    """Push ``score`` deltas for users whose score moved (all of them without ``previous``)."""
+    changed = np.ones(len(ids), dtype=bool) if previous is None else scores != previous
+    events.publish({"id": uid, "score": int(s)} for uid, s in zip(ids[changed].tolist(), scores[changed].tolist()))
+
+
+def stress_matrix(X):
+    """Map raw indicator values onto [0, 1] stress, column by column."""
+    return np.clip((X - _LO) / (_HI - _LO), 0.0, 1.0)
+
+
+def calibrate(raw):
+    """Map raw weighted stress (0-100) onto the calibrated 0-100 score scale."""
+    return np.interp(raw, _CAL_RAW, _CAL_SCORE)
+
+
+def attribution_matrix(X):
+    """Per-feature score contributions; each row sums to the unrounded calibrated score."""
+    raw = stress_matrix(X) * FEATURE_WEIGHTS
+    total = raw.sum(axis=1)
+    scale = np.divide(calibrate(total), total, out=np.zeros_like(total), where=total > 0)
+    return raw * scale[:, None]
+
+
+def score_matrix(X):
+    """Calibrated 0-100 score for every row of a raw indicator matrix."""
+    return np.rint(calibrate(stress_matrix(X) @ FEATURE_WEIGHTS)).astype(np.int64)
+
+
+def group_matrix(X):
+    """Mean stress per Group A-F as 0-100 integers, shape (n_users, 6)."""
+    return np.rint(stress_matrix(X) @ _GROUP_MEAN * 100).astype(np.int64)
+
+
+def write_scores(conn, ids, scores):
+    """Bulk UPDATE the score for the given ids (one executemany).
+
+    The engine owns ``current_risk_score``: lists, filters, bands and
+    intervention rules all read it, so it is written through together with
+    ``final_score``.
+    """
+    if len(ids) == 0:
+        return
+    users = User.__table__
+    stmt = (
+        update(users)
+        .where(users.c.id == bindparam("b_id"))
+        .values(current_risk_score=bindparam("b_score"), final_score=bindparam("b_score"))
+    )
+    conn.execute(stmt, [{"b_id": uid, "b_score": int(s)} for uid, s in zip(ids, scores)])
+
+
+def write_attributions(conn, ids, impacts):
+    """Replace the stored attributions for ``ids``; zero impacts are not stored."""
+    if len(ids) == 0:
+        return
+    table = models.RiskAttribution.__table__
+    # executemany rather than IN (...) so batch size is not capped by bind limits
+    conn.execute(delete(table).where(table.c.user_id == bindparam("b_id")), [{"b_id": uid} for uid in ids])
+    rows, cols = np.nonzero(impacts > 1e-9)
+    if rows.size:
+        conn.execute(insert(table), [
+            {"user_id": ids[r], "feature": FEATURES[c], "impact": round(float(impacts[r, c]), 3)}
+            for r, c in zip(rows.tolist(), cols.tolist())
+        ])
+
+
+def append_history(conn, run_id, ts, ids, scores, groups):
+    """Append one history row per user for this run."""
+    if len(ids) == 0:
+        return
+    group_columns = [f"group_{g.lower()}" for g in GROUPS]
+    conn.execute(insert(models.RiskScoreHistory.__table__), [
+        {"user_id": uid, "run_id": run_id, "ts": ts, "score": score, **dict(zip(group_columns, subscores))}
+        for uid, score, subscores in zip(ids, scores.tolist(), groups.tolist())
+    ])
+
+
+def start_run(conn, mode):
+    runs = models.ScoringRun.__table__
+    result = conn.execute(insert(runs).values(mode=mode, started_at=datetime.datetime.utcnow()))
+    return result.inserted_primary_key[0]
+
+
+def finish_run(conn, run_id, users_scored):
+    runs = models.ScoringRun.__table__
+    conn.execute(
+        update(runs)
+        .where(runs.c.id == run_id)
+        .values(finished_at=datetime.datetime.utcnow(), users_scored=users_scored)
+    )
+
+
+def score_batch(conn, ids, X, run_id, ts):
+    """Write scores, attributions and history rows for one batch of users; returns the scores."""
+    scores = score_matrix(X)
+    write_scores(conn, ids, scores)
+    write_attributions(conn, ids, attribution_matrix(X))
+    append_history(conn, run_id, ts, ids, scores, group_matrix(X))
+    return scores
+
+
+def score_user(conn, user_id):
+    """On-demand rescore and attribution of a single user; returns the score or None."""
+    stmt = select(User.id, *_INDICATOR_COLUMNS).where(User.id == user_id)
+    ids, X = to_arrays(conn.execute(stmt).all())
+    if len(ids) == 0:
+        return None
+    run_id = start_run(conn, "user")
+    score_batch(conn, ids, X, run_id, datetime.datetime.utcnow())
+    finish_run(conn, run_id, 1)
+    return int(score_matrix(X)[0])
+
+
+def explain_user(conn, user_id, limit=None):
+    """In-memory (score, [(feature, impact), ...]) for one user, impacts largest first.
+
+    Both come from the same indicator row, so the impacts add up to the
+    score; nothing is written. Returns (None, []) for an unknown user.
+    """
+    stmt = select(User.id, *_INDICATOR_COLUMNS).where(User.id == user_id)
+    ids, X = to_arrays(conn.execute(stmt).all())
+    if len(ids) == 0:
+        return None, []
+    impacts = attribution_matrix(X)[0]
+    pairs = [(FEATURES[i], round(float(impacts[i]), 3)) for i in np.argsort(-impacts, kind="stable") if impacts[i] > 1e-9]
+    return int(score_matrix(X)[0]), pairs[:limit]
+
+
+def _change_high_water(conn):
+    return conn.execute(select(func.max(models.UserChange.id))).scalar()
+
+
+def _consume_changes(conn, high_water):
+    if high_water is not None:
+        changes = models.UserChange.__table__
+        conn.execute(delete(changes).where(changes.c.id <= high_water))
+
+
+def score_portfolio(bind=None, chunk_size=50_000):
+    """Rescore and re-attribute every user; returns the number of users written.
+
+    A full run also settles the change log up to the point it started from.
+    """
+    bind = bind or engine
+    with bind.begin() as conn:
+        run_id = start_run(conn, "full")
+        high_water = _change_high_water(conn)
+    # Every row of a run shares one timestamp so trajectories line up
+    ts = datetime.datetime.utcnow()
+    scored = 0
+    last_id = None
+    while True:
+        with bind.begin() as conn:
+            rows = conn.execute(indicator_query(last_id, chunk_size)).all()
+            if not rows:
+                break
+            ids, X = to_arrays(rows)
+            scores = score_batch(conn, ids, X, run_id, ts)
+        profile_cache.invalidate_many(ids.tolist())
+        publish_changes(ids, scores, previous_scores(rows))
+        scored += len(ids)
+        last_id = ids[-1]
+        if len(rows) < chunk_size:
+            break
+    with bind.begin() as conn:
+        finish_run(conn, run_id, scored)
+        _consume_changes(conn, high_water)
+    if scored:
+        profile_cache.clear(broadcast=True)
+    return scored
+
+
+def load_snapshot(path):
+    """Open an ``export.write_snapshot`` directory memory-mapped.
+
+    Returns (ids, X): a fixed-width bytes id array and the (n_users,
+    n_features) indicator matrix, both backed by the files rather than RAM.
+    """
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    if meta["features"] != FEATURES:
+        raise ValueError(f"snapshot at {path} was written for a different indicator set")
+    ids = np.load(os.path.join(path, "ids.npy"), mmap_mode="r")
+    X = np.load(os.path.join(path, "features.npy"), mmap_mode="r")
+    if len(ids) != meta["rows"] or X.shape != (meta["rows"], len(FEATURES)):
+        raise ValueError(f"snapshot at {path} is incomplete")
+    return ids, X
+
+
+def score_snapshot(path, bind=None, chunk_size=50_000):
+    """Score every user in a feature snapshot instead of reading the users table.
+
+    The snapshot is as of its export time; use it for backfills and what-if
+    runs, not to overwrite scores of users edited since.
+    """
+    bind = bind or engine
+    ids, X = load_snapshot(path)
+    with bind.begin() as conn:
+        run_id = start_run(conn, "snapshot")
+    ts = datetime.datetime.utcnow()
+    for lo in range(0, len(ids), chunk_size):
+        chunk_ids = np.array(np.char.decode(ids[lo:lo + chunk_size]).tolist(), dtype=object)
+        with bind.begin() as conn:
+            scores = score_batch(conn, chunk_ids, np.asarray(X[lo:lo + chunk_size]), run_id, ts)
+        profile_cache.invalidate_many(chunk_ids.tolist())
+        publish_changes(chunk_ids, scores)
+    with bind.begin() as conn:
+        finish_run(conn, run_id, len(ids))
+    profile_cache.clear(broadcast=True)
+    return len(ids)
+
+
+def score_users(user_ids, bind=None, chunk_size=10_000):
+    """Rescore a known cohort of users, e.g. one a geo event just flagged.
+
+    The change log is not touched: entries for these users stay for the
+    next ``rescore_changed`` run, which simply repeats the same scores.
+    """
+    bind = bind or engine
+    user_ids = sorted(set(user_ids))
+    if not user_ids:
+        return 0
+    with bind.begin() as conn:
+        run_id = start_run(conn, "cohort")
+    ts = datetime.datetime.utcnow()
+    scored = 0
+    for lo in range(0, len(user_ids), chunk_size):
+        with bind.begin() as conn:
+            rows = conn.execute(indicator_query().where(User.id.in_(user_ids[lo:lo + chunk_size]))).all()
+            ids, X = to_arrays(rows)
+            scores = score_batch(conn, ids, X, run_id, ts)
+        profile_cache.invalidate_many(ids.tolist())
+        publish_changes(ids, scores, previous_scores(rows))
+        scored += len(ids)
+    with bind.begin() as conn:
+        finish_run(conn, run_id, scored)
+    profile_cache.clear(broadcast=True)
+    return scored
+
+
+def rescore_changed(bind=None, chunk_size=10_000):
+    """Rescore only users with logged input changes; returns users written.
+
+    Changes are read up to a high-water mark taken at the start and deleted
+    only after every affected user is rescored, so changes logged meanwhile
+    are kept for the next run and a crashed run simply repeats its work.
+    """
+    bind = bind or engine
+    changes = models.UserChange.__table__
+    with bind.begin() as conn:
+        high_water = _change_high_water(conn)
+        if high_water is None:
+            return 0
+        run_id = start_run(conn, "incremental")
+    ts = datetime.datetime.utcnow()
+    scored = 0
+    last_id = None
+    while True:
+        # Next slice of distinct changed ids, joined straight to the indicators
+        pending = select(changes.c.user_id).where(changes.c.id <= high_water).distinct()
+        if last_id is not None:
+            pending = pending.where(changes.c.user_id > last_id)
+        pending = pending.order_by(changes.c.user_id).limit(chunk_size).subquery()
+        with bind.begin() as conn:
+            slice_ids = conn.execute(select(pending.c.user_id)).scalars().all()
+            if not slice_ids:
+                break
+            stmt = indicator_query().join(pending, pending.c.user_id == User.id)
+            rows = conn.execute(stmt).all()
+            ids, X = to_arrays(rows)
+            scores = score_batch(conn, ids, X, run_id, ts)
+        profile_cache.invalidate_many(ids.tolist())
+        publish_changes(ids, scores, previous_scores(rows))
+        scored += len(ids)
+        last_id = slice_ids[-1]
+        if len(slice_ids) < chunk_size:
+            break
+    with bind.begin() as conn:
+        finish_run(conn, run_id, scored)
+        _consume_changes(conn, high_water)
+    if scored:
+        profile_cache.clear(broadcast=True)
+    return scored
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rescore the whole portfolio")
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    parser.add_argument("--user", help="rescore and explain a single user")
+    parser.add_argument("--incremental", action="store_true", help="rescore only users with logged changes")
+    parser.add_argument("--snapshot", help="score from an export.py feature snapshot directory")
+    args = parser.parse_args()
+    init_db()
+
+    if args.user:
+        with engine.begin() as conn:
+            score = score_user(conn, args.user)
+        profile_cache.clear(broadcast=True)
+        print(f"✅ {args.user}: score {score}" if score is not None else f"❌ {args.user} not found")
+        raise SystemExit(0 if score is not None else 1)
+
+    started = time.perf_counter()
+    if args.snapshot:
+        count = score_snapshot(args.snapshot, chunk_size=args.chunk_size)
+    elif args.incremental:
+        count = rescore_changed(chunk_size=args.chunk_size)
+    else:
+        count = score_portfolio(chunk_size=args.chunk_size)
+    elapsed = time.perf_counter() - started
+    print(f"✅ Scored {count} users in {elapsed:.2f}s ({count / max(elapsed, 1e-9):,.0f} users/sec)")
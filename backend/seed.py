@@ -1,15 +1,133 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import create_engine
-from database import SessionLocal, engine
-from models import Base, User, Account, Transaction, Loan
+from database import SessionLocal, engine, init_db
+from models import Base, User, Account, Transaction, Loan, UserSpendAggregate, RiskAttribution, RiskScoreHistory, ScoringRun, UserChange, Intervention, CashflowProjection
 from datetime import datetime, timedelta
 import random
 
+import argparse
+import time
+
+import numpy as np
+
+from scoring import score_portfolio
+from amortization import emi as annuity_emi, project_portfolio
+from ingest import chunked, insert_rows
+import aggregates
+import partitions
+
+# Enhanced personas with more diversity
+PERSONAS = [
+    # === CRITICAL RISK PROFILES (Score 75-95) ===
+    {"name": "Ananya Das", "role": "Junior Developer", "income": 45000, "epf": 1800, "status": "Critical", "scenario": "Severe Liquidity Crisis", "var_days": 8, "lcr": 0.5, "cc_util": 88.0},
+    {"name": "Ramesh Kumar", "role": "Factory Worker", "income": 18000, "epf": 900, "status": "Critical", "scenario": "Multiple Micro-Loans", "micro_tx": 15, "cc_util": 95.0},
+    {"name": "Vikram Malhotra", "role": "Marketing Manager", "income": 150000, "epf": 3000, "status": "Critical", "scenario": "Debt Trap - High Utilization", "cc_util": 92.0, "inquiries": 12},
+    {"name": "Karan Johar", "role": "Unemployed", "income": 0, "epf": 0, "status": "Emergency", "scenario": "Job Loss + Gambling", "utility_lag": 60, "risk_merch": 25, "job_search": 0.95},
+    {"name": "Rahul Dravid", "role": "Retired Professional", "income": 30000, "epf": 0, "status": "Critical", "scenario": "Asset Liquidation", "liq_flag": True, "sip_stop": True},
+    {"name": "Arjun Rampal", "role": "Laid-off Engineer", "income": 80000, "epf": 0, "status": "Emergency", "scenario": "Sudden Job Loss", "epf_gap": True, "job_search": 0.9, "utility_lag": 30},
+    {"name": "Farmer Ravi", "role": "Agriculture", "income": 12000, "epf": 0, "status": "Critical", "scenario": "Crop Failure + Debt", "disaster": True, "micro_tx": 8, "pincode": "500001"},
+    {"name": "Deepak Chahar", "role": "Gig Driver", "income": 22000, "epf": 0, "status": "Critical", "scenario": "Income Volatility", "remit_drop": 65.0, "var_days": 12},
+    {"name": "Priya Sharma", "role": "Freelancer", "income": 35000, "epf": 0, "status": "Critical", "scenario": "Irregular Income + High EMI", "remit_drop": 50.0, "cc_util": 78.0},
+    {"name": "Amit Shah", "role": "Day Trader", "income": 500000, "epf": 0, "status": "Critical", "scenario": "Trading Losses + Hard Inquiries", "inquiries": 18, "liq_flag": True},
+    
+    # === HIGH RISK / WARNING (Score 50-75) ===
+    {"name": "Suresh Reddy", "role": "Delivery Partner", "income": 25000, "epf": 0, "status": "Warning", "scenario": "Remittance Volatility", "remit_drop": 40.0, "micro_tx": 5},
+    {"name": "Sneha Patil", "role": "College Student", "income": 5000, "epf": 0, "status": "Warning", "scenario": "Student Debt Burden", "cc_util": 45.0, "micro_tx": 6},
+    {"name": "Pooja Hegde", "role": "Social Media Influencer", "income": 200000, "epf": 0, "status": "Warning", "scenario": "Lifestyle Inflation", "risk_merch": 8, "cc_util": 55.0},
+    {"name": "Manish Tiwari", "role": "Bank Manager", "income": 90000, "epf": 2500, "status": "Warning", "scenario": "SIP Stoppage Signal", "sip_stop": True, "pledge": True},
+    {"name": "Zara Khan", "role": "Consultant", "income": 120000, "epf": 0, "status": "Warning", "scenario": "Tax Compliance Gap", "tax": "Delayed", "cc_util": 48.0},
+    {"name": "Rohit Sharma", "role": "Sales Executive", "income": 55000, "epf": 1800, "status": "Warning", "scenario": "Commission Dependency", "remit_drop": 35.0, "var_days": 6},
+    {"name": "Kavya Reddy", "role": "Startup Employee", "income": 65000, "epf": 2000, "status": "Warning", "scenario": "Equity Illiquidity", "sip_stop": True, "cc_util": 52.0},
+    {"name": "Sanjay Dutt", "role": "Restaurant Owner", "income": 80000, "epf": 0, "status": "Warning", "scenario": "Business Slowdown", "remit_drop": 30.0, "utility_lag": 15},
+    {"name": "Neha Kakkar", "role": "Music Teacher", "income": 40000, "epf": 1200, "status": "Warning", "scenario": "Seasonal Income Dip", "var_days": 10, "lcr": 1.2},
+    {"name": "Aditya Roy", "role": "Content Creator", "income": 75000, "epf": 0, "status": "Warning", "scenario": "Platform Dependency", "remit_drop": 45.0, "risk_merch": 5},
+    
+    # === MODERATE RISK (Score 35-50) ===
+    {"name": "Rajesh Khanna", "role": "Government Employee", "income": 70000, "epf": 3500, "status": "Safe", "scenario": "Stable Income", "lcr": 3.5, "cc_util": 25.0},
+    {"name": "Meera Nair", "role": "School Teacher", "income": 50000, "epf": 2000, "status": "Safe", "scenario": "Conservative Spender", "lcr": 4.0, "cc_util": 18.0},
+    {"name": "Vijay Kumar", "role": "IT Professional", "income": 110000, "epf": 4500, "status": "Safe", "scenario": "Balanced Profile", "lcr": 3.0, "cc_util": 30.0},
+    {"name": "Anjali Mehta", "role": "HR Manager", "income": 95000, "epf": 3800, "status": "Safe", "scenario": "Good Financial Health", "lcr": 3.8, "cc_util": 22.0},
+    {"name": "Karthik Subramanian", "role": "Accountant", "income": 60000, "epf": 2400, "status": "Safe", "scenario": "Disciplined Saver", "lcr": 5.0, "cc_util": 15.0},
+    
+    # === LOW RISK / IDEAL CUSTOMERS (Score 10-35) ===
+    {"name": "Kabir Singh", "role": "Senior Doctor", "income": 300000, "epf": 0, "status": "Clean", "scenario": "High Income Professional", "lcr": 8.0, "cc_util": 12.0, "sip_score": 1.0},
+    {"name": "Nita Ambani", "role": "Business Owner", "income": 1000000, "epf": 0, "status": "Clean", "scenario": "Ultra HNI", "lcr": 15.0, "cc_util": 5.0},
+    {"name": "Dr. Sunita Rao", "role": "Surgeon", "income": 450000, "epf": 0, "status": "Clean", "scenario": "Medical Professional", "lcr": 10.0, "cc_util": 8.0},
+    {"name": "Ravi Shankar", "role": "Senior Architect", "income": 250000, "epf": 10000, "status": "Clean", "scenario": "Stable High Earner", "lcr": 7.5, "cc_util": 10.0},
+    {"name": "Priyanka Chopra", "role": "Corporate Executive", "income": 350000, "epf": 14000, "status": "Clean", "scenario": "Executive Level", "lcr": 9.0, "cc_util": 6.0, "sip_score": 1.0},
+    
+    # === EDGE CASES & SPECIAL SCENARIOS ===
+    {"name": "Edge Zero Income", "role": "Unemployed Student", "income": 0, "epf": 0, "status": "Critical", "scenario": "No Income Source", "micro_tx": 10},
+    {"name": "Edge Ultra Rich", "role": "CEO", "income": 5000000, "epf": 100000, "status": "Clean", "scenario": "Ultra High Net Worth", "lcr": 50.0},
+    {"name": "Disaster Victim", "role": "Flood Affected", "income": 30000, "epf": 1200, "status": "Critical", "scenario": "Natural Disaster", "disaster": True, "infra_fail": True, "pincode": "400001"},
+    {"name": "Medical Emergency", "role": "Patient", "income": 55000, "epf": 2200, "status": "Critical", "scenario": "Health Crisis", "cc_util": 85.0, "micro_tx": 12},
+    {"name": "Divorce Settlement", "role": "Legal Battle", "income": 100000, "epf": 4000, "status": "Warning", "scenario": "Legal Expenses", "cc_util": 70.0, "inquiries": 8},
+    
+    # === MIXED COMPLEXITY CASES ===
+    {"name": "Complex Risk Alpha", "role": "Crypto Trader", "income": 150000, "epf": 0, "status": "Critical", "scenario": "High Risk Investments", "liq_flag": True, "risk_merch": 20, "cc_util": 80.0},
+    {"name": "Complex Risk Beta", "role": "Multi-Business Owner", "income": 400000, "epf": 0, "status": "Warning", "scenario": "Business Diversification", "remit_drop": 25.0, "cc_util": 45.0},
+    {"name": "Complex Risk Gamma", "role": "NRI Remittance", "income": 200000, "epf": 0, "status": "Warning", "scenario": "Foreign Income Dependency", "remit_drop": 55.0, "var_days": 15},
+    
+    # === SECTOR-SPECIFIC PROFILES ===
+    {"name": "Tech Startup Founder", "role": "Entrepreneur", "income": 180000, "epf": 0, "status": "Warning", "scenario": "Startup Burn Rate", "cc_util": 65.0, "pledge": True},
+    {"name": "Real Estate Agent", "role": "Property Dealer", "income": 120000, "epf": 0, "status": "Warning", "scenario": "Commission Based", "remit_drop": 40.0, "var_days": 8},
+    {"name": "Airline Pilot", "role": "Commercial Pilot", "income": 280000, "epf": 11200, "status": "Safe", "scenario": "Aviation Professional", "lcr": 6.0, "cc_util": 20.0},
+    {"name": "Fashion Designer", "role": "Designer", "income": 95000, "epf": 0, "status": "Warning", "scenario": "Seasonal Business", "remit_drop": 35.0, "cc_util": 50.0},
+    {"name": "Gym Trainer", "role": "Fitness Coach", "income": 35000, "epf": 0, "status": "Warning", "scenario": "Client Dependency", "var_days": 7, "lcr": 1.5},
+    {"name": "Uber Driver", "role": "Ride Share", "income": 28000, "epf": 0, "status": "Warning", "scenario": "Platform Worker", "remit_drop": 30.0, "micro_tx": 4},
+    {"name": "YouTuber", "role": "Content Creator", "income": 85000, "epf": 0, "status": "Warning", "scenario": "Ad Revenue Volatility", "remit_drop": 50.0, "risk_merch": 6},
+    
+    # === ADDITIONAL DIVERSE PROFILES ===
+    {"name": "Retired Army Officer", "role": "Pension", "income": 60000, "epf": 0, "status": "Safe", "scenario": "Pension Income", "lcr": 5.0, "cc_util": 12.0},
+    {"name": "College Professor", "role": "Academic", "income": 85000, "epf": 3400, "status": "Safe", "scenario": "Academic Stability", "lcr": 4.5, "cc_util": 18.0},
+    {"name": "Chartered Accountant", "role": "CA", "income": 180000, "epf": 0, "status": "Clean", "scenario": "Professional Services", "lcr": 7.0, "cc_util": 15.0},
+    {"name": "Software Engineer", "role": "SDE-3", "income": 220000, "epf": 8800, "status": "Clean", "scenario": "Tech Professional", "lcr": 6.5, "cc_util": 20.0, "sip_score": 1.0},
+    {"name": "Pharmacist", "role": "Medical Store", "income": 45000, "epf": 1800, "status": "Safe", "scenario": "Healthcare Worker", "lcr": 3.2, "cc_util": 25.0},
+    {"name": "Electrician", "role": "Skilled Worker", "income": 32000, "epf": 1280, "status": "Warning", "scenario": "Daily Wage", "var_days": 5, "lcr": 1.8},
+    {"name": "Lawyer", "role": "Legal Practitioner", "income": 160000, "epf": 0, "status": "Safe", "scenario": "Legal Professional", "lcr": 5.5, "cc_util": 28.0},
+    {"name": "Journalist", "role": "Reporter", "income": 55000, "epf": 2200, "status": "Safe", "scenario": "Media Professional", "lcr": 3.0, "cc_util": 32.0},
+    {"name": "Chef", "role": "Restaurant Chef", "income": 48000, "epf": 1920, "status": "Safe", "scenario": "Hospitality Worker", "lcr": 2.8, "cc_util": 35.0},
+    {"name": "Photographer", "role": "Freelance Photo", "income": 42000, "epf": 0, "status": "Warning", "scenario": "Project Based", "remit_drop": 28.0, "var_days": 6},
+]
+
+# Enhanced transaction categories and merchants
+TX_CATEGORIES = ["Food", "Rent", "Utilities", "Shopping", "Entertainment", "Medical", "Travel", "Education", "Investment", "Insurance"]
+MERCHANTS = {
+    "Food": ["Swiggy", "Zomato", "McDonald's", "Starbucks", "Domino's", "KFC", "Local Restaurant", "Grocery Store"],
+    "Rent": ["Landlord Transfer", "NoBroker", "Housing Society"],
+    "Utilities": ["BESCOM", "Airtel", "Jio Fiber", "Gas Bill", "Water Bill", "Broadband"],
+    "Shopping": ["Amazon", "Flipkart", "Myntra", "Zara", "H&M", "Big Bazaar", "DMart"],
+    "Entertainment": ["Netflix", "Amazon Prime", "BookMyShow", "PVR Cinemas", "Spotify", "Gaming"],
+    "Medical": ["Apollo Pharmacy", "Practo", "Hospital Bill", "Health Checkup", "Medicine"],
+    "Travel": ["Uber", "Ola", "IRCTC", "Indigo", "SpiceJet", "MakeMyTrip"],
+    "Education": ["Udemy", "Coursera", "School Fees", "Tuition", "Books"],
+    "Investment": ["Zerodha", "Groww", "Mutual Fund SIP", "Stock Purchase", "Gold"],
+    "Insurance": ["LIC Premium", "Health Insurance", "Car Insurance", "Term Insurance"],
+    "Gambling": ["Dream11", "Bet365", "RummyCircle", "Online Casino", "Sports Betting"],
+    "Loan": ["KreditBee", "MoneyTap", "Bajaj Finserv", "Credit Card Bill", "PayLater"]
+}
+
+def wipe_db(db):
+    db.query(UserChange).delete()
+    db.query(Intervention).delete()
+    db.query(CashflowProjection).delete()
+    db.query(RiskScoreHistory).delete()
+    db.query(ScoringRun).delete()
+    db.query(RiskAttribution).delete()
+    db.query(UserSpendAggregate).delete()
+    # Rows rolled into month partitions would otherwise outlive their users
+    partitions.clear(db.connection())
+    db.query(Transaction).delete()
+    db.query(Loan).delete()
+    db.query(Account).delete()
+    db.query(User).delete()
+    db.commit()
+
 def seed_db():
     print("🚀 Initializing Enhanced Database Seeding...")
     
     try:
-        Base.metadata.create_all(bind=engine)
+        init_db()
     except Exception as e:
         print(f"\n❌ Error connecting: {e}")
         return
@@ -18,109 +136,19 @@ def seed_db():
     
     # Wipe old data
     print("🧹 Cleaning up old data...")
-    db.query(Transaction).delete()
-    db.query(Loan).delete()
-    db.query(Account).delete()
-    db.query(User).delete()
-    db.commit()
+    wipe_db(db)
 
     print("\n📦 Generating 50+ Complex User Profiles with Realistic Financial Patterns...\n")
     
-    # Enhanced personas with more diversity
-    personas = [
-        # === CRITICAL RISK PROFILES (Score 75-95) ===
-        {"name": "Ananya Das", "role": "Junior Developer", "income": 45000, "epf": 1800, "status": "Critical", "scenario": "Severe Liquidity Crisis", "var_days": 8, "lcr": 0.5, "cc_util": 88.0},
-        {"name": "Ramesh Kumar", "role": "Factory Worker", "income": 18000, "epf": 900, "status": "Critical", "scenario": "Multiple Micro-Loans", "micro_tx": 15, "cc_util": 95.0},
-        {"name": "Vikram Malhotra", "role": "Marketing Manager", "income": 150000, "epf": 3000, "status": "Critical", "scenario": "Debt Trap - High Utilization", "cc_util": 92.0, "inquiries": 12},
-        {"name": "Karan Johar", "role": "Unemployed", "income": 0, "epf": 0, "status": "Emergency", "scenario": "Job Loss + Gambling", "utility_lag": 60, "risk_merch": 25, "job_search": 0.95},
-        {"name": "Rahul Dravid", "role": "Retired Professional", "income": 30000, "epf": 0, "status": "Critical", "scenario": "Asset Liquidation", "liq_flag": True, "sip_stop": True},
-        {"name": "Arjun Rampal", "role": "Laid-off Engineer", "income": 80000, "epf": 0, "status": "Emergency", "scenario": "Sudden Job Loss", "epf_gap": True, "job_search": 0.9, "utility_lag": 30},
-        {"name": "Farmer Ravi", "role": "Agriculture", "income": 12000, "epf": 0, "status": "Critical", "scenario": "Crop Failure + Debt", "disaster": True, "micro_tx": 8, "pincode": "500001"},
-        {"name": "Deepak Chahar", "role": "Gig Driver", "income": 22000, "epf": 0, "status": "Critical", "scenario": "Income Volatility", "remit_drop": 65.0, "var_days": 12},
-        {"name": "Priya Sharma", "role": "Freelancer", "income": 35000, "epf": 0, "status": "Critical", "scenario": "Irregular Income + High EMI", "remit_drop": 50.0, "cc_util": 78.0},
-        {"name": "Amit Shah", "role": "Day Trader", "income": 500000, "epf": 0, "status": "Critical", "scenario": "Trading Losses + Hard Inquiries", "inquiries": 18, "liq_flag": True},
-        
-        # === HIGH RISK / WARNING (Score 50-75) ===
-        {"name": "Suresh Reddy", "role": "Delivery Partner", "income": 25000, "epf": 0, "status": "Warning", "scenario": "Remittance Volatility", "remit_drop": 40.0, "micro_tx": 5},
-        {"name": "Sneha Patil", "role": "College Student", "income": 5000, "epf": 0, "status": "Warning", "scenario": "Student Debt Burden", "cc_util": 45.0, "micro_tx": 6},
-        {"name": "Pooja Hegde", "role": "Social Media Influencer", "income": 200000, "epf": 0, "status": "Warning", "scenario": "Lifestyle Inflation", "risk_merch": 8, "cc_util": 55.0},
-        {"name": "Manish Tiwari", "role": "Bank Manager", "income": 90000, "epf": 2500, "status": "Warning", "scenario": "SIP Stoppage Signal", "sip_stop": True, "pledge": True},
-        {"name": "Zara Khan", "role": "Consultant", "income": 120000, "epf": 0, "status": "Warning", "scenario": "Tax Compliance Gap", "tax": "Delayed", "cc_util": 48.0},
-        {"name": "Rohit Sharma", "role": "Sales Executive", "income": 55000, "epf": 1800, "status": "Warning", "scenario": "Commission Dependency", "remit_drop": 35.0, "var_days": 6},
-        {"name": "Kavya Reddy", "role": "Startup Employee", "income": 65000, "epf": 2000, "status": "Warning", "scenario": "Equity Illiquidity", "sip_stop": True, "cc_util": 52.0},
-        {"name": "Sanjay Dutt", "role": "Restaurant Owner", "income": 80000, "epf": 0, "status": "Warning", "scenario": "Business Slowdown", "remit_drop": 30.0, "utility_lag": 15},
-        {"name": "Neha Kakkar", "role": "Music Teacher", "income": 40000, "epf": 1200, "status": "Warning", "scenario": "Seasonal Income Dip", "var_days": 10, "lcr": 1.2},
-        {"name": "Aditya Roy", "role": "Content Creator", "income": 75000, "epf": 0, "status": "Warning", "scenario": "Platform Dependency", "remit_drop": 45.0, "risk_merch": 5},
-        
-        # === MODERATE RISK (Score 35-50) ===
-        {"name": "Rajesh Khanna", "role": "Government Employee", "income": 70000, "epf": 3500, "status": "Safe", "scenario": "Stable Income", "lcr": 3.5, "cc_util": 25.0},
-        {"name": "Meera Nair", "role": "School Teacher", "income": 50000, "epf": 2000, "status": "Safe", "scenario": "Conservative Spender", "lcr": 4.0, "cc_util": 18.0},
-        {"name": "Vijay Kumar", "role": "IT Professional", "income": 110000, "epf": 4500, "status": "Safe", "scenario": "Balanced Profile", "lcr": 3.0, "cc_util": 30.0},
-        {"name": "Anjali Mehta", "role": "HR Manager", "income": 95000, "epf": 3800, "status": "Safe", "scenario": "Good Financial Health", "lcr": 3.8, "cc_util": 22.0},
-        {"name": "Karthik Subramanian", "role": "Accountant", "income": 60000, "epf": 2400, "status": "Safe", "scenario": "Disciplined Saver", "lcr": 5.0, "cc_util": 15.0},
-        
-        # === LOW RISK / IDEAL CUSTOMERS (Score 10-35) ===
-        {"name": "Kabir Singh", "role": "Senior Doctor", "income": 300000, "epf": 0, "status": "Clean", "scenario": "High Income Professional", "lcr": 8.0, "cc_util": 12.0, "sip_score": 1.0},
-        {"name": "Nita Ambani", "role": "Business Owner", "income": 1000000, "epf": 0, "status": "Clean", "scenario": "Ultra HNI", "lcr": 15.0, "cc_util": 5.0},
-        {"name": "Dr. Sunita Rao", "role": "Surgeon", "income": 450000, "epf": 0, "status": "Clean", "scenario": "Medical Professional", "lcr": 10.0, "cc_util": 8.0},
-        {"name": "Ravi Shankar", "role": "Senior Architect", "income": 250000, "epf": 10000, "status": "Clean", "scenario": "Stable High Earner", "lcr": 7.5, "cc_util": 10.0},
-        {"name": "Priyanka Chopra", "role": "Corporate Executive", "income": 350000, "epf": 14000, "status": "Clean", "scenario": "Executive Level", "lcr": 9.0, "cc_util": 6.0, "sip_score": 1.0},
-        
-        # === EDGE CASES & SPECIAL SCENARIOS ===
-        {"name": "Edge Zero Income", "role": "Unemployed Student", "income": 0, "epf": 0, "status": "Critical", "scenario": "No Income Source", "micro_tx": 10},
-        {"name": "Edge Ultra Rich", "role": "CEO", "income": 5000000, "epf": 100000, "status": "Clean", "scenario": "Ultra High Net Worth", "lcr": 50.0},
-        {"name": "Disaster Victim", "role": "Flood Affected", "income": 30000, "epf": 1200, "status": "Critical", "scenario": "Natural Disaster", "disaster": True, "infra_fail": True, "pincode": "400001"},
-        {"name": "Medical Emergency", "role": "Patient", "income": 55000, "epf": 2200, "status": "Critical", "scenario": "Health Crisis", "cc_util": 85.0, "micro_tx": 12},
-        {"name": "Divorce Settlement", "role": "Legal Battle", "income": 100000, "epf": 4000, "status": "Warning", "scenario": "Legal Expenses", "cc_util": 70.0, "inquiries": 8},
-        
-        # === MIXED COMPLEXITY CASES ===
-        {"name": "Complex Risk Alpha", "role": "Crypto Trader", "income": 150000, "epf": 0, "status": "Critical", "scenario": "High Risk Investments", "liq_flag": True, "risk_merch": 20, "cc_util": 80.0},
-        {"name": "Complex Risk Beta", "role": "Multi-Business Owner", "income": 400000, "epf": 0, "status": "Warning", "scenario": "Business Diversification", "remit_drop": 25.0, "cc_util": 45.0},
-        {"name": "Complex Risk Gamma", "role": "NRI Remittance", "income": 200000, "epf": 0, "status": "Warning", "scenario": "Foreign Income Dependency", "remit_drop": 55.0, "var_days": 15},
-        
-        # === SECTOR-SPECIFIC PROFILES ===
-        {"name": "Tech Startup Founder", "role": "Entrepreneur", "income": 180000, "epf": 0, "status": "Warning", "scenario": "Startup Burn Rate", "cc_util": 65.0, "pledge": True},
-        {"name": "Real Estate Agent", "role": "Property Dealer", "income": 120000, "epf": 0, "status": "Warning", "scenario": "Commission Based", "remit_drop": 40.0, "var_days": 8},
-        {"name": "Airline Pilot", "role": "Commercial Pilot", "income": 280000, "epf": 11200, "status": "Safe", "scenario": "Aviation Professional", "lcr": 6.0, "cc_util": 20.0},
-        {"name": "Fashion Designer", "role": "Designer", "income": 95000, "epf": 0, "status": "Warning", "scenario": "Seasonal Business", "remit_drop": 35.0, "cc_util": 50.0},
-        {"name": "Gym Trainer", "role": "Fitness Coach", "income": 35000, "epf": 0, "status": "Warning", "scenario": "Client Dependency", "var_days": 7, "lcr": 1.5},
-        {"name": "Uber Driver", "role": "Ride Share", "income": 28000, "epf": 0, "status": "Warning", "scenario": "Platform Worker", "remit_drop": 30.0, "micro_tx": 4},
-        {"name": "YouTuber", "role": "Content Creator", "income": 85000, "epf": 0, "status": "Warning", "scenario": "Ad Revenue Volatility", "remit_drop": 50.0, "risk_merch": 6},
-        
-        # === ADDITIONAL DIVERSE PROFILES ===
-        {"name": "Retired Army Officer", "role": "Pension", "income": 60000, "epf": 0, "status": "Safe", "scenario": "Pension Income", "lcr": 5.0, "cc_util": 12.0},
-        {"name": "College Professor", "role": "Academic", "income": 85000, "epf": 3400, "status": "Safe", "scenario": "Academic Stability", "lcr": 4.5, "cc_util": 18.0},
-        {"name": "Chartered Accountant", "role": "CA", "income": 180000, "epf": 0, "status": "Clean", "scenario": "Professional Services", "lcr": 7.0, "cc_util": 15.0},
-        {"name": "Software Engineer", "role": "SDE-3", "income": 220000, "epf": 8800, "status": "Clean", "scenario": "Tech Professional", "lcr": 6.5, "cc_util": 20.0, "sip_score": 1.0},
-        {"name": "Pharmacist", "role": "Medical Store", "income": 45000, "epf": 1800, "status": "Safe", "scenario": "Healthcare Worker", "lcr": 3.2, "cc_util": 25.0},
-        {"name": "Electrician", "role": "Skilled Worker", "income": 32000, "epf": 1280, "status": "Warning", "scenario": "Daily Wage", "var_days": 5, "lcr": 1.8},
-        {"name": "Lawyer", "role": "Legal Practitioner", "income": 160000, "epf": 0, "status": "Safe", "scenario": "Legal Professional", "lcr": 5.5, "cc_util": 28.0},
-        {"name": "Journalist", "role": "Reporter", "income": 55000, "epf": 2200, "status": "Safe", "scenario": "Media Professional", "lcr": 3.0, "cc_util": 32.0},
-        {"name": "Chef", "role": "Restaurant Chef", "income": 48000, "epf": 1920, "status": "Safe", "scenario": "Hospitality Worker", "lcr": 2.8, "cc_util": 35.0},
-        {"name": "Photographer", "role": "Freelance Photo", "income": 42000, "epf": 0, "status": "Warning", "scenario": "Project Based", "remit_drop": 28.0, "var_days": 6},
-    ]
+    personas = PERSONAS
 
     new_users = []
     new_accounts = []
     new_transactions = []
     new_loans = []
     
-    # Enhanced transaction categories and merchants
-    tx_categories = ["Food", "Rent", "Utilities", "Shopping", "Entertainment", "Medical", "Travel", "Education", "Investment", "Insurance"]
-    merchants = {
-        "Food": ["Swiggy", "Zomato", "McDonald's", "Starbucks", "Domino's", "KFC", "Local Restaurant", "Grocery Store"],
-        "Rent": ["Landlord Transfer", "NoBroker", "Housing Society"],
-        "Utilities": ["BESCOM", "Airtel", "Jio Fiber", "Gas Bill", "Water Bill", "Broadband"],
-        "Shopping": ["Amazon", "Flipkart", "Myntra", "Zara", "H&M", "Big Bazaar", "DMart"],
-        "Entertainment": ["Netflix", "Amazon Prime", "BookMyShow", "PVR Cinemas", "Spotify", "Gaming"],
-        "Medical": ["Apollo Pharmacy", "Practo", "Hospital Bill", "Health Checkup", "Medicine"],
-        "Travel": ["Uber", "Ola", "IRCTC", "Indigo", "SpiceJet", "MakeMyTrip"],
-        "Education": ["Udemy", "Coursera", "School Fees", "Tuition", "Books"],
-        "Investment": ["Zerodha", "Groww", "Mutual Fund SIP", "Stock Purchase", "Gold"],
-        "Insurance": ["LIC Premium", "Health Insurance", "Car Insurance", "Term Insurance"],
-        "Gambling": ["Dream11", "Bet365", "RummyCircle", "Online Casino", "Sports Betting"],
-        "Loan": ["KreditBee", "MoneyTap", "Bajaj Finserv", "Credit Card Bill", "PayLater"]
-    }
+    tx_categories = TX_CATEGORIES
+    merchants = MERCHANTS
 
     print(f"Creating {len(personas)} user profiles...\n")
     
@@ -139,7 +167,7 @@ def seed_db():
             base_score = random.randint(10, 34)
         
         # Create User
-        u = User(
+        u = dict(
             id=uid,
             name=p["name"],
             occupation=p["role"],
@@ -172,7 +200,7 @@ def seed_db():
         balance_multiplier = random.uniform(0.5, 4.0) if p["status"] in ["Clean", "Safe"] else random.uniform(0.05, 1.2)
         account_balance = max(p["income"] * balance_multiplier, 1000)
         
-        acc = Account(
+        acc = dict(
             id=f"ACC-{uid}", 
             user_id=uid, 
             type="Savings", 
@@ -204,8 +232,8 @@ def seed_db():
         # Salary Credit (if employed)
         if p["income"] > 0:
             salary_date = datetime.utcnow() - timedelta(days=random.randint(1, 7))
-            new_transactions.append(Transaction(
-                user_id=uid, account_id=acc.id, amount=p["income"], category="Salary",
+            new_transactions.append(dict(
+                user_id=uid, account_id=acc["id"], amount=p["income"], category="Salary",
                 merchant_name="Employer Payroll", payment_mode="NEFT", transaction_type="Credit",
                 timestamp=salary_date
             ))
@@ -255,8 +283,8 @@ def seed_db():
             for t in tentative_txs:
                 final_amt = t["amount"] * scale_factor * random.uniform(0.85, 1.15)
                 
-                tx = Transaction(
-                    user_id=uid, account_id=acc.id, amount=round(final_amt, 2), category=t["category"],
+                tx = dict(
+                    user_id=uid, account_id=acc["id"], amount=round(final_amt, 2), category=t["category"],
                     merchant_name=t["merchant"], 
                     payment_mode=random.choice(["UPI", "Card", "NetBanking", "Cash"]), 
                     transaction_type="Debit",
@@ -306,13 +334,8 @@ def seed_db():
             principal = max(principal, 10000)
             
             # EMI calculation
-            monthly_rate = loan_info["rate"] / (12 * 100)
             tenure = loan_info["tenure"]
-            
-            if monthly_rate > 0:
-                emi = principal * monthly_rate * ((1 + monthly_rate) ** tenure) / (((1 + monthly_rate) ** tenure) - 1)
-            else:
-                emi = principal / tenure
+            emi = float(annuity_emi(principal, loan_info["rate"], tenure))
             
             # Loan progress
             remaining_months = random.randint(int(tenure * 0.2), tenure)
@@ -320,7 +343,7 @@ def seed_db():
             
             start_date = datetime.utcnow() - timedelta(days=30 * (tenure - remaining_months))
             
-            loan = Loan(
+            loan = dict(
                 user_id=uid,
                 loan_type=loan_info["type"],
                 principal_amount=round(principal, 2),
@@ -340,29 +363,296 @@ def seed_db():
     print(f"   • {len(new_loans)} Loan Records")
     print(f"   • {len(new_transactions)} Transactions")
     
-    db.add_all(new_users)
-    db.add_all(new_accounts)
-    db.add_all(new_loans)
-    db.add_all(new_transactions)
-    db.commit()
+    # Chunked Core executemany instead of building ORM objects for a unit-of-work flush
+    with engine.begin() as conn:
+        for kind, rows in (("users", new_users), ("accounts", new_accounts),
+                           ("loans", new_loans), ("transactions", new_transactions)):
+            for chunk in chunked(rows, 5000):
+                insert_rows(conn, kind, chunk)
+
+    # Replace the placeholder scores with the real engine output
+    scored = score_portfolio()
+    print(f"\n🧮 Scored {scored} users with the portfolio engine")
+    project_portfolio()
     
     # Summary statistics
     print(f"\n📊 Risk Distribution:")
-    critical_count = len([u for u in new_users if u.status in ["Critical", "Emergency"]])
-    warning_count = len([u for u in new_users if u.status == "Warning"])
-    safe_count = len([u for u in new_users if u.status == "Safe"])
-    clean_count = len([u for u in new_users if u.status == "Clean"])
+    critical_count = len([u for u in new_users if u["status"] in ["Critical", "Emergency"]])
+    warning_count = len([u for u in new_users if u["status"] == "Warning"])
+    safe_count = len([u for u in new_users if u["status"] == "Safe"])
+    clean_count = len([u for u in new_users if u["status"] == "Clean"])
     
     print(f"   • Critical/Emergency: {critical_count} users")
     print(f"   • Warning: {warning_count} users")
     print(f"   • Safe: {safe_count} users")
     print(f"   • Clean: {clean_count} users")
     
-    total_exposure = sum([loan.outstanding_amount for loan in new_loans])
+    total_exposure = sum([loan["outstanding_amount"] for loan in new_loans])
     print(f"\n💰 Total Portfolio Exposure: ₹{total_exposure:,.2f} ({total_exposure/10000000:.2f} Cr)")
         
     print("\n✅ Enhanced Seeding Complete! Database is ready with complex, realistic data.\n")
     db.close()
 
+# --- Synthetic load-test generator ---
+
+# Persona fields sampled by the generator, with the defaults seed_db uses
+PERSONA_FIELDS = {
+    "var_days": 0, "lcr": 2.5, "remit_drop": 0.0, "cc_util": 15.0, "micro_tx": 0,
+    "inquiries": 0, "utility_lag": 0, "risk_merch": 0, "job_search": 0.0,
+}
+PERSONA_FLAGS = ["liq_flag", "pledge", "epf_gap", "disaster", "infra_fail", "sip_stop"]
+
+STATUS_SCORE_RANGES = {"Critical": (75, 95), "Emergency": (75, 95), "Warning": (50, 74), "Safe": (35, 49), "Clean": (10, 34)}
+STATUS_SPEND_RATIOS = {"Critical": (1.3, 2.8), "Emergency": (1.3, 2.8), "Warning": (0.95, 1.25), "Safe": (0.70, 0.95), "Clean": (0.35, 0.70)}
+STATUS_LOAN_COUNTS = {"Critical": (3, 5), "Emergency": (3, 5), "Warning": (2, 3), "Safe": (1, 2), "Clean": (0, 2)}
+
+# Category amount ranges mirror seed_db; Gambling and Loan are injected for risky personas
+SYNTHETIC_CATEGORIES = TX_CATEGORIES + ["Gambling", "Loan"]
+CATEGORY_AMOUNTS = {
+    "Rent": (8000, 30000), "Shopping": (1000, 15000), "Travel": (1000, 15000), "Medical": (1000, 15000),
+    "Gambling": (500, 25000), "Loan": (500, 25000), "Investment": (2000, 20000), "Insurance": (2000, 20000),
+}
+PAYMENT_MODES = ["UPI", "Card", "NetBanking", "Cash"]
+BANKS = ["HDFC", "ICICI", "SBI", "Axis", "Kotak"]
+
+# (type, rate range %, tenure range months, principal range as multiple of income)
+LOAN_PRODUCTS = [
+    ("Personal Loan", (10.5, 16.5), (12, 60), (4, 12)),
+    ("Home Loan", (8.3, 9.8), (120, 300), (20, 100)),
+    ("Auto Loan", (8.5, 11.5), (36, 84), (10, 20)),
+    ("Education Loan", (7.5, 12.5), (60, 180), (15, 40)),
+    ("Credit Card", (18.0, 42.0), (6, 36), (0.3, 4)),
+    ("Business Loan", (11.0, 18.0), (24, 120), (20, 60)),
+    ("Gold Loan", (7.0, 12.0), (6, 36), (2, 8)),
+]
+
+# Roughly the number of distinct Indian pincodes, spread over the real range
+PINCODE_POOL = np.char.mod("%06d", np.linspace(110001, 855117, 19000).astype(np.int64))
+
+
+def _persona_table():
+    statuses = [p["status"] for p in PERSONAS]
+    table = {
+        "role": np.array([p["role"] for p in PERSONAS], dtype=object),
+        "scenario": np.array([p["scenario"] for p in PERSONAS], dtype=object),
+        "status": np.array(statuses, dtype=object),
+        "income": np.array([p["income"] for p in PERSONAS], dtype=np.float64),
+        "epf": np.array([p.get("epf", 0) for p in PERSONAS], dtype=np.float64),
+        "sip_score": np.array([0.0 if p.get("sip_stop") else p.get("sip_score", 0.5) for p in PERSONAS]),
+        "pincode": np.array([p.get("pincode", "") for p in PERSONAS], dtype=object),
+        "tax": np.array([p.get("tax", "Compliant") for p in PERSONAS], dtype=object),
+    }
+    for key, default in PERSONA_FIELDS.items():
+        table[key] = np.array([p.get(key, default) for p in PERSONAS], dtype=np.float64)
+    for key in PERSONA_FLAGS:
+        table[key] = np.array([bool(p.get(key, False)) for p in PERSONAS])
+    for name, ranges in (("score", STATUS_SCORE_RANGES), ("spend", STATUS_SPEND_RATIOS), ("loans", STATUS_LOAN_COUNTS)):
+        table[name + "_lo"] = np.array([ranges[s][0] for s in statuses], dtype=np.float64)
+        table[name + "_hi"] = np.array([ranges[s][1] for s in statuses], dtype=np.float64)
+    return table
+
+
+def _uniform(rng, lo, hi):
+    return lo + (hi - lo) * rng.random(np.shape(lo))
+
+
+def _randint(rng, lo, hi):
+    # Inclusive integer range with array bounds
+    return np.floor(_uniform(rng, lo, hi + 1)).astype(np.int64)
+
+
+def _rows(columns):
+    # Column arrays -> list of dicts for Core executemany
+    keys = list(columns)
+    values = [c.tolist() if isinstance(c, np.ndarray) else c for c in columns.values()]
+    return [dict(zip(keys, row)) for row in zip(*values)]
+
+
+def generate_chunk(rng, start, count, table, tx_per_user, days, now):
+    """Generate users [start, start + count) and their accounts, loans and transactions."""
+    p = rng.integers(len(PERSONAS), size=count)
+    status = table["status"][p]
+    jitter = lambda: _uniform(rng, np.full(count, 0.7), np.full(count, 1.3))
+
+    uids = np.char.mod("U-SYN-%09d", np.arange(start, start + count)).astype(object)
+    income = np.round(table["income"][p] * rng.lognormal(0.0, 0.25, count), -2)
+    pincode = np.where(table["pincode"][p] != "", table["pincode"][p], PINCODE_POOL[rng.integers(len(PINCODE_POOL), size=count)])
+    micro_tx = np.rint(table["micro_tx"][p] * jitter()).astype(np.int64)
+    risk_merch = np.rint(table["risk_merch"][p] * jitter()).astype(np.int64)
+
+    users = {
+        "id": uids,
+        "name": np.char.mod("Synthetic Borrower %d", np.arange(start, start + count)).astype(object),
+        "occupation": table["role"][p],
+        "monthly_income": income,
+        "epf_contribution": np.where(table["epf"][p] > 0, np.round(income * 0.12, 2), 0.0),
+        "current_risk_score": _randint(rng, table["score_lo"][p], table["score_hi"][p]),
+        "status": status,
+        "distress_category": table["scenario"][p],
+        "salary_credit_variance_days": np.rint(table["var_days"][p] * jitter()).astype(np.int64),
+        "liquidity_coverage_ratio": np.round(table["lcr"][p] * jitter(), 2),
+        "remittance_volatility_percent": np.round(table["remit_drop"][p] * jitter(), 1),
+        "credit_card_utilization": np.round(np.clip(table["cc_util"][p] * jitter(), 0, 100), 1),
+        "micro_credit_tx_count": micro_tx,
+        "inquiry_density_7_days": np.rint(table["inquiries"][p] * jitter()).astype(np.int64),
+        "utility_payment_latency_days": np.rint(table["utility_lag"][p] * jitter()).astype(np.int64),
+        "high_risk_merchant_tx_count": risk_merch,
+        "sip_consistency_score": table["sip_score"][p],
+        "portfolio_liquidation_flag": table["liq_flag"][p],
+        "pledge_activity_flag": table["pledge"][p],
+        "epf_gap_detected": table["epf_gap"][p],
+        "tax_compliance_status": table["tax"][p],
+        "job_search_activity_index": np.clip(table["job_search"][p] * jitter(), 0, 1),
+        "disaster_zone_flag": table["disaster"][p],
+        "infrastructure_failure_flag": table["infra_fail"][p],
+        "pincode": pincode,
+    }
+
+    account_ids = np.char.add("ACC-", uids.astype(str)).astype(object)
+    accounts = {
+        "id": account_ids,
+        "user_id": uids,
+        "type": np.full(count, "Savings", dtype=object),
+        "balance": np.round(np.maximum(income * rng.uniform(0.05, 4.0, count), 1000), 2),
+        "bank_name": np.array(BANKS, dtype=object)[rng.integers(len(BANKS), size=count)],
+    }
+
+    # Loans: per-user count from the status band, product drawn uniformly
+    n_loans = _randint(rng, table["loans_lo"][p], table["loans_hi"][p])
+    owner = np.repeat(np.arange(count), n_loans)
+    product = rng.integers(len(LOAN_PRODUCTS), size=owner.size)
+    bounds = lambda i: np.array([prod[i] for prod in LOAN_PRODUCTS], dtype=np.float64)[product].T
+    rate = _uniform(rng, *bounds(1))
+    tenure = _randint(rng, *bounds(2))
+    principal = np.maximum(income[owner] * _uniform(rng, *bounds(3)), 10000)
+    emi = annuity_emi(principal, rate, tenure)
+    remaining = _randint(rng, np.floor(tenure * 0.2), tenure)
+    loans = {
+        "user_id": uids[owner],
+        "loan_type": np.array([prod[0] for prod in LOAN_PRODUCTS], dtype=object)[product],
+        "principal_amount": np.round(principal, 2),
+        "outstanding_amount": np.round(principal * remaining / tenure * rng.uniform(0.85, 1.15, owner.size), 2),
+        "monthly_emi": np.round(emi, 2),
+        "interest_rate": np.round(rate, 2),
+        "tenure_months": tenure,
+        "remaining_months": remaining,
+        "start_date": (now - ((tenure - remaining) * 30).astype("timedelta64[D]")).astype("datetime64[us]"),
+    }
+
+    # Debit transactions: Poisson count per user, category mix skewed for risky personas
+    n_tx = rng.poisson(tx_per_user, count)
+    owner = np.repeat(np.arange(count), n_tx)
+    category = rng.integers(len(TX_CATEGORIES), size=owner.size)
+    gambling = (risk_merch[owner] > 5) & (rng.random(owner.size) < 0.35)
+    category[gambling] = SYNTHETIC_CATEGORIES.index("Gambling")
+    micro = (micro_tx[owner] > 3) & (rng.random(owner.size) < 0.25)
+    category[micro] = SYNTHETIC_CATEGORIES.index("Loan")
+
+    merchant_lists = [MERCHANTS[c] for c in SYNTHETIC_CATEGORIES]
+    merchant_names = np.array([m for names in merchant_lists for m in names], dtype=object)
+    offsets = np.cumsum([0] + [len(m) for m in merchant_lists[:-1]])
+    sizes = np.array([len(m) for m in merchant_lists])
+    merchant = offsets[category] + (rng.random(owner.size) * sizes[category]).astype(np.int64)
+
+    amount_lo = np.array([CATEGORY_AMOUNTS.get(c, (50, 3000))[0] for c in SYNTHETIC_CATEGORIES], dtype=np.float64)
+    amount_hi = np.array([CATEGORY_AMOUNTS.get(c, (50, 3000))[1] for c in SYNTHETIC_CATEGORIES], dtype=np.float64)
+    amount = _uniform(rng, amount_lo[category], amount_hi[category])
+
+    # Scale each user's debits to their status-driven monthly spend, over `days`
+    target = income * _uniform(rng, table["spend_lo"][p], table["spend_hi"][p]) * max(days / 30, 1)
+    target = np.where(income < 15000, np.maximum(target, rng.uniform(10000, 18000, count)), target)
+    totals = np.bincount(owner, weights=amount, minlength=count)
+    scale = np.divide(target, totals, out=np.zeros(count), where=totals > 0)
+    amount = np.round(amount * scale[owner] * rng.uniform(0.85, 1.15, owner.size), 2)
+
+    offset_minutes = (rng.random(owner.size) * days * 24 * 60).astype(np.int64)
+    tx = {
+        "user_id": uids[owner],
+        "account_id": account_ids[owner],
+        "amount": amount,
+        "currency": np.full(owner.size, "INR", dtype=object),
+        "timestamp": (now - offset_minutes.astype("timedelta64[m]")).astype("datetime64[us]"),
+        "category": np.array(SYNTHETIC_CATEGORIES, dtype=object)[category],
+        "merchant_name": merchant_names[merchant],
+        "payment_mode": np.array(PAYMENT_MODES, dtype=object)[rng.integers(len(PAYMENT_MODES), size=owner.size)],
+        "transaction_type": np.full(owner.size, "Debit", dtype=object),
+    }
+
+    # One salary credit per month of history for every earning user
+    months = max(days // 30, 1)
+    earners = np.flatnonzero(income > 0)
+    payer = np.repeat(earners, months)
+    month = np.tile(np.arange(months), earners.size)
+    salary = {
+        "user_id": uids[payer],
+        "account_id": account_ids[payer],
+        "amount": income[payer],
+        "currency": np.full(payer.size, "INR", dtype=object),
+        "timestamp": (now - (month * 30 + rng.integers(1, 8, payer.size)).astype("timedelta64[D]")).astype("datetime64[us]"),
+        "category": np.full(payer.size, "Salary", dtype=object),
+        "merchant_name": np.full(payer.size, "Employer Payroll", dtype=object),
+        "payment_mode": np.full(payer.size, "NEFT", dtype=object),
+        "transaction_type": np.full(payer.size, "Credit", dtype=object),
+    }
+    return users, accounts, loans, [salary, tx]
+
+
+def seed_synthetic(n_users, tx_per_user=60, days=30, seed=42, chunk_users=5000, batch_rows=20000):
+    """Bulk-generate ``n_users`` borrowers sampled from the persona archetypes.
+
+    Output is deterministic for a given seed and chunk size. Only one chunk of
+    users is held in memory; aggregates are rebuilt once at the end rather
+    than maintained per insert.
+    """
+    print(f"🚀 Generating {n_users:,} synthetic borrowers (seed={seed}, ~{tx_per_user} tx/user over {days} days)")
+    init_db()
+    db = SessionLocal()
+    print("🧹 Cleaning up old data...")
+    wipe_db(db)
+    db.close()
+
+    rng = np.random.default_rng(seed)
+    table = _persona_table()
+    now = np.datetime64(datetime.utcnow().replace(microsecond=0), "us")
+    started = time.perf_counter()
+    counts = {"users": 0, "accounts": 0, "loans": 0, "transactions": 0}
+
+    for start in range(0, n_users, chunk_users):
+        count = min(chunk_users, n_users - start)
+        users, accounts, loans, tx_parts = generate_chunk(rng, start, count, table, tx_per_user, days, now)
+        with engine.begin() as conn:
+            for kind, columns in (("users", users), ("accounts", accounts), ("loans", loans)):
+                rows = _rows(columns)
+                for batch in chunked(rows, batch_rows):
+                    insert_rows(conn, kind, batch, maintain_aggregates=False)
+                counts[kind] += len(rows)
+            for columns in tx_parts:
+                size = len(columns["user_id"])
+                for lo in range(0, size, batch_rows):
+                    batch = _rows({k: v[lo:lo + batch_rows] for k, v in columns.items()})
+                    insert_rows(conn, "transactions", batch, maintain_aggregates=False)
+                counts["transactions"] += size
+        elapsed = time.perf_counter() - started
+        print(f"   • {start + count:,} users, {counts['transactions']:,} transactions ({counts['transactions'] / elapsed:,.0f} tx/sec)")
+
+    print("\n📊 Rebuilding spend aggregates and scoring...")
+    aggregates.rebuild()
+    score_portfolio()
+    project_portfolio()
+    elapsed = time.perf_counter() - started
+    print(f"\n✅ Synthetic seeding complete in {elapsed:.1f}s: " + ", ".join(f"{v:,} {k}" for k, v in counts.items()))
+    return counts
+
 if __name__ == "__main__":
-    seed_db()
+    parser = argparse.ArgumentParser(description="Seed the database")
+    parser.add_argument("--synthetic", type=int, metavar="N", help="generate N synthetic borrowers instead of the curated personas")
+    parser.add_argument("--tx-per-user", type=int, default=60)
+    parser.add_argument("--days", type=int, default=30, help="history window for generated transactions")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-users", type=int, default=5000)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        seed_synthetic(args.synthetic, args.tx_per_user, args.days, args.seed, args.chunk_users)
+    else:
+        seed_db()
@@ -0,0 +1,33 @@
+"""
+Shared test setup: a throwaway SQLite database per session.
+
+The backend modules read DATABASE_URL and friends at import time, so the
+environment is set here before any of them is imported.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+_tmp = tempfile.mkdtemp(prefix="tent-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'test.db')}"
+os.environ["FEATURE_STATE_PATH"] = os.path.join(_tmp, "feature_state.npz")
+os.environ.setdefault("BATCH_WORKERS", "2")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def tmp_dir():
+    return _tmp
+
+
+@pytest.fixture
+def synthetic():
+    """Reseed the test database with a small synthetic book; returns the seeder."""
+    import seed
+
+    def run(n_users=200, days=60, tx_per_user=20, seed_value=7):
+        return seed.seed_synthetic(n_users, tx_per_user=tx_per_user, days=days, seed=seed_value, chunk_users=100)
+
+    return run
@@ -0,0 +1,21 @@
+from sqlalchemy import delete, func, select
+
+from database import engine
+import amortization
+import models
+
+Projection = models.CashflowProjection
+
+
+def test_project_user_is_read_only_and_matches_the_batch(synthetic):
+    synthetic(n_users=80)
+    amortization.project_portfolio()
+    with engine.connect() as conn:
+        stored = dict(conn.execute(select(Projection.user_id, Projection.months_to_shortfall)).all())
+
+    with engine.begin() as conn:
+        conn.execute(delete(Projection))
+    with engine.connect() as conn:
+        on_demand = {uid: amortization.project_user(conn, uid) for uid in stored}
+        assert conn.execute(select(func.count()).select_from(Projection)).scalar() == 0
+    assert on_demand == stored
@@ -0,0 +1,26 @@
+from collections import Counter
+
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from database import engine
+import main
+import models
+import scoring
+
+User = models.User
+
+
+def test_risk_analytics_counts_match_the_users_table(synthetic):
+    synthetic(n_users=120)
+    main.analytics_cache.invalidate()
+    risk = TestClient(main.app).get("/api/analytics/risk").json()
+    with engine.connect() as conn:
+        rows = conn.execute(select(User.status, User.distress_category, User.current_risk_score)).all()
+
+    assert risk["status_counts"] == dict(Counter(status for status, _, _ in rows))
+    assert sum(risk["bands"].values()) == len(rows)
+    assert risk["bands"]["critical"] == sum(score >= scoring.CRITICAL_SCORE for _, _, score in rows)
+    high = Counter((category or "Unknown") for _, category, score in rows if score >= scoring.AT_RISK_SCORE)
+    by_category = risk["bands_by_distress_category"]
+    assert {c: b["critical"] + b["at_risk"] for c, b in by_category.items() if b["critical"] + b["at_risk"]} == dict(high)
@@ -0,0 +1,23 @@
+from cache import MISSING, ProfileCache, SharedEpoch
+from database import init_db
+
+
+def test_broadcast_clear_reaches_other_processes():
+    init_db()
+    # Two caches on one epoch row stand in for the API and a batch job process
+    api = ProfileCache(shared=SharedEpoch("test-profile", check_interval=0))
+    job = ProfileCache(shared=SharedEpoch("test-profile", check_interval=0))
+    assert api.get("U1") is MISSING
+    api.set("U1", {"risk_score": 40}, api.epoch())
+    assert api.get("U1") == {"risk_score": 40}
+
+    job.clear(broadcast=True)
+    assert api.get("U1") is MISSING
+
+
+def test_epoch_is_polled_at_most_once_per_interval():
+    init_db()
+    epoch = SharedEpoch("test-interval", check_interval=3600)
+    assert not epoch.moved()
+    SharedEpoch("test-interval").bump()
+    assert not epoch.moved()
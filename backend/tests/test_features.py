@@ -0,0 +1,97 @@
+import datetime
+
+import numpy as np
+import pytest
+
+import features
+from lookups import encoder
+
+DAY = datetime.timedelta(days=1)
+START = datetime.datetime(2026, 1, 1, 9, 0)
+
+
+@pytest.fixture
+def codes(synthetic):
+    synthetic(n_users=20)
+    return {
+        "debit": encoder.code("transaction_type", "Debit"),
+        "credit": encoder.code("transaction_type", "Credit"),
+        "gambling": encoder.code("category", "Gambling"),
+        "salary": encoder.code("category", "Salary"),
+        "upi": encoder.code("payment_mode", "UPI"),
+    }
+
+
+def _row(tx_id, user_id, when, category, tx_type, mode, amount=100.0):
+    return (tx_id, user_id, when, amount, category, mode, tx_type)
+
+
+def _history(codes):
+    """Monthly salary for U1 from START, and five gambling debits on day 200."""
+    rows = [_row(i + 1, "U1", START + i * 30 * DAY, codes["salary"], codes["credit"], codes["upi"]) for i in range(7)]
+    rows += [_row(100 + i, "U1", START + 200 * DAY, codes["gambling"], codes["debit"], codes["upi"]) for i in range(5)]
+    return sorted(rows, key=lambda r: (r[2], r[0]))
+
+
+def _gambling_count(state, when):
+    as_of = features.to_days([when])[0]
+    return int(state.indicators(as_of, np.array([0]))["high_risk_merchant_tx_count"][0])
+
+
+def test_window_counts_decay_once_a_user_goes_quiet(codes):
+    state = features.FeatureState()
+    state.apply(_history(codes))
+    assert _gambling_count(state, START + 200 * DAY) == 5
+    # One time constant later about 1/e of the burst is left
+    assert _gambling_count(state, START + 230 * DAY) == 2
+    assert _gambling_count(state, START + 320 * DAY) == 0
+
+
+def test_batching_does_not_change_the_state(codes):
+    rows = _history(codes)
+    whole = features.FeatureState()
+    whole.apply(rows)
+    # One row per batch forces a rebase of the reference time between most of them
+    streamed = features.FeatureState()
+    for row in rows:
+        streamed.apply([row])
+
+    as_of = features.to_days([START + 240 * DAY])[0]
+    users = np.array([0])
+    assert np.allclose(whole._rates(as_of, users), streamed._rates(as_of, users))
+    assert whole.indicators(as_of, users) == pytest.approx(streamed.indicators(as_of, users))
+    assert streamed.last_tx_id == max(r[0] for r in rows)
+
+
+def test_checkpoint_round_trip(codes, tmp_dir):
+    state = features.FeatureState()
+    state.apply(_history(codes))
+    path = f"{tmp_dir}/roundtrip.npz"
+    state.save(path)
+    loaded = features.FeatureState.load(path)
+    assert loaded.ids == state.ids and loaded.last_tx_id == state.last_tx_id
+    assert np.array_equal(loaded.counters, state.counters) and loaded.t_ref == state.t_ref
+
+
+def test_incremental_run_rewrites_users_whose_windows_decayed(synthetic, tmp_dir):
+    from sqlalchemy import select
+    from database import engine
+    import models
+
+    synthetic(n_users=60, days=60)
+    path = f"{tmp_dir}/decay.npz"
+    now = datetime.datetime.utcnow()
+    assert features.run(full=True, path=path, as_of=now) == 60
+
+    def counts():
+        with engine.connect() as conn:
+            return dict(conn.execute(select(models.User.id, models.User.micro_credit_tx_count)).all())
+
+    before = counts()
+    # No new transactions: nothing has moved yet
+    assert features.run(path=path, as_of=now) == 0
+    # A quarter later every 30-day count has decayed away
+    assert features.run(path=path, as_of=now + 90 * DAY) > 0
+    after = counts()
+    assert any(before.values()) and not any(after.values())
+    assert features.run(path=path, as_of=now + 90 * DAY) == 0
@@ -0,0 +1,32 @@
+from sqlalchemy import delete, func, select
+
+from database import engine
+import geo
+import models
+
+User = models.User
+
+
+def test_apply_event_rescores_only_the_flagged_cohort(synthetic):
+    synthetic(n_users=120)
+    with engine.begin() as conn:
+        conn.execute(models.User.__table__.update().values(disaster_zone_flag=False))
+        conn.execute(delete(models.UserChange))
+        # A change logged elsewhere must survive for the batch job
+        conn.execute(models.UserChange.__table__.insert().values(user_id="outsider", source="orm"))
+        pincode = conn.execute(select(User.pincode).group_by(User.pincode).order_by(func.count().desc())).scalars().first()
+        cohort = set(conn.execute(select(User.id).where(User.pincode == pincode)).scalars())
+
+    result = geo.apply_event([pincode], "disaster_zone_flag", active=True)
+    assert result["users_flagged"] == result["users_rescored"] == len(cohort)
+
+    with engine.connect() as conn:
+        run = conn.execute(select(models.ScoringRun).order_by(models.ScoringRun.id.desc())).first()
+        rescored = set(conn.execute(select(models.RiskScoreHistory.user_id).where(models.RiskScoreHistory.run_id == run.id)).scalars())
+        logged = set(conn.execute(select(models.UserChange.user_id)).scalars())
+    assert run.mode == "cohort"
+    assert rescored == cohort
+    assert logged == cohort | {"outsider"}
+
+    # Repeating the event flips nobody
+    assert geo.apply_event([pincode], "disaster_zone_flag", active=True)["users_flagged"] == 0
@@ -0,0 +1,75 @@
+import datetime
+
+from sqlalchemy import create_engine, func, inspect, select, text
+
+from database import Base
+import lookups
+import models
+
+LEGACY_DDL = """
+CREATE TABLE transactions (
+    id INTEGER PRIMARY KEY, user_id VARCHAR NOT NULL, account_id VARCHAR, amount FLOAT, timestamp DATETIME,
+    category VARCHAR, merchant_name VARCHAR, payment_mode VARCHAR, transaction_type VARCHAR, currency VARCHAR
+)
+"""
+
+ROWS = [
+    # id, amount, category, merchant, mode, type, currency
+    (1, 120.0, "Groceries", "FreshMart", "UPI", "Debit", "INR"),
+    (2, 80.0, "Groceries", "FreshMart", "Card", "Debit", "INR"),
+    (3, 5000.0, "Salary", "Acme Corp", "NEFT", "Credit", "INR"),
+    (4, 45.5, None, None, None, "Debit", None),
+    (7, 300.0, "Gambling", "BetNow", "UPI", "Debit", "USD"),
+]
+
+
+def _legacy_engine(tmp_dir):
+    bind = create_engine(f"sqlite:///{tmp_dir}/legacy.db")
+    Base.metadata.drop_all(bind)
+    Base.metadata.create_all(bind)
+    ts = datetime.datetime(2026, 3, 14, 12, 0)
+    with bind.begin() as conn:
+        conn.execute(text("DROP TABLE transactions"))
+        conn.execute(text(LEGACY_DDL))
+        conn.execute(text("CREATE INDEX ix_transactions_user_id ON transactions (user_id)"))
+        conn.execute(models.User.__table__.insert().values(id="U1", name="Legacy"))
+        conn.execute(
+            text("INSERT INTO transactions VALUES (:id, 'U1', NULL, :amount, :ts, :category, :merchant, :mode, :type, :currency)"),
+            [dict(zip(["id", "amount", "category", "merchant", "mode", "type", "currency"], row), ts=ts) for row in ROWS],
+        )
+    return bind
+
+
+def test_migrate_encodes_strings_and_rebuilds_aggregates(tmp_dir):
+    bind = _legacy_engine(tmp_dir)
+    assert lookups.needs_migration(bind)
+    assert lookups.migrate(bind, progress=lambda message: None) == len(ROWS)
+    assert not lookups.needs_migration(bind)
+    assert "category" not in {c["name"] for c in inspect(bind).get_columns("transactions")}
+
+    tx = models.Transaction.__table__
+    decoded = select(tx.c.id, tx.c.amount)
+    for field, (code_column, lookup, _) in lookups.FIELDS.items():
+        names = lookup.__table__.alias(field)
+        decoded = decoded.add_columns(names.c.name).join(names, names.c.id == tx.c[code_column])
+    with bind.connect() as conn:
+        rows = sorted(tuple(r) for r in conn.execute(decoded))
+        spend = dict(conn.execute(
+            select(models.TxCategory.name, func.sum(models.UserSpendAggregate.total_amount))
+            .join(models.TxCategory, models.TxCategory.id == models.UserSpendAggregate.category_id)
+            .join(models.TransactionType, models.TransactionType.id == models.UserSpendAggregate.transaction_type_id)
+            .where(models.TransactionType.name == "Debit")
+            .group_by(models.TxCategory.name)
+        ).all())
+
+    # Missing strings take each field's default
+    expected = [
+        (i, amount, category or "Unknown", merchant or "Unknown", mode or "Unknown", kind, currency or "INR")
+        for i, amount, category, merchant, mode, kind, currency in ROWS
+    ]
+    assert rows == expected
+    assert spend == {"Groceries": 200.0, "Unknown": 45.5, "Gambling": 300.0}
+
+    # Already encoded: a second run is a no-op
+    assert lookups.migrate(bind, progress=lambda message: None) == 0
+    bind.dispose()
@@ -0,0 +1,21 @@
+import asyncio
+import threading
+
+import pytest
+
+import metrics
+
+
+def test_profiling_sampler_stops_when_the_app_raises(monkeypatch):
+    monkeypatch.setattr(metrics, "PROFILING_ENABLED", True)
+
+    async def failing_app(scope, receive, send):
+        raise RuntimeError("boom")
+
+    async def send(message):
+        pass
+
+    scope = {"type": "http", "method": "GET", "path": "/", "query_string": b"profile=1", "headers": []}
+    with pytest.raises(RuntimeError):
+        asyncio.run(metrics.MetricsMiddleware(failing_app)(scope, None, send))
+    assert not any(isinstance(t, metrics.Sampler) for t in threading.enumerate())
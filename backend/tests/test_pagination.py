@@ -0,0 +1,66 @@
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import select, update
+
+from database import engine
+import main
+import models
+
+User = models.User
+
+
+def test_cursor_round_trip():
+    for key, user_id in [(87, "U_1"), (12.5, "U_2"), (None, "U_3")]:
+        is_null, decoded_key, decoded_id = main.decode_cursor(main.encode_cursor(key, user_id))
+        assert (is_null, decoded_id) == (key is None, user_id)
+        assert decoded_key == (main.NULL_SENTINEL if key is None else key)
+    with pytest.raises(HTTPException):
+        main.decode_cursor("not-a-cursor")
+
+
+def _walk(client, **params):
+    seen, cursor = [], None
+    while True:
+        query = {**params, "fields": "id,score,income", "limit": 7}
+        if cursor:
+            query["cursor"] = cursor
+        res = client.get("/api/users", params=query)
+        assert res.status_code == 200
+        seen += res.json()
+        cursor = res.headers.get("X-Next-Cursor")
+        if not cursor:
+            return seen
+
+
+@pytest.mark.parametrize("sort,column", [("score", "current_risk_score"), ("exposure", "monthly_income")])
+@pytest.mark.parametrize("order", ["desc", "asc"])
+def test_pages_cover_every_user_once_with_nulls_last(synthetic, sort, column, order):
+    synthetic(n_users=60)
+    with engine.begin() as conn:
+        ids = conn.execute(select(User.id).order_by(User.id)).scalars().all()
+        conn.execute(update(User).where(User.id.in_(ids[:9])).values({column: None}))
+        # Ties on the sort key must be broken by id, not skipped
+        conn.execute(update(User).where(User.id.in_(ids[9:30])).values({column: 50}))
+        rows = conn.execute(select(User.id, getattr(User, column))).all()
+
+    keyed = sorted((r for r in rows if r[1] is not None), key=lambda r: (r[1], r[0]), reverse=order == "desc")
+    nulls = sorted((r for r in rows if r[1] is None), key=lambda r: r[0], reverse=order == "desc")
+    expected = [r[0] for r in keyed + nulls]
+
+    seen = _walk(TestClient(main.app), sort=sort, order=order)
+    assert [u["id"] for u in seen] == expected
+
+
+def test_list_payload_matches_the_response_model(synthetic):
+    synthetic(n_users=20)
+    with engine.begin() as conn:
+        # One user with no score and no history rows
+        user_id = conn.execute(select(User.id).order_by(User.id)).scalars().first()
+        conn.execute(update(User).where(User.id == user_id).values(current_risk_score=None))
+        conn.execute(models.RiskScoreHistory.__table__.delete().where(models.RiskScoreHistory.user_id == user_id))
+    users = TestClient(main.app).get("/api/users", params={"limit": 50}).json()
+    assert len(users) == 20
+    for user in users:
+        main.UserListItem.model_validate(user, strict=True)
+    assert next(u for u in users if u["id"] == user_id)["history"] == []
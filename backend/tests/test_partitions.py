@@ -0,0 +1,83 @@
+import datetime
+
+from sqlalchemy import func, select
+
+from database import engine
+import models
+import partitions
+
+
+def _counts():
+    with engine.connect() as conn:
+        users = conn.execute(select(func.count()).select_from(models.User)).scalar()
+        buckets = conn.execute(select(func.count()).select_from(models.UserSpendAggregate)).scalar()
+        raw = sum(
+            conn.execute(select(func.count()).select_from(t)).scalar() for t in partitions.sources(conn)
+        )
+    return users, buckets, raw
+
+
+def _buckets():
+    agg = models.UserSpendAggregate
+    with engine.connect() as conn:
+        return {
+            (r.user_id, r.transaction_type_id, r.category_id, r.period): (round(r.total_amount, 6), r.tx_count)
+            for r in conn.execute(select(agg)).all()
+        }
+
+
+def test_roll_moves_old_months_and_keeps_aggregates(synthetic):
+    synthetic(n_users=150, days=200)
+    users, _, raw_before = _counts()
+    before = _buckets()
+
+    moved = partitions.roll()
+    assert moved, "200 days of history should leave months outside the hot window"
+    with engine.connect() as conn:
+        names = [name for name, _ in partitions.partitions(conn)]
+    assert sorted(moved) == names
+
+    import aggregates
+    aggregates.rebuild()
+    assert _counts()[2] == raw_before
+    assert _buckets() == before
+
+
+def test_retention_keeps_rollups_of_dropped_months(synthetic):
+    synthetic(n_users=150, days=200)
+    before = _buckets()
+    partitions.roll()
+    with engine.connect() as conn:
+        oldest = partitions.partitions(conn)[0][0]
+
+    retired = partitions.apply_retention(months=partitions.HOT_MONTHS + 1, action="drop")
+    assert oldest in retired
+    with engine.connect() as conn:
+        assert oldest not in [name for name, _ in partitions.partitions(conn)]
+
+    import aggregates
+    aggregates.rebuild()
+    assert _buckets() == before
+
+
+def test_reseed_after_roll_starts_clean(synthetic):
+    synthetic(n_users=300, days=200)
+    partitions.maintain()
+    with engine.connect() as conn:
+        assert partitions.partitions(conn)
+
+    synthetic(n_users=100, days=30)
+    users, buckets, raw = _counts()
+    assert users == 100
+    assert buckets > 0
+    with engine.connect() as conn:
+        assert partitions.partitions(conn) == []
+        assert conn.execute(select(func.count()).select_from(models.User).where(models.User.final_score.is_(None))).scalar() == 0
+
+
+def test_month_helpers():
+    start = partitions.month_start(datetime.datetime(2026, 12, 17, 8, 30))
+    assert start == datetime.datetime(2026, 12, 1)
+    assert partitions.add_months(start, 1) == datetime.datetime(2027, 1, 1)
+    assert partitions.add_months(start, -12) == datetime.datetime(2025, 12, 1)
+    assert partitions.partition_name(start) == "transactions_2026_12"
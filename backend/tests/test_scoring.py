@@ -0,0 +1,77 @@
+import numpy as np
+from sqlalchemy import func, select
+
+from database import engine
+import models
+import scoring
+
+User = models.User
+
+
+def test_calibration_is_monotone_and_bounded():
+    raw = np.linspace(0, 100, 1001)
+    calibrated = scoring.calibrate(raw)
+    assert np.all(np.diff(calibrated) >= 0)
+    assert calibrated[0] == 0 and calibrated[-1] == 100
+
+
+def test_attributions_sum_to_the_calibrated_score():
+    rng = np.random.default_rng(3)
+    lo, hi = np.minimum(scoring._LO, scoring._HI), np.maximum(scoring._LO, scoring._HI)
+    X = rng.uniform(lo, hi, (50, len(lo)))
+    impacts = scoring.attribution_matrix(X)
+    assert np.allclose(np.rint(impacts.sum(axis=1)), scoring.score_matrix(X))
+
+
+def test_engine_owns_the_displayed_score(synthetic):
+    synthetic(n_users=300)
+    with engine.connect() as conn:
+        mismatched = conn.execute(
+            select(func.count()).select_from(User).where(User.current_risk_score != User.final_score)
+        ).scalar()
+        rows = conn.execute(select(User.status, User.current_risk_score)).all()
+    assert mismatched == 0
+
+    # Seeded status cohorts should mostly fall in their dashboard band
+    expected = {"Clean": "safe", "Safe": "safe", "Warning": "at_risk", "Critical": "critical", "Emergency": "critical"}
+    band = lambda s: "critical" if s >= scoring.CRITICAL_SCORE else "at_risk" if s >= scoring.AT_RISK_SCORE else "safe"
+    agreement = np.mean([band(score) == expected[status] for status, score in rows])
+    assert agreement > 0.7
+
+
+def test_explain_user_matches_stored_attributions_without_writing(synthetic):
+    synthetic(n_users=50)
+    with engine.connect() as conn:
+        user_id = conn.execute(select(User.id).order_by(User.current_risk_score.desc())).scalars().first()
+        stored = conn.execute(
+            select(models.RiskAttribution.feature, models.RiskAttribution.impact)
+            .where(models.RiskAttribution.user_id == user_id)
+            .order_by(models.RiskAttribution.impact.desc())
+        ).all()
+        runs = conn.execute(select(func.count()).select_from(models.ScoringRun)).scalar()
+        score, explained = scoring.explain_user(conn, user_id, limit=3)
+        stored_score = conn.execute(select(User.current_risk_score).where(User.id == user_id)).scalar()
+        assert conn.execute(select(func.count()).select_from(models.ScoringRun)).scalar() == runs
+        assert scoring.explain_user(conn, "nobody") == (None, [])
+    assert explained == [tuple(r) for r in stored[:3]]
+    assert score == stored_score
+
+
+def test_profile_of_an_unscored_user_adds_up(synthetic):
+    from fastapi.testclient import TestClient
+    from cache import profile_cache
+    import main
+
+    synthetic(n_users=30)
+    with engine.begin() as conn:
+        user_id = conn.execute(select(User.id).order_by(User.current_risk_score.desc())).scalars().first()
+        # A legacy score the engine never produced, and no attributions yet
+        conn.execute(models.RiskAttribution.__table__.delete().where(models.RiskAttribution.user_id == user_id))
+        conn.execute(User.__table__.update().where(User.id == user_id).values(current_risk_score=99, final_score=None))
+    profile_cache.clear()
+
+    profile = TestClient(main.app).get(f"/api/users/{user_id}").json()
+    with engine.connect() as conn:
+        expected, impacts = scoring.explain_user(conn, user_id)
+    assert profile["risk_score"] == expected != 99
+    assert round(sum(impact for _, impact in impacts)) == expected
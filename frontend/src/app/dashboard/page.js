@@ -1,6 +1,6 @@
 "use client";
 
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useMemo } from 'react';
 import { motion } from 'framer-motion';
 import {
   AlertTriangle,
@@ -11,7 +11,8 @@ import {
   ArrowRight
 } from 'lucide-react';
 import Link from 'next/link';
-import { API_ENDPOINTS } from '../../config/api';
+import { API_ENDPOINTS, RISK_BANDS, fetchJSON } from '../../config/api';
+import { useReloadOnUserEvents } from '../../hooks/useUserEvents';
 import StatCard from '../../components/StatCard';
 import RiskTracker from '../../components/RiskTracker';
 import styles from './page.module.css';
@@ -19,33 +20,33 @@ import styles from './page.module.css';
 export default function Dashboard() {
   const [showReport, setShowReport] = useState(false);
   const [reportData, setReportData] = useState(null);
-  const [loadingReport, setLoadingReport] = useState(false);
-  const [stats, setStats] = useState({
-    exposure: "Loading...",
-    atRisk: "...",
-    successRate: "...",
-    recoveries: "..."
-  });
+  const [analytics, setAnalytics] = useState(null);
 
-  useEffect(() => {
-    fetch(API_ENDPOINTS.users)
-      .then(res => res.json())
-      .then(data => {
-        const totalExposure = data.reduce((acc, u) => acc + (u.exposure || 0), 0);
-        const atRiskCount = data.filter(u => u.score > 50).length;
-        const recoveryCount = data.filter(u => u.status === 'Warning').length;
-        const safeCount = data.filter(u => u.status !== 'Critical').length;
-        const successRateVal = ((safeCount / data.length) * 100).toFixed(1);
-
-        setStats({
-          exposure: `₹${(totalExposure / 10000000).toFixed(2)} Cr`,
-          atRisk: atRiskCount,
-          successRate: `${successRateVal}%`,
-          recoveries: recoveryCount
-        });
-      })
+  // Stats come pre-aggregated from the (server-cached) analytics endpoints
+  const loadAnalytics = () => {
+    Promise.all([fetchJSON(API_ENDPOINTS.analytics.exposure), fetchJSON(API_ENDPOINTS.analytics.risk)])
+      .then(([exposure, risk]) => setAnalytics({ exposure, risk }))
       .catch(err => console.error("Stats fetch failed", err));
-  }, []);
+  };
+
+  useEffect(loadAnalytics, []);
+  useReloadOnUserEvents(loadAnalytics);
+
+  const stats = useMemo(() => {
+    if (!analytics) {
+      return { exposure: "Loading...", atRisk: "...", successRate: "...", recoveries: "..." };
+    }
+    const { bands, status_counts: statusCounts } = analytics.risk;
+    const scored = bands.critical + bands.at_risk + bands.safe;
+    const safeCount = scored - (statusCounts.Critical || 0);
+
+    return {
+      exposure: `₹${(analytics.exposure.total_exposure / 10000000).toFixed(2)} Cr`,
+      atRisk: bands.critical + bands.at_risk,
+      successRate: scored ? `${((safeCount / scored) * 100).toFixed(1)}%` : "-",
+      recoveries: statusCounts.Warning || 0
+    };
+  }, [analytics]);
 
   const container = {
     hidden: { opacity: 0 },
@@ -62,40 +63,20 @@ export default function Dashboard() {
     show: { opacity: 1, y: 0 }
   };
 
-  const generateReport = async () => {
-    setLoadingReport(true);
-    try {
-      const res = await fetch(API_ENDPOINTS.users);
-      const users = await res.json();
+  const generateReport = () => {
+    if (!analytics) return;
+    // High-risk (critical + at risk) users per distress category, counted server-side
+    const factors = Object.entries(analytics.risk.bands_by_distress_category)
+      .map(([name, bands]) => ({ name, count: bands.critical + bands.at_risk }))
+      .filter(f => f.count > 0)
+      .sort((a, b) => b.count - a.count);
+    const totalHighRisk = factors.reduce((acc, f) => acc + f.count, 0);
 
-      // Aggregate Risk Factors
-      const factors = {};
-      let totalHighRisk = 0;
-
-      users.forEach(u => {
-        if (u.score > 50) {
-          totalHighRisk++;
-          const factor = u.volatility || "Unknown";
-          factors[factor] = (factors[factor] || 0) + 1;
-        }
-      });
-
-      // Sort factors
-      const sortedFactors = Object.entries(factors)
-        .sort(([, a], [, b]) => b - a)
-        .map(([key, count]) => ({
-          name: key,
-          count,
-          percent: ((count / totalHighRisk) * 100).toFixed(1)
-        }));
-
-      setReportData({ total: totalHighRisk, factors: sortedFactors });
-      setShowReport(true);
-    } catch (e) {
-      console.error("Report generation failed", e);
-    } finally {
-      setLoadingReport(false);
-    }
+    setReportData({
+      total: totalHighRisk,
+      factors: factors.map(f => ({ ...f, percent: ((f.count / totalHighRisk) * 100).toFixed(1) })),
+    });
+    setShowReport(true);
   };
 
   const downloadPDF = async () => {
@@ -182,7 +163,7 @@ export default function Dashboard() {
           <Link href="/metrics/risk" style={{ textDecoration: 'none' }}>
             <motion.div variants={item} style={{ cursor: 'pointer' }}>
               <StatCard
-                title="At-Risk Users (50-85%)"
+                title={`At-Risk Users (${RISK_BANDS.atRisk}+)`}
                 value={stats.atRisk}
                 change="12"
                 isPositive={false}
@@ -220,9 +201,9 @@ export default function Dashboard() {
             <button
               className="btn btn-outline"
               onClick={generateReport}
-              disabled={loadingReport}
+              disabled={!analytics}
             >
-              {loadingReport ? 'Analyzing...' : 'Generate SHAP Report'}
+              {analytics ? 'Generate SHAP Report' : 'Analyzing...'}
             </button>
           </div>
           <p style={{ color: 'var(--text-secondary)', marginBottom: '1rem' }}>
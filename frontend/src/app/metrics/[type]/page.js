@@ -6,9 +6,13 @@ import { motion } from 'framer-motion';
 import { ArrowLeft } from 'lucide-react';
 import { PieChart, Pie, Cell, Tooltip, ResponsiveContainer, BarChart, Bar, XAxis, YAxis, CartesianGrid, Legend } from 'recharts';
 import { useTheme } from '../../../contexts/ThemeContext';
-import { API_ENDPOINTS } from '../../../config/api';
+import { API_ENDPOINTS, RISK_BANDS, fetchJSON, fetchUsers } from '../../../config/api';
+import { useReloadOnUserEvents } from '../../../hooks/useUserEvents';
 import styles from './metrics.module.css';
 
+const TOP_EXPOSURES = 10;
+const TABLE_ROWS = 50;
+
 export default function MetricDetail({ params }) {
     const { type } = use(params);
     const { theme } = useTheme();
@@ -17,43 +21,42 @@ export default function MetricDetail({ params }) {
     const [users, setUsers] = useState([]);
     const [stats, setStats] = useState({});
 
-    useEffect(() => {
-        fetch(API_ENDPOINTS.users)
-            .then(res => res.json())
-            .then(allUsers => {
-                setUsers(allUsers);
-                processData(type, allUsers);
-                setLoading(false);
-            });
-    }, [type]);
-
-    const processData = (metricType, allUsers) => {
+    // Charts come from the server-side aggregates; tables read one bounded
+    // page of users, never the whole book
+    const loadMetric = async (metricType) => {
         let processed = [];
         let summary = {};
+        let rows = [];
 
         if (metricType === 'exposure') {
             // Top Exposures
-            processed = allUsers
-                .map(u => ({ name: u.name, value: u.exposure || 0, score: u.score }))
-                .sort((a, b) => b.value - a.value)
-                .slice(0, 10);
+            rows = await fetchUsers({ sort: 'exposure', order: 'desc', limit: TOP_EXPOSURES, fields: 'id,name,exposure,score' });
+            processed = rows.map(u => ({ name: u.name, value: u.exposure || 0, score: u.score }));
             summary = { title: "Top Portfolio Exposures", desc: "Users with highest calculated loan exposure." };
         } else if (metricType === 'risk') {
             // Risk Distribution
-            const high = allUsers.filter(u => u.score > 75).length;
-            const med = allUsers.filter(u => u.score > 50 && u.score <= 75).length;
-            const low = allUsers.filter(u => u.score <= 50).length;
-
+            const [risk, top] = await Promise.all([
+                fetchJSON(API_ENDPOINTS.analytics.risk),
+                fetchUsers({ sort: 'score', order: 'desc', min_score: RISK_BANDS.atRisk, limit: TABLE_ROWS, fields: 'id,name,score,volatility' }),
+            ]);
+            rows = top;
+            const { critical, at_risk: atRisk } = risk.thresholds;
             processed = [
-                { name: 'Critical (>75)', value: high, color: '#DC2626' },
-                { name: 'At Risk (50-75)', value: med, color: '#F59E0B' },
-                { name: 'Safe (<50)', value: low, color: '#16A34A' }
+                { name: `Critical (${critical}+)`, value: risk.bands.critical, color: '#DC2626' },
+                { name: `At Risk (${atRisk}-${critical - 1})`, value: risk.bands.at_risk, color: '#F59E0B' },
+                { name: `Safe (<${atRisk})`, value: risk.bands.safe, color: '#16A34A' }
             ];
             summary = { title: "Risk Profile Distribution", desc: "Breakdown of user base by risk category." };
         } else if (metricType === 'success') {
             // Intervention Success
-            const safe = allUsers.filter(u => u.status === 'Safe').length;
-            const total = allUsers.length;
+            const [risk, sample] = await Promise.all([
+                fetchJSON(API_ENDPOINTS.analytics.risk),
+                fetchUsers({ limit: 20, fields: 'id,name,status' }),
+            ]);
+            rows = sample;
+            const counts = risk.status_counts;
+            const total = Object.values(counts).reduce((acc, n) => acc + n, 0);
+            const safe = counts.Safe || 0;
             processed = [
                 { name: 'Safe / Low Risk', value: safe, color: '#16A34A' },
                 { name: 'At Risk', value: total - safe, color: '#94A3B8' }
@@ -61,15 +64,26 @@ export default function MetricDetail({ params }) {
             summary = { title: "Intervention Efficacy", desc: "Percentage of users effectively managed." };
         } else if (metricType === 'recovery') {
             // Recoveries
-            processed = allUsers
-                .filter(u => u.status === 'Warning')
-                .map(u => ({ name: u.name, value: u.score, status: 'Recovering' }));
+            rows = await fetchUsers({ status: 'Warning', sort: 'score', order: 'desc', limit: TABLE_ROWS, fields: 'id,name,score' });
+            processed = rows.map(u => ({ name: u.name, value: u.score, status: 'Recovering' }));
             summary = { title: "Active Recovery Queue", desc: "Users currently being monitored for improvement." };
         }
+        setUsers(rows);
         setData(processed);
         setStats(summary);
+        setLoading(false);
     };
 
+    const reload = () => {
+        loadMetric(type).catch(err => {
+            console.error("Metric fetch failed", err);
+            setLoading(false);
+        });
+    };
+
+    useEffect(reload, [type]);
+    useReloadOnUserEvents(reload);
+
     const COLORS = ['#00AEEF', '#0A3D5C', '#60A5FA', '#3B82F6'];
 
     // Format currency for Y-axis
@@ -215,10 +229,10 @@ export default function MetricDetail({ params }) {
                                     <tr key={i}>
                                         <td>{item.name}</td>
                                         <td>₹{(item.value).toLocaleString()}</td>
-                                        <td><span className={styles.badge}>{item.score > 50 ? 'High Risk' : 'Standard'}</span></td>
+                                        <td><span className={styles.badge}>{item.score >= RISK_BANDS.atRisk ? 'High Risk' : 'Standard'}</span></td>
                                     </tr>
                                 ))}
-                                {type === 'risk' && users.filter(u => u.score > 50).sort((a, b) => b.score - a.score).map((u, i) => (
+                                {type === 'risk' && users.map((u, i) => (
                                     <tr key={i}>
                                         <td>{u.name}</td>
                                         <td>Risk Score: {u.score}</td>
@@ -231,7 +245,7 @@ export default function MetricDetail({ params }) {
                                         <td>{u.status}</td>
                                         <td style={{ color: u.status === 'Safe' ? '#10b981' : '#f59e0b' }}>{u.status === 'Safe' ? 'Protected' : 'At Risk'}</td>
                                     </tr>
-                                )).slice(0, 20)}
+                                ))}
                                 {type === 'recovery' && data.map((item, i) => (
                                     <tr key={i}>
                                         <td>{item.name}</td>
@@ -8,7 +8,7 @@ import {
     ArrowLeft, TrendingUp, AlertTriangle, Activity,
     Wallet, CreditCard, ShieldAlert, Zap
 } from 'lucide-react';
-import { API_ENDPOINTS } from '../../../config/api';
+import { API_ENDPOINTS, RISK_BANDS } from '../../../config/api';
 import Link from 'next/link';
 
 const COLORS = ['#00AEEF', '#00395D', '#008A4B', '#FF9E1B', '#E20613', '#64748B', '#A0AEC0'];
@@ -101,7 +101,7 @@ export default function UserProfile({ params }) {
                             <div className={styles.statIcon}><ShieldAlert size={20} /></div>
                             <div>
                                 <span className={styles.statLabel}>Risk Score</span>
-                                <div className={styles.statValue} style={{ color: user.risk_score > 75 ? '#ef4444' : '#10b981' }}>
+                                <div className={styles.statValue} style={{ color: user.risk_score >= RISK_BANDS.critical ? '#ef4444' : '#10b981' }}>
                                     {user.risk_score}<span className={styles.subScale}>/100</span>
                                 </div>
                             </div>
@@ -1,27 +1,36 @@
 import Link from 'next/link';
-import { API_ENDPOINTS } from '../config/api';
+import { RISK_BANDS, fetchUsers } from '../config/api';
+import useUserEvents, { mergeUserDeltas } from '../hooks/useUserEvents';
 import styles from './RiskTracker.module.css';
 
 import { useState, useEffect } from 'react';
 
+// The queue shows the highest-risk borrowers only; the server sorts and limits
+const QUEUE_SIZE = 50;
+
 export default function RiskTracker() {
     const [users, setUsers] = useState([]);
     const [loading, setLoading] = useState(true);
 
-    useEffect(() => {
-        fetch(API_ENDPOINTS.users)
-            .then(res => res.json())
+    const loadUsers = () => {
+        fetchUsers({ sort: 'score', order: 'desc', limit: QUEUE_SIZE, fields: 'id,name,score,volatility,status' })
             .then(data => {
-                // Sort users by risk score (highest first)
-                const sortedUsers = data.sort((a, b) => b.score - a.score);
-                setUsers(sortedUsers);
+                setUsers(data);
                 setLoading(false);
             })
             .catch(err => {
                 console.error("Failed to fetch users:", err);
                 setLoading(false);
             });
-    }, []);
+    };
+
+    useEffect(loadUsers, []);
+
+    // Live updates patch the rows in place instead of refetching the list
+    useUserEvents({
+        onDeltas: (deltas) => setUsers(prev => mergeUserDeltas(prev, deltas).sort((a, b) => b.score - a.score)),
+        onResync: loadUsers,
+    });
 
     if (loading) return <div style={{ padding: '2rem' }}>Loading Risk Data...</div>;
 
@@ -35,8 +44,8 @@ export default function RiskTracker() {
     };
 
     const getRiskColor = (score) => {
-        if (score >= 80) return '#ef4444';
-        if (score >= 50) return '#f59e0b';
+        if (score >= RISK_BANDS.critical) return '#ef4444';
+        if (score >= RISK_BANDS.atRisk) return '#f59e0b';
         return '#10b981';
     };
 
@@ -9,8 +9,26 @@ export const API_ENDPOINTS = {
         risk: `${API_BASE_URL}/api/analytics/risk`,
         trends: `${API_BASE_URL}/api/analytics/trends`,
     },
+    events: {
+        users: `${API_BASE_URL}/api/events/users`,
+    },
     loans: (userId) => `${API_BASE_URL}/api/loans/${userId}`,
     transactions: (userId) => `${API_BASE_URL}/api/transactions/${userId}`,
 };
 
+// Lower bounds of the risk bands; mirrors CRITICAL_SCORE / AT_RISK_SCORE in
+// backend/scoring.py (also served as `thresholds` by /api/analytics/risk)
+export const RISK_BANDS = { critical: 75, atRisk: 50 };
+
+export async function fetchJSON(url) {
+    const res = await fetch(url);
+    if (!res.ok) throw new Error(`${url} failed: ${res.status}`);
+    return res.json();
+}
+
+// One page of /api/users, e.g. { sort: 'score', order: 'desc', limit: 50, fields: 'id,name,score' }
+export function fetchUsers(params) {
+    return fetchJSON(`${API_ENDPOINTS.users}?${new URLSearchParams(params)}`);
+}
+
 export default API_BASE_URL;
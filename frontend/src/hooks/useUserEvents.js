@@ -0,0 +1,71 @@
+import { useEffect, useRef } from 'react';
+import { API_ENDPOINTS } from '../config/api';
+
+// One EventSource per tab, shared by every component that listens
+const listeners = new Set();
+let source = null;
+
+function connect() {
+    source = new EventSource(API_ENDPOINTS.events.users);
+    source.addEventListener('users', (e) => {
+        const deltas = JSON.parse(e.data);
+        listeners.forEach(l => l.onDeltas?.(deltas));
+    });
+    source.addEventListener('resync', () => {
+        listeners.forEach(l => l.onResync?.());
+    });
+}
+
+// Patch a user list with pushed deltas ({ id, status, last_action, score });
+// a new score also becomes the latest point of the history sparkline
+export function mergeUserDeltas(users, deltas) {
+    const byId = new Map(deltas.map(d => [d.id, d]));
+    return users.map(u => {
+        const delta = byId.get(u.id);
+        if (!delta) return u;
+        const next = { ...u, ...delta };
+        if (delta.score !== undefined && u.history) {
+            next.history = [...u.history, delta.score].slice(-u.history.length);
+        }
+        return next;
+    });
+}
+
+// Views built from server-side aggregates cannot patch them with deltas;
+// they reload, at most once per `delayMs` however many deltas arrive
+export function useReloadOnUserEvents(reload, delayMs = 5000) {
+    const timer = useRef(null);
+    const schedule = () => {
+        if (timer.current) return;
+        timer.current = setTimeout(() => {
+            timer.current = null;
+            reload();
+        }, delayMs);
+    };
+    useEffect(() => () => clearTimeout(timer.current), []);
+    useUserEvents({ onDeltas: schedule, onResync: schedule });
+}
+
+export default function useUserEvents({ onDeltas, onResync }) {
+    const handlers = useRef({ onDeltas, onResync });
+
+    useEffect(() => {
+        handlers.current = { onDeltas, onResync };
+    });
+
+    useEffect(() => {
+        const listener = {
+            onDeltas: (deltas) => handlers.current.onDeltas?.(deltas),
+            onResync: () => handlers.current.onResync?.(),
+        };
+        listeners.add(listener);
+        if (!source) connect();
+        return () => {
+            listeners.delete(listener);
+            if (listeners.size === 0 && source) {
+                source.close();
+                source = null;
+            }
+        };
+    }, []);
+}